@@ -1,6 +1,8 @@
 import json
 
 from PySide6.QtWidgets import QDialog, QVBoxLayout, QListWidget, QMessageBox
+from backend_controller.ai_executor import run_ai_async
+from backend_controller.db_executor import run_async
 from backend_controller.db_handle_AI import save_chat_message,get_smart_suggestions
 
 
@@ -9,10 +11,13 @@ class AIDialog:
         self.name = name
         self.phone_number = phone_number
         self.user_id = user_id
+        # The suggestion request in flight, if any
+        self.pending_request = None
+        self.watched_inputs = set()
 
 
     def show_suggestions_dialog(self, message_input):
-        """Show AI-generated message suggestions and save them to the database."""
+        """Ask for AI-generated message suggestions; the dialog opens when they arrive."""
         user_message = message_input.text()
 
 
@@ -20,11 +25,34 @@ class AIDialog:
             QMessageBox.warning(None, "Empty Input", "Please type a message to get suggestions!")
             return
 
-        # Fetch AI suggestions
-        suggestions = get_smart_suggestions(user_message)
+        # Suggestions for text the user has since changed are no longer wanted
+        if id(message_input) not in self.watched_inputs:
+            self.watched_inputs.add(id(message_input))
+            message_input.textChanged.connect(lambda _: self.cancel_pending_request())
+
+        self.cancel_pending_request()
+        self.pending_request = run_ai_async(
+            get_smart_suggestions, user_message,
+            on_result=lambda suggestions: self.on_suggestions_ready(message_input, user_message, suggestions),
+            on_error=lambda e: self.on_suggestions_failed(f"Could not get suggestions: {str(e)}"),
+            on_timeout=lambda: self.on_suggestions_failed("The AI service took too long to answer. Please try again."),
+        )
+
+    def cancel_pending_request(self):
+        if self.pending_request is not None:
+            self.pending_request.cancel()
+            self.pending_request = None
+
+    def on_suggestions_failed(self, text):
+        self.pending_request = None
+        QMessageBox.warning(None, "AI Suggestions", text)
+
+    def on_suggestions_ready(self, message_input, user_message, suggestions):
+        """Shows the suggestions and saves them to the database in the background."""
+        self.pending_request = None
 
         # Save suggestions to the database (as JSON)
-        save_chat_message(self.user_id, user_message, json.dumps(suggestions))
+        run_async(save_chat_message, self.user_id, user_message, json.dumps(suggestions))
 
         # Display suggestions in a dialog
         dialog = QDialog()
@@ -47,6 +75,3 @@ class AIDialog:
 
         layout.addWidget(suggestion_list)
         dialog.exec_()
-
-
-
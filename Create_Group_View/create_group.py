@@ -1,7 +1,10 @@
-from PySide6.QtCore import QDateTime, Qt
+from PySide6.QtCore import Qt
+from PySide6.QtGui import QTextCursor
 from PySide6.QtWidgets import QDialog, QVBoxLayout, QFormLayout, QLineEdit, QMessageBox, QCheckBox, QPushButton, QLabel, \
     QTextEdit, QWidget, QInputDialog, QHBoxLayout
 from backend_controller import db_handler_friends, db_handler, db_handler_groups
+from backend_controller.db_executor import run_async
+from backend_controller.db_watcher import get_watcher
 
 
 
@@ -12,6 +15,15 @@ class GroupDialog:
 
     def handle_create_group(self):
         """Handles group creation."""
+        # Fetch friends from the database in the background
+        run_async(db_handler_friends.load_friends, self.user_id, on_result=self.show_create_group_dialog)
+
+    def show_create_group_dialog(self, friends):
+        """Shows the group creation form once the friend list has loaded."""
+        if not friends:
+            QMessageBox.warning(None, "No Friends", "You don't have any friends to add to the group.")
+            return
+
         dialog = QDialog()
         dialog.setWindowTitle("Create Group")
         dialog.resize(400, 300)
@@ -30,12 +42,6 @@ class GroupDialog:
         group_name_input.setPlaceholderText("Enter group name")
         friend_checkboxes = []
 
-        # Fetch friends from the database
-        friends = db_handler_friends.load_friends(self.user_id)
-        if not friends:
-            QMessageBox.warning(None, "No Friends", "You don't have any friends to add to the group.")
-            return
-
         # Create checkboxes for friends
         for friend_name, friend_id in friends:
             checkbox = QCheckBox(friend_name)
@@ -108,13 +114,26 @@ class GroupDialog:
             QMessageBox.warning(None, "No Friends Selected", "Please select at least one friend to add to the group.")
             return
 
-        # store groups to db
-        db_handler_groups.add_group(dialog, self.user_id, selected_friends, group_name)
+        def on_created(_):
+            QMessageBox.information(None, "Success", f"Group '{group_name}' created successfully! Click on message group icon to start charting with group.")
+            dialog.accept()
+
+        def on_error(e):
+            dialog.setEnabled(True)
+            QMessageBox.critical(None, "Error", f"Failed to create group: {str(e)}")
+
+        # store groups to db in the background; the form is disabled so it cannot be submitted twice
+        dialog.setEnabled(False)
+        run_async(db_handler_groups.add_group, self.user_id, selected_friends, group_name,
+                  on_result=on_created, on_error=on_error)
 
     def handle_message_group(self):
         """Handles messaging a group."""
-        groups = db_handler_groups.fetch_groups_for_user(self.user_id)  # Fetch groups created by the user
+        # Groups, creators and members arrive together from one background query
+        run_async(db_handler_groups.fetch_group_overview, self.user_id, on_result=self.show_groups_dialog)
 
+    def show_groups_dialog(self, groups):
+        """Lists the user's groups once fetch_group_overview returns."""
         if not groups:
             QMessageBox.warning(None, "No Groups",
                                 "You are not part of any groups. Please create or join a group first.")
@@ -127,21 +146,14 @@ class GroupDialog:
 
         layout = QVBoxLayout(dialog)
 
-        for group_id, group_name in groups:
-            # Fetch group members for the current group
-            members = db_handler_groups.fetch_group_members(group_id)
+        for group_id, group_name, creator_id, creator_name, members in groups:
             member_names = ", ".join([member[1] for member in members])  # Concatenate member names
 
             # Create a widget for the group name and members
             group_widget = QWidget()
             group_layout = QVBoxLayout(group_widget)
 
-            #get admin name
-            # name = db_handler_groups.get_group_creator(group_id)
-
-
-            # Get admin name and check if the current user is the admin
-            creator_id, creator_name = db_handler_groups.get_group_creator(group_id)
+            # Check if the current user is the admin
             is_admin = self.user_id == creator_id
 
             group_label = QLabel(f"Group Name: {group_name} -------> Admin: {creator_name}")
@@ -206,17 +218,27 @@ class GroupDialog:
 
     def show_add_members_dialog(self, group_id):
         """Shows a dialog for the admin to add friends to the group."""
+        run_async(
+            self.fetch_addable_friends, self.user_id, group_id,
+            on_result=lambda friends: self.show_add_members_form(group_id, friends),
+            on_error=lambda e: QMessageBox.critical(None, "DB error", f"{str(e)}"),
+        )
 
+    @staticmethod
+    def fetch_addable_friends(user_id, group_id):
+        """Runs on the executor: the user's friends who are not in the group yet."""
         # Fetch current group members to exclude them from the selection
         current_members = db_handler_groups.fetch_group_members(group_id)
         current_member_ids = {member[0] for member in current_members}  # Extract member IDs
 
         # Fetch user's friends
-        available_friends = db_handler_groups.load_friends(self.user_id)
-        filtered_friends = [(friend_id, friend_name) for friend_id, friend_name in available_friends if
-                            friend_id not in current_member_ids]
+        available_friends = db_handler_groups.load_friends(user_id)
+        return [(friend_id, friend_name) for friend_id, friend_name in available_friends if
+                friend_id not in current_member_ids]
 
-        if not available_friends:
+    def show_add_members_form(self, group_id, filtered_friends):
+        """Shows the add-members form once fetch_addable_friends returns."""
+        if not filtered_friends:
             QMessageBox.information(None, "No Friends Available", "All your friends are already in the group!")
             return
 
@@ -272,18 +294,23 @@ class GroupDialog:
             QMessageBox.warning(None, "No Selection", "Please select at least one friend to add.")
             return
 
-        try:
-            # Add each selected friend to the group
-            for friend_id in selected_friend_ids:
-                db_handler_groups.add_group_member(group_id, friend_id)
-
-            QMessageBox.information(None, "Success", "Selected members were added successfully!")
+        def on_added(added):
+            if added:
+                QMessageBox.information(None, "Success", "Selected members were added successfully!")
+            else:
+                QMessageBox.information(None, "No Change", "The selected friends are already in the group.")
             dialog.accept()  # Close the dialog after successful addition
 
-        except Exception as e:
+        def on_error(e):
+            dialog.setEnabled(True)
             QMessageBox.critical(None, "Error", f"Failed to add members: {e}")
             print(f"Failed to add members: {e}")
 
+        # Add every selected friend in one transaction, in the background
+        dialog.setEnabled(False)
+        run_async(db_handler_groups.add_group_members, group_id, selected_friend_ids,
+                  on_result=on_added, on_error=on_error)
+
     def open_group_chat(self, parent_dialog, group_id):
         """Opens the group chat dialog."""
         parent_dialog.accept()  # Close the parent dialog
@@ -296,6 +323,14 @@ class GroupDialog:
 
         layout = QVBoxLayout(dialog)
 
+        # Older pages are loaded on demand, newest page first
+        load_older_button = QPushButton("Load older messages")
+        load_older_button.setCursor(Qt.PointingHandCursor)
+        load_older_button.setStyleSheet(
+            "background: none; color: #1abc9c; border: none; text-decoration: underline;")
+        load_older_button.setVisible(False)
+        layout.addWidget(load_older_button)
+
         # Display group messages
         message_area = QTextEdit()
         message_area.setReadOnly(True)
@@ -303,20 +338,42 @@ class GroupDialog:
 
         message_area.clear()
 
-        # fetch group message
-        messages = db_handler_groups.fetch_group_message(group_id)
+        # Paging cursor and high-water mark of what is on screen
+        state = {"older_cursor": None, "last_seen_id": None}
 
+        def on_error(e):
+            QMessageBox.critical(None, "Db error", f"Database error {str(e)}")
 
+        # fetch the newest page in the background; the dialog stays responsive meanwhile
+        run_async(
+            db_handler_groups.fetch_group_message, group_id,
+            on_result=lambda page: self.show_group_messages(message_area, load_older_button, state, *page),
+            on_error=on_error,
+        )
 
+        def load_older():
+            load_older_button.setEnabled(False)
+            run_async(
+                db_handler_groups.fetch_group_message, group_id, state["older_cursor"],
+                on_result=lambda page: self.prepend_group_messages(message_area, load_older_button, state, *page),
+                on_error=on_error,
+            )
 
-        if not messages:
-            print(f"No message for create_group.py line 202")
-            # QMessageBox.information(None, "Me", "Couldn't get group message")
+        load_older_button.clicked.connect(load_older)
 
-        message_area.clear()
-        for sender_name, content, timestamp in messages:
+        # Only fetch the messages past the high-water mark when something changes
+        def refresh_messages():
+            if state["last_seen_id"] is None:
+                return  # The first page is still loading
+            run_async(
+                db_handler_groups.fetch_new_group_messages, group_id, state["last_seen_id"],
+                on_result=lambda messages: self.append_group_messages(message_area, state, messages),
+                on_error=on_error,
+            )
 
-            message_area.append(f"[{timestamp}] {sender_name}: {content}")
+        # Refresh whenever the messages table changes, for as long as the dialog is open
+        get_watcher().subscribe("messages", refresh_messages)
+        dialog.finished.connect(lambda _: get_watcher().unsubscribe("messages", refresh_messages))
 
         # Message input
         message_input = QLineEdit()
@@ -347,6 +404,50 @@ class GroupDialog:
 
         dialog.exec_()
 
+    @staticmethod
+    def format_group_message(sender_name, content, timestamp):
+        return f"[{timestamp}] {sender_name}: {content}"
+
+    def show_group_messages(self, message_area, load_older_button, state, messages, older_cursor):
+        """Renders the newest page returned by fetch_group_message."""
+        if not messages:
+            print(f"No message for create_group.py line 202")
+            # QMessageBox.information(None, "Me", "Couldn't get group message")
+
+        message_area.clear()
+        for _, sender_name, content, timestamp in messages:
+
+            message_area.append(self.format_group_message(sender_name, content, timestamp))
+
+        state["last_seen_id"] = max((message[0] for message in messages), default=0)
+        state["older_cursor"] = older_cursor
+        load_older_button.setVisible(older_cursor is not None)
+
+    def prepend_group_messages(self, message_area, load_older_button, state, messages, older_cursor):
+        """Inserts an older page above the messages on screen."""
+        scroll_bar = message_area.verticalScrollBar()
+        distance_from_bottom = scroll_bar.maximum() - scroll_bar.value()
+
+        cursor = QTextCursor(message_area.document())
+        cursor.movePosition(QTextCursor.Start)
+        for _, sender_name, content, timestamp in messages:
+            cursor.insertText(self.format_group_message(sender_name, content, timestamp))
+            cursor.insertBlock()
+
+        scroll_bar.setValue(scroll_bar.maximum() - distance_from_bottom)
+        state["older_cursor"] = older_cursor
+        load_older_button.setEnabled(True)
+        load_older_button.setVisible(older_cursor is not None)
+
+    def append_group_messages(self, message_area, state, messages):
+        """Appends messages past the high-water mark."""
+        for message_id, sender_name, content, timestamp in messages:
+            # Overlapping refreshes can return the same rows
+            if message_id <= state["last_seen_id"]:
+                continue
+            message_area.append(self.format_group_message(sender_name, content, timestamp))
+            state["last_seen_id"] = message_id
+
     def send_group_message(self, dialog, group_id, message_input, message_area):
         """Sends a message to the group."""
         content = message_input.text().strip()
@@ -354,14 +455,10 @@ class GroupDialog:
             QMessageBox.information(None, "No Content", "Cannot send empty message!")
             return
 
-        result = db_handler_groups.store_group_message(self.user_id, group_id, content)
-        message_input.clear()
-        if result:
-            QMessageBox.information(None, "Sent Message", "Message sent")
-        else:
-            QMessageBox.critical(None, "Sent not Message", "Message not sent")
-            return
-
-        # Display the new message
-        message_area.append(f"[{QDateTime.currentDateTime().toString()}] You: {content}")
         message_input.clear()
+        # The change watcher appends the new message with the rest of the delta
+        run_async(
+            db_handler_groups.store_group_message, self.user_id, group_id, content,
+            on_result=lambda _: QMessageBox.information(None, "Sent Message", "Message sent"),
+            on_error=lambda e: QMessageBox.critical(None, "Error", f"Failed to send message: {str(e)}"),
+        )
@@ -0,0 +1,354 @@
+from PySide6.QtCore import QAbstractListModel, QModelIndex, QPoint, QRect, QSize, Qt, Signal
+from PySide6.QtGui import QColor, QFont, QFontMetrics, QPainter
+from PySide6.QtWidgets import QAbstractItemView, QListView, QStyledItemDelegate
+
+from backend_controller import attachment_store
+from helpers.thumbnail_cache import get_thumbnail_cache
+
+# Message types whose content is a file path shown as a clickable attachment
+ATTACHMENT_TYPES = ("image", "doc", "document")
+
+MessageRole = Qt.UserRole + 1
+AttachmentRole = Qt.UserRole + 2
+
+# Image attachments are previewed inline in a box of this size (px)
+THUMBNAIL_SIZE = 160
+
+
+class MessageListModel(QAbstractListModel):
+    """
+    Chat messages as list rows.
+
+    Rows are plain dicts built from (id, sender_id, content, timestamp, message_type)
+    tuples, or system lines such as "Chatting with ..." that have no id.
+    """
+
+    def __init__(self, user_id, parent=None):
+        super().__init__(parent)
+        self.user_id = user_id
+        self._rows = []
+
+    def rowCount(self, parent=QModelIndex()):
+        return 0 if parent.isValid() else len(self._rows)
+
+    def data(self, index, role=Qt.DisplayRole):
+        if not index.isValid():
+            return None
+        row = self._rows[index.row()]
+        if role == Qt.DisplayRole:
+            return row["content"]
+        if role == MessageRole:
+            return row
+        if role == AttachmentRole:
+            return row["attachment"]
+        return None
+
+    def message_at(self, row):
+        """Return the row dict itself (data() hands Qt a converted copy)."""
+        return self._rows[row]
+
+    def _make_row(self, message):
+        message_id, sender_id, content, timestamp, message_type = message
+        # Attachment content is a store reference (or, for old messages, a local path)
+        attachment = attachment_store.resolve(content) if message_type in ATTACHMENT_TYPES and content else None
+        return {
+            "id": message_id,
+            "own": sender_id == self.user_id,
+            "sender": "You" if sender_id == self.user_id else "Friend",
+            "content": content or "",
+            "timestamp": timestamp,
+            "type": message_type,
+            "attachment": attachment,
+            "highlight": False,
+            "size_hint": None,
+            "thumbnail_pending": False,
+        }
+
+    @staticmethod
+    def _make_system_row(text):
+        return {
+            "id": None, "own": False, "sender": None, "content": text, "timestamp": None,
+            "type": "system", "attachment": None, "highlight": False, "size_hint": None,
+            "thumbnail_pending": False,
+        }
+
+    def set_messages(self, messages):
+        """Replace every row with a page of messages (one model reset)."""
+        self.beginResetModel()
+        self._rows = [self._make_row(message) for message in messages]
+        self.endResetModel()
+
+    def append_messages(self, messages):
+        """Add messages after the last row in a single insert."""
+        rows = [self._make_row(message) for message in messages]
+        self._insert_rows(len(self._rows), rows)
+
+    def prepend_messages(self, messages):
+        """Add an older page above the first row in a single insert."""
+        rows = [self._make_row(message) for message in messages]
+        self._insert_rows(0, rows)
+
+    def append_system_line(self, text):
+        """Add an informational line (notifications, chat headers)."""
+        self._insert_rows(len(self._rows), [self._make_system_row(text)])
+
+    def row_of_message(self, message_id):
+        """Return the row showing message_id, or -1."""
+        for position, row in enumerate(self._rows):
+            if row["id"] == message_id:
+                return position
+        return -1
+
+    def refresh_message(self, message_id):
+        """Repaint a message, e.g. once its thumbnail has been decoded."""
+        position = self.row_of_message(message_id)
+        if position < 0:
+            return
+        self._rows[position]["thumbnail_pending"] = False
+        index = self.index(position)
+        self.dataChanged.emit(index, index)
+
+    def clear(self):
+        self.beginResetModel()
+        self._rows = []
+        self.endResetModel()
+
+    def _insert_rows(self, position, rows):
+        if not rows:
+            return
+        self.beginInsertRows(QModelIndex(), position, position + len(rows) - 1)
+        self._rows[position:position] = rows
+        self.endInsertRows()
+
+
+class MessageDelegate(QStyledItemDelegate):
+    """Paints a message as a bubble; only rows inside the viewport are ever painted."""
+
+    MARGIN = 6
+    PADDING = 8
+    # Bubbles take at most this share of the view width
+    MAX_BUBBLE_RATIO = 0.75
+
+    OWN_COLOR = QColor("#16a085")
+    FRIEND_COLOR = QColor("#2c3e50")
+    TEXT_COLOR = QColor("white")
+    META_COLOR = QColor("#bdc3c7")
+    LINK_COLOR = QColor("#1abc9c")
+
+    def _bubble_text_width(self, view_width):
+        return max(50, int(view_width * self.MAX_BUBBLE_RATIO) - 2 * self.PADDING)
+
+    def _view_width(self, option):
+        view = self.parent()
+        return view.viewport().width() if view is not None else option.rect.width()
+
+    @staticmethod
+    def _body_text(row):
+        if row["attachment"]:
+            return f"[FILE] {attachment_store.display_name(row['content'])}"
+        return row["content"]
+
+    @staticmethod
+    def _has_thumbnail(row):
+        return row["type"] == "image" and bool(row["attachment"])
+
+    @staticmethod
+    def _meta_font(font):
+        meta_font = QFont(font)
+        meta_font.setPointSizeF(max(font.pointSizeF() * 0.75, 7))
+        return meta_font
+
+    def sizeHint(self, option, index):
+        row = index.model().message_at(index.row())
+        view_width = self._view_width(option)
+
+        # Measuring wrapped text is the expensive part; remember it per width
+        cached = row["size_hint"]
+        if cached is not None and cached[0] == view_width:
+            return cached[1]
+
+        metrics = QFontMetrics(option.font)
+        if row["type"] == "system":
+            text_rect = metrics.boundingRect(
+                QRect(0, 0, view_width - 2 * self.MARGIN, 100000), Qt.TextWordWrap, row["content"]
+            )
+            size = QSize(view_width, text_rect.height() + 2 * self.MARGIN)
+        else:
+            text_width = self._bubble_text_width(view_width)
+            text_rect = metrics.boundingRect(QRect(0, 0, text_width, 100000), Qt.TextWordWrap, self._body_text(row))
+            meta_height = QFontMetrics(self._meta_font(option.font)).height()
+            # The preview box is reserved up front so rows do not jump when the image arrives
+            thumbnail_height = THUMBNAIL_SIZE + self.PADDING if self._has_thumbnail(row) else 0
+            size = QSize(
+                view_width,
+                text_rect.height() + meta_height + thumbnail_height + 2 * self.PADDING + 2 * self.MARGIN,
+            )
+
+        row["size_hint"] = (view_width, size)
+        return size
+
+    def paint(self, painter, option, index):
+        row = index.model().message_at(index.row())
+        painter.save()
+        painter.setRenderHint(QPainter.Antialiasing)
+        rect = option.rect.adjusted(self.MARGIN, self.MARGIN, -self.MARGIN, -self.MARGIN)
+
+        if row["type"] == "system":
+            painter.setPen(self.META_COLOR)
+            painter.setFont(option.font)
+            painter.drawText(rect, Qt.TextWordWrap | Qt.AlignLeft | Qt.AlignVCenter, row["content"])
+            painter.restore()
+            return
+
+        metrics = QFontMetrics(option.font)
+        meta_font = self._meta_font(option.font)
+        meta_height = QFontMetrics(meta_font).height()
+        body = self._body_text(row)
+        meta = f"{row['sender']} ({row['timestamp']})"
+
+        text_width = self._bubble_text_width(option.rect.width())
+        body_rect = metrics.boundingRect(QRect(0, 0, text_width, 100000), Qt.TextWordWrap, body)
+        meta_width = QFontMetrics(meta_font).horizontalAdvance(meta)
+        has_thumbnail = self._has_thumbnail(row)
+        bubble_width = max(body_rect.width(), meta_width, THUMBNAIL_SIZE if has_thumbnail else 0) + 2 * self.PADDING
+        bubble_left = rect.right() - bubble_width if row["own"] else rect.left()
+        bubble = QRect(bubble_left, rect.top(), bubble_width, rect.height())
+
+        # Search hits get an outline
+        painter.setPen(self.LINK_COLOR if row["highlight"] else Qt.NoPen)
+        painter.setBrush(self.OWN_COLOR if row["own"] else self.FRIEND_COLOR)
+        painter.drawRoundedRect(bubble, 8, 8)
+
+        inner = bubble.adjusted(self.PADDING, self.PADDING, -self.PADDING, -self.PADDING)
+        painter.setFont(meta_font)
+        painter.setPen(self.META_COLOR)
+        painter.drawText(QRect(inner.left(), inner.top(), inner.width(), meta_height), Qt.AlignLeft, meta)
+
+        body_top = inner.top() + meta_height
+        if has_thumbnail:
+            self._paint_thumbnail(painter, index, row, QPoint(inner.left(), body_top))
+            body_top += THUMBNAIL_SIZE + self.PADDING
+
+        body_font = QFont(option.font)
+        body_font.setUnderline(bool(row["attachment"]))
+        painter.setFont(body_font)
+        painter.setPen(self.LINK_COLOR if row["attachment"] else self.TEXT_COLOR)
+        painter.drawText(
+            QRect(inner.left(), body_top, inner.width(), inner.bottom() - body_top),
+            Qt.TextWordWrap | Qt.AlignLeft, body,
+        )
+        painter.restore()
+
+    def _paint_thumbnail(self, painter, index, row, top_left):
+        """Draw the image preview if it is decoded, otherwise ask for it and leave the box empty."""
+        cache = get_thumbnail_cache()
+        path = row["attachment"]
+        pixmap = cache.cached(path, THUMBNAIL_SIZE, THUMBNAIL_SIZE)
+        if pixmap is not None:
+            painter.drawPixmap(top_left, pixmap)
+            return
+
+        if not row["thumbnail_pending"] and not cache.has_failed(path, THUMBNAIL_SIZE, THUMBNAIL_SIZE):
+            row["thumbnail_pending"] = True
+            model = index.model()
+            message_id = row["id"]
+            cache.request(path, THUMBNAIL_SIZE, THUMBNAIL_SIZE, lambda _: model.refresh_message(message_id))
+        painter.setPen(Qt.NoPen)
+        painter.setBrush(self.FRIEND_COLOR.darker(130))
+        painter.drawRoundedRect(QRect(top_left, QSize(THUMBNAIL_SIZE, THUMBNAIL_SIZE)), 4, 4)
+
+
+class MessageListView(QListView):
+    """
+    Virtualised chat view: rows are laid out in batches and painted on demand,
+    so a very long conversation scrolls as smoothly as a short one.
+    """
+
+    attachmentActivated = Signal(str)
+    reachedTop = Signal()
+    reachedBottom = Signal()
+
+    def __init__(self, user_id, parent=None):
+        super().__init__(parent)
+        self.message_model = MessageListModel(user_id, self)
+        self.setModel(self.message_model)
+        self.setItemDelegate(MessageDelegate(self))
+
+        self.setSelectionMode(QAbstractItemView.NoSelection)
+        self.setFocusPolicy(Qt.StrongFocus)
+        self.setVerticalScrollMode(QAbstractItemView.ScrollPerPixel)
+        self.setHorizontalScrollBarPolicy(Qt.ScrollBarAlwaysOff)
+        self.setUniformItemSizes(False)
+        self.setResizeMode(QListView.Adjust)
+        self.setLayoutMode(QListView.Batched)
+        self.setBatchSize(100)
+        self.setWordWrap(True)
+
+        self.clicked.connect(self._on_clicked)
+        self.verticalScrollBar().valueChanged.connect(self._on_scrolled)
+
+    def _on_clicked(self, index):
+        attachment = index.data(AttachmentRole)
+        if attachment:
+            self.attachmentActivated.emit(attachment)
+
+    def _on_scrolled(self, value):
+        scroll_bar = self.verticalScrollBar()
+        if scroll_bar.maximum() == 0:
+            return
+        if value == scroll_bar.minimum():
+            self.reachedTop.emit()
+        elif value == scroll_bar.maximum():
+            self.reachedBottom.emit()
+
+    def is_scrolled_to_bottom(self):
+        scroll_bar = self.verticalScrollBar()
+        return scroll_bar.value() >= scroll_bar.maximum() - 4
+
+    def can_scroll(self):
+        """True once the rows overflow the viewport (forces any pending layout first)."""
+        self.executeDelayedItemsLayout()
+        return self.verticalScrollBar().maximum() > 0
+
+    def set_messages(self, messages, scroll_to_bottom=True):
+        """Show a fresh page of history, scrolled to the newest message unless told otherwise."""
+        self.message_model.set_messages(messages)
+        if scroll_to_bottom:
+            self.scrollToBottom()
+
+    def append_messages(self, messages, follow=True):
+        """
+        Append messages. With follow, the view scrolls to them if the user was already
+        at the bottom; pass follow=False when appending a page the user is scrolling into.
+        """
+        follow = follow and self.is_scrolled_to_bottom()
+        self.message_model.append_messages(messages)
+        if follow:
+            self.scrollToBottom()
+
+    def scroll_to_message(self, message_id):
+        """Highlight a message and scroll it to the middle of the view."""
+        position = self.message_model.row_of_message(message_id)
+        if position < 0:
+            return
+        self.message_model.message_at(position)["highlight"] = True
+        self.scrollTo(self.message_model.index(position), QAbstractItemView.PositionAtCenter)
+
+    def prepend_messages(self, messages):
+        """Insert an older page above the current rows without moving what the user sees."""
+        anchor = self.indexAt(QPoint(0, 0))
+        offset = self.visualRect(anchor).top() if anchor.isValid() else 0
+
+        self.message_model.prepend_messages(messages)
+
+        if anchor.isValid():
+            self.scrollTo(self.message_model.index(anchor.row() + len(messages)), QAbstractItemView.PositionAtTop)
+            scroll_bar = self.verticalScrollBar()
+            scroll_bar.setValue(scroll_bar.value() - offset)
+
+    def append_system_line(self, text):
+        self.message_model.append_system_line(text)
+        self.scrollToBottom()
+
+    def clear(self):
+        self.message_model.clear()
@@ -5,30 +5,50 @@ import subprocess
 import sys
 
 import qtawesome as qta
-from PySide6.QtGui import QPixmap, QFont, QTextCursor
+from PySide6.QtGui import QFont
 from PySide6.QtWidgets import (
     QMainWindow, QLabel, QVBoxLayout, QHBoxLayout, QWidget, QFrame, QLineEdit,
-    QPushButton, QListWidget, QListWidgetItem, QTextEdit, QToolButton, QApplication, QInputDialog, QMessageBox,
-    QFileDialog, QDialog, QTextBrowser
+    QPushButton, QListWidget, QListWidgetItem, QToolButton, QApplication, QInputDialog, QMessageBox,
+    QFileDialog, QDialog, QTextBrowser, QProgressBar
 )
-from PySide6.QtCore import Qt, QSize, QTimer, QEvent
+from PySide6.QtCore import Qt, QSize
 from auth_view import login_window #avoiding circular imports
-from backend_controller import db_handler_friends
+from backend_controller import attachment_upload, db_config, db_handler_friends
+from backend_controller.broker_client import BrokerClient
+from backend_controller.db_executor import run_async
+from backend_controller.db_watcher import get_watcher
+from backend_controller.friend_graph import get_friend_graph
 from helpers.log_message import LogMessage
+from helpers.thumbnail_cache import get_thumbnail_cache
+from Message_app_view.message_list import MessageListView
 from Status_view.Status_dialog import StatusDialog
 from Create_Group_View.create_group import GroupDialog
+from Search_view.search_dialog import SearchDialog
 from AIDialog.AIDialog import AIDialog
-from backend_controller.db_handle_AI import analyze_sentiment,save_chat_message
+from backend_controller.ai_executor import run_ai_async
+from backend_controller.db_handle_AI import UNKNOWN_SENTIMENT_EMOJI, analyze_sentiment, save_chat_message
 from settings.SettingDialog import SettingDialog
 
 
 class MainWindow(QMainWindow):
-    chat_display: QTextEdit
+    chat_display: MessageListView
 
     def __init__(self, name, phone_number, user_id):
         super().__init__()
         self.selected_friend = None
-        self.message_poll_timer = None
+        self.friend_list = None
+        self.profile_pic_label = None
+        self.notification_button = None
+        # Highest message id shown per friend id, so polls only fetch the delta
+        self.last_seen_message_ids = {}
+        # Keyset cursor of the oldest page shown per friend id (None once fully loaded)
+        self.older_history_cursors = {}
+        self.loading_older_history = False
+        # Cursor of the newest page shown, while a search jump left newer messages unloaded
+        self.newer_history_cursors = {}
+        self.loading_newer_history = False
+        # One progress row per attachment still being stored and sent
+        self.upload_panel = None
         self.message_input = None
         self.login_window = None
         self.message = LogMessage()
@@ -36,6 +56,7 @@ class MainWindow(QMainWindow):
         self.ai = AIDialog(name, phone_number, user_id)
         self.setting = SettingDialog(user_id, name, phone_number)
         self.status = StatusDialog(user_id)
+        self.search = SearchDialog(user_id)
         self.setWindowTitle("ChatHub")
         self.setFixedSize(1110, 660)
         self.setStyleSheet("background-color: #2c3e50; color: white;")
@@ -43,17 +64,21 @@ class MainWindow(QMainWindow):
         self.phone_number = phone_number
         self.user_id = user_id
 
-        # Start polling for new messages
-        self.start_polling_for_messages()
+        # Get woken up when messages or notifications change
+        self.start_watching_for_changes()
 
-        #invoke friend requests
-        db_handler_friends.check_friend_requests(self.user_id)
+        # Real-time delivery through the local message broker, when enabled
+        self.broker = None
+        self.pending_broker_sends = {}
+        if db_config.get_setting("use_broker", "0").lower() in ("1", "true", "yes"):
+            self.start_broker_client()
 
-        notifications = db_handler_friends.fetch_notifications(self.user_id, "notifications")
-        message_notifications = db_handler_friends.fetch_notifications(self.user_id, "message_notifications")
-        if notifications:
-            self.message.show_success_message(
-                f"Hey {self.name}! You have {len(notifications) + len(message_notifications)} new notifications. Click the bell icon to view them.")
+        # Look up pending friend requests off the GUI thread, then offer to answer them
+        run_async(
+            db_handler_friends.fetch_pending_friend_requests, self.user_id,
+            on_result=lambda sender_names: db_handler_friends.prompt_friend_requests(
+                self.user_id, sender_names, self),
+        )
 
 
         # Apply tooltip style globally
@@ -84,7 +109,22 @@ class MainWindow(QMainWindow):
         central_widget.setLayout(main_layout)
         self.setCentralWidget(central_widget)
 
-        message_notifications = db_handler_friends.fetch_notifications(self.user_id, "message_notifications")
+        # Fetch unread notifications off the GUI thread and report once they arrive
+        run_async(
+            lambda: (
+                db_handler_friends.fetch_notifications(self.user_id, "notifications"),
+                db_handler_friends.fetch_notifications(self.user_id, "message_notifications"),
+            ),
+            on_result=self.show_notification_summary,
+        )
+
+    def show_notification_summary(self, result):
+        """Tells the user how many unread notifications are waiting."""
+        notifications, message_notifications = result
+        if notifications:
+            self.message.show_success_message(
+                f"Hey {self.name}! You have {len(notifications) + len(message_notifications)} new notifications. Click the bell icon to view them.")
+
         if message_notifications:
                 self.message.show_success_message(f"You have {len(message_notifications)} new messages. Click the bell icon to view them.")
 
@@ -103,6 +143,7 @@ class MainWindow(QMainWindow):
             ("fa.user", "Profile", self.handle_profile_click),
             ("fa.group", "Create Group", self.handle_create_group_click),
             ("fa.comments", "Message Group", self.handle_message_group),
+            ("fa.search", "Search Messages", self.handle_search_click),
             ("fa.plus-circle", "Add Friend", self.handle_add_friend_click),
             ("fa.minus-circle", "Remove Friend", self.handle_remove_friend_click),
             ("fa.cog", "Settings", self.handle_settings_click),
@@ -130,6 +171,8 @@ class MainWindow(QMainWindow):
             )
             btn.clicked.connect(handler)
             icon_layout.addWidget(btn, alignment=Qt.AlignHCenter)
+            if handler == self.handle_notification_click:
+                self.notification_button = btn
 
         # Left section container for icons
         icon_container = QWidget()
@@ -167,18 +210,13 @@ class MainWindow(QMainWindow):
             """
         )
 
-        # fetch friends from the database
-        friends = db_handler_friends.load_friends(self.user_id)
-        for friend in friends:
-            item = QListWidgetItem(friend[0])
-            friend_list.addItem(item)
-
-        if not friends:
-            no_friends_item = QListWidgetItem("No friends found. \nClick '+' to add friends.")
-            no_friends_item.setFlags(no_friends_item.flags() & ~Qt.ItemIsSelectable)
-            friend_list.addItem(no_friends_item)
+        # fetch friends from the database in the background (once per session, then served from memory)
+        self.friend_list = friend_list
+        run_async(self.load_friend_graph, self.user_id, on_result=self.populate_friend_list)
 
         friend_list.itemClicked.connect(self.open_chat_with_friend)
+        # Accepted friend requests show up without reloading the list from the database
+        get_friend_graph(self.user_id).add_listener(self.refresh_friend_list)
 
         # Right section container for friend list
         friend_list_container = QWidget()
@@ -195,18 +233,42 @@ class MainWindow(QMainWindow):
         sidebar_container.setFixedWidth(300)  # Adjust the overall width
         return sidebar_container
 
+    @staticmethod
+    def load_friend_graph(user_id):
+        """Runs on a worker thread: (re)reads the friend graph for this session."""
+        get_friend_graph(user_id).load(force=True)
+        return db_handler_friends.load_friends(user_id)
+
+    def refresh_friend_list(self):
+        """Re-renders the friend list from the (already loaded) friend graph."""
+        self.populate_friend_list(db_handler_friends.load_friends(self.user_id))
+
+    def populate_friend_list(self, friends):
+        """Fills the sidebar friend list once load_friends returns."""
+        self.friend_list.clear()
+        for friend in friends:
+            item = QListWidgetItem(friend[0])
+            self.friend_list.addItem(item)
+
+        if not friends:
+            no_friends_item = QListWidgetItem("No friends found. \nClick '+' to add friends.")
+            no_friends_item.setFlags(no_friends_item.flags() & ~Qt.ItemIsSelectable)
+            self.friend_list.addItem(no_friends_item)
+
     def create_chat_area(self):
         """Creates the chat area where conversations happen."""
         chat_area = QVBoxLayout()
         chat_area.setContentsMargins(10, 10, 10, 10)
         chat_area.setSpacing(15)
 
-        # Load profile picture or placeholder
-        profile_pic_path = db_handler_friends.get_profile_picture_path_from_db(self.user_id)
+        # Load profile picture or placeholder (the path is looked up in the background)
         profile_pic_label = QLabel()
-        profile_pixmap = QPixmap(profile_pic_path).scaled(50, 50, Qt.KeepAspectRatio, Qt.SmoothTransformation)
-        profile_pic_label.setPixmap(profile_pixmap)
         profile_pic_label.setFixedSize(50, 50)
+        self.profile_pic_label = profile_pic_label
+        run_async(
+            db_handler_friends.get_profile_picture_path_from_db, self.user_id,
+            on_result=self.set_profile_picture,
+        )
         profile_pic_label.setCursor(Qt.PointingHandCursor)
         profile_pic_label.setStyleSheet("border-radius: 25px; border: 2px solid #1abc9c;")
         profile_pic_label.mousePressEvent = self.handle_profile_click  # Open dialog on click
@@ -224,11 +286,10 @@ class MainWindow(QMainWindow):
         chat_area.addWidget(chat_header, alignment=Qt.AlignLeft)
 
         # Chat display area
-        self.chat_display = QTextEdit()
-        self.chat_display.setReadOnly(True)
+        self.chat_display = MessageListView(self.user_id)
         self.chat_display.setStyleSheet(
             """
-            QTextEdit {
+            QListView {
                 background-color: #34495e;
                 color: white;
                 font-size: 16px;
@@ -238,8 +299,16 @@ class MainWindow(QMainWindow):
             }
             """
         )
+        # Scrolling to the top pulls in the previous page of history
+        self.chat_display.reachedTop.connect(self.load_older_history)
+        self.chat_display.reachedBottom.connect(self.load_newer_history)
+        self.chat_display.attachmentActivated.connect(self.open_attachment)
         chat_area.addWidget(self.chat_display)
 
+        # Progress of attachments being sent in the background
+        self.upload_panel = QVBoxLayout()
+        chat_area.addLayout(self.upload_panel)
+
         # Message input and send button
         input_layout = QHBoxLayout()
 
@@ -361,11 +430,77 @@ class MainWindow(QMainWindow):
         chat_area_container.setLayout(chat_area)
         return chat_area_container
 
-    def start_polling_for_messages(self):
-        """Starts a timer to poll for new messages."""
-        self.message_poll_timer = QTimer()
-        self.message_poll_timer.timeout.connect(self.check_for_new_messages)
-        self.message_poll_timer.start(2000)  # Poll every 2 seconds
+    def set_profile_picture(self, profile_pic_path):
+        """Shows the profile picture once its path has been fetched."""
+        # retry=True: the file at this path may have been replaced since it was last decoded
+        get_thumbnail_cache().request(profile_pic_path, 50, 50, self.show_profile_thumbnail, retry=True)
+
+    def show_profile_thumbnail(self, pixmap):
+        """Puts the decoded avatar on the profile label."""
+        if pixmap is not None:
+            self.profile_pic_label.setPixmap(pixmap)
+
+    def start_watching_for_changes(self):
+        """Subscribes to database change notifications instead of polling on a timer."""
+        watcher = get_watcher()
+        watcher.subscribe("messages", self.check_for_new_messages)
+        watcher.subscribe("notifications", self.refresh_notification_count)
+        watcher.subscribe("message_notifications", self.refresh_notification_count)
+
+    def stop_watching_for_changes(self):
+        """Drops this window's change subscriptions."""
+        watcher = get_watcher()
+        watcher.unsubscribe("messages", self.check_for_new_messages)
+        watcher.unsubscribe("notifications", self.refresh_notification_count)
+        watcher.unsubscribe("message_notifications", self.refresh_notification_count)
+
+    def closeEvent(self, event):
+        self.stop_watching_for_changes()
+        attachment_upload.cancel_all()
+        get_friend_graph(self.user_id).remove_listener(self.refresh_friend_list)
+        if self.broker:
+            self.broker.stop()
+        super().closeEvent(event)
+
+    def start_broker_client(self):
+        """Connects to the local message broker on a background thread."""
+        self.broker = BrokerClient(self.user_id)
+        self.broker.messageReceived.connect(self.on_broker_message)
+        self.broker.sendAcknowledged.connect(self.on_broker_ack)
+        self.broker.sendFailed.connect(self.on_broker_error)
+        self.broker.start()
+
+    def on_broker_message(self, event):
+        """Pulls the delta when the broker pushes a message for the open chat."""
+        if self.selected_friend and self.selected_friend["id"] in (event["sender_id"], event["receiver_id"]):
+            self.check_for_new_messages()
+
+    def on_broker_ack(self, event):
+        """The broker has persisted one of our sends."""
+        friend = self.pending_broker_sends.pop(event.get("ref"), None)
+        if friend:
+            self.on_message_sent(friend)
+
+    def on_broker_error(self, event):
+        """The broker rejected one of our sends, or the connection dropped before it answered."""
+        friend = self.pending_broker_sends.pop(event.get("ref"), None)
+        if friend and event.get("disconnected") and self.selected_friend \
+                and self.selected_friend["id"] == friend["id"]:
+            # The broker may have stored the message before the connection dropped
+            self.check_for_new_messages()
+        QMessageBox.warning(self, "Error", f"Failed to send message: {event.get('message')}")
+
+    def refresh_notification_count(self):
+        """Shows the unread notification count on the bell icon's tooltip."""
+        run_async(
+            lambda: (
+                len(db_handler_friends.fetch_notifications(self.user_id, "notifications"))
+                + len(db_handler_friends.fetch_notifications(self.user_id, "message_notifications"))
+            ),
+            on_result=lambda count: self.notification_button.setToolTip(
+                f"Notification ({count} unread)" if count else "Notification"
+            ),
+        )
 
     def check_for_new_messages(self):
         """Checks for new messages from the database."""
@@ -375,17 +510,31 @@ class MainWindow(QMainWindow):
         if not selected_friend:
             return
 
-            # Append the latest message to the chat display (if not already shown)
-        latest_message = db_handler_friends.check_for_new_messages(self.user_id, selected_friend["id"])
+        friend_id = selected_friend["id"]
+        if friend_id not in self.last_seen_message_ids:
+            return  # History is still loading; it sets the high-water mark
+        if self.newer_history_cursors.get(friend_id) is not None:
+            return  # Showing an older stretch after a search jump; newer pages load on scroll
+
+        # Fetch only the messages newer than what is already on screen
+        run_async(
+            db_handler_friends.fetch_new_messages, self.user_id, friend_id,
+            self.last_seen_message_ids[friend_id],
+            on_result=lambda new_messages: self.append_new_messages(friend_id, new_messages),
+        )
 
-        if latest_message:
-            sender_id, content, timestamp = latest_message
-            sender = "You" if sender_id == self.user_id else "Friend"
+    def append_new_messages(self, friend_id, new_messages):
+        """Appends messages past the conversation's high-water mark."""
+        if not self.selected_friend or self.selected_friend["id"] != friend_id:
+            return  # The user switched chats while the query was running
 
-            # Check if the message is already displayed
-            last_message = self.chat_display.toPlainText().split("\n")[-1]
-            if last_message != f"{sender} ({timestamp}): {content}":
-                self.chat_display.append(f"{sender} ({timestamp}): {content}")
+        last_seen_id = self.last_seen_message_ids.get(friend_id, 0)
+        # Two overlapping polls can return the same rows; skip what is shown
+        fresh = [message for message in new_messages if message[0] > last_seen_id]
+        if not fresh:
+            return
+        self.chat_display.append_messages(fresh)
+        self.last_seen_message_ids[friend_id] = fresh[-1][0]
 
     def handle_status_click(self):
         """Opens a dialog to post a status."""
@@ -404,9 +553,15 @@ class MainWindow(QMainWindow):
         current_pic_label = QLabel("Current Picture:")
         layout.addWidget(current_pic_label)
         current_profile_pic = QLabel()
-        current_pixmap = QPixmap(db_handler_friends.get_profile_picture_path_from_db(self.user_id)).scaled(100, 100, Qt.KeepAspectRatio,
-                                                                                 Qt.SmoothTransformation)
-        current_profile_pic.setPixmap(current_pixmap)
+
+        def show_current_picture(pixmap):
+            if pixmap is not None:
+                current_profile_pic.setPixmap(pixmap)
+
+        # The picture is decoded in the background and appears when ready
+        get_thumbnail_cache().request(
+            db_handler_friends.get_profile_picture_path_from_db(self.user_id), 100, 100, show_current_picture,
+            retry=True)
         current_profile_pic.setFixedSize(100, 100)
         current_profile_pic.setStyleSheet("border-radius: 50px; border: 2px solid #1abc9c;")
         layout.addWidget(current_profile_pic, alignment=Qt.AlignCenter)
@@ -466,18 +621,38 @@ class MainWindow(QMainWindow):
     def handle_notification_click(self):
         """Display notifications for the user."""
         self.chat_display.clear()
+        # The chat is no longer on screen: deselect it so the watcher, the broker and
+        # in-flight history pages stop writing into this view. Opening it again reloads it.
+        if self.selected_friend:
+            self.reset_history_state(self.selected_friend["id"])
+            self.selected_friend = None
+            self.friend_list.clearSelection()
+
+        run_async(
+            self.take_notifications, self.user_id,
+            on_result=self.show_notifications,
+            on_error=lambda e: QMessageBox.warning(self, "Error", f"Failed to load notifications: {str(e)}"),
+        )
 
-        message_notifications = db_handler_friends.fetch_notifications(self.user_id, "message_notifications")
+    @staticmethod
+    def take_notifications(user_id):
+        """Runs on a worker thread: returns the unread notifications and marks them as read."""
+        message_notifications = db_handler_friends.fetch_notifications(user_id, "message_notifications")
         if message_notifications:
-            for _, message, created_at in message_notifications:
-                self.chat_display.append(f"[{created_at}]: {message}")
-            db_handler_friends.mark_notifications_as_read(self.user_id, "message_notifications")
+            db_handler_friends.mark_notifications_as_read(user_id, "message_notifications")
 
-        notifications = db_handler_friends.fetch_notifications(self.user_id, "notifications")
+        notifications = db_handler_friends.fetch_notifications(user_id, "notifications")
         if notifications:
-            for notification_id, message, created_at in notifications:
-                self.chat_display.append(f"[{created_at}]: {message}")
-            db_handler_friends.mark_notifications_as_read(self.user_id, "notifications")
+            db_handler_friends.mark_notifications_as_read(user_id, "notifications")
+        return message_notifications, notifications
+
+    def show_notifications(self, result):
+        """Lists the notifications returned by take_notifications."""
+        message_notifications, notifications = result
+        for _, message, created_at in message_notifications:
+            self.chat_display.append_system_line(f"[{created_at}]: {message}")
+        for _, message, created_at in notifications:
+            self.chat_display.append_system_line(f"[{created_at}]: {message}")
 
         if not message_notifications and not notifications:
             QMessageBox.information(self, "No Notifications", "You have no notifications.")
@@ -561,31 +736,34 @@ class MainWindow(QMainWindow):
     def open_chat_with_friend(self, item):
         """Handle opening a chat with a selected friend."""
         self.chat_display.clear()
-        self.chat_display.append(f"Chatting with {item.text()}...\n")
+        self.chat_display.append_system_line(f"Chatting with {item.text()}...")
         self.chat_display.setFocus()
 
         # Get friend name from the item text
         friend_name = item.text()
 
 
-        # Load friends data (should be a list of tuples like [(friend_name, friend_id), ...])
-        friends = db_handler_friends.load_friends(self.user_id)
+        # Look the friend up by name in the shared friend graph (a dict hit)
+        friend_id = get_friend_graph(self.user_id).get_id(friend_name)
 
-        # Use a generator expression to find the tuple matching the selected friend name
-        friend_data = next((friend for friend in friends if friend[0] == friend_name), None)
-
-        if not friend_data:
+        if friend_id is None:
             QMessageBox.warning(self, "Warning", f"Could not find details for {friend_name}.")
             return
 
-        # Now, friend_data is expected to be a tuple like (friend_name, friend_id)
         self.selected_friend = {
-            "id": friend_data[1],  # Friend's numeric ID
+            "id": friend_id,  # Friend's numeric ID
             "name": friend_name,
         }
 
-        # Load chat history with the selected friend
-        self.load_chat_history(friend_data[1])
+        # Load chat history with the selected friend (it resets the high-water mark)
+        self.reset_history_state(friend_id)
+        self.load_chat_history(friend_id)
+
+    def reset_history_state(self, friend_id):
+        """Forgets the paging cursors and high-water mark before a chat is (re)loaded."""
+        self.last_seen_message_ids.pop(friend_id, None)
+        self.older_history_cursors.pop(friend_id, None)
+        self.newer_history_cursors.pop(friend_id, None)
 
     def send_message(self):
         """Handles sending messages."""
@@ -602,61 +780,180 @@ class MainWindow(QMainWindow):
             QMessageBox.warning(self, "Warning", "Cannot send an empty message.")
             return
 
-        # Save the message to the database
-        db_handler_friends.save_message(self.user_id, selected_friend["id"], message_content)
-
         # Clear the message input field
         self.message_input.clear()
 
-        # Refresh the chat display for both sender and receiver
-        self.load_chat_history(selected_friend["id"])
+        # Prefer the broker, which persists the message and pushes it to the receiver
+        if self.broker and self.broker.connected:
+            try:
+                ref = self.broker.send_message(selected_friend["id"], message_content)
+                self.pending_broker_sends[ref] = selected_friend
+                return
+            except ConnectionError as e:
+                print(f"Broker unavailable, saving locally: {e}")
+
+        # Save the message to the database in the background, then refresh the chat display
+        run_async(
+            db_handler_friends.save_message, self.user_id, selected_friend["id"], message_content,
+            on_result=lambda _: self.on_message_sent(selected_friend),
+            on_error=lambda e: QMessageBox.warning(self, "Error", f"Failed to send message: {str(e)}"),
+        )
+
+    def on_message_sent(self, friend):
+        """Shows the sent message once save_message has committed."""
+        self.check_for_new_messages()
 
-        QMessageBox.information(self, "Success", f"Message sent to {selected_friend['name']}!")
+        QMessageBox.information(self, "Success", f"Message sent to {friend['name']}!")
 
     def load_chat_history(self, friend_id):
-        """Loads the chat history between the current user and the selected friend."""
-        chat_history = db_handler_friends.load_chat_history_db(self.user_id, friend_id)
+        """Loads the newest page of the chat history with the selected friend."""
+        run_async(
+            db_handler_friends.load_chat_history_db, self.user_id, friend_id,
+            on_result=lambda page: self.show_chat_history(friend_id, *page),
+            on_error=lambda e: QMessageBox.warning(self, "Error", f"Failed to load chat history: {str(e)}"),
+        )
+
+    def show_chat_history(self, friend_id, chat_history, older_cursor):
+        """Renders the newest page returned by load_chat_history_db."""
+        if not self.selected_friend or self.selected_friend["id"] != friend_id:
+            return  # A different chat was opened while the query was running
+
+        # Replace the chat display with the conversation in one model reset
+        self.chat_display.set_messages(chat_history)
+
+        # Start polling from the newest message on screen
+        self.last_seen_message_ids[friend_id] = chat_history[-1][0] if chat_history else 0
+        self.older_history_cursors[friend_id] = older_cursor
+        self.loading_older_history = False
+
+        # The first page may not fill the view, leaving nothing to scroll
+        if not self.chat_display.can_scroll():
+            self.load_older_history()
+
+    def load_older_history(self):
+        """Loads the page before the oldest message on screen, if there is one."""
+        if not self.selected_friend or self.loading_older_history:
+            return
+
+        friend_id = self.selected_friend["id"]
+        older_cursor = self.older_history_cursors.get(friend_id)
+        if older_cursor is None:
+            return  # Nothing older, or the first page is still loading
+
+        self.loading_older_history = True
+        run_async(
+            db_handler_friends.load_chat_history_db, self.user_id, friend_id, older_cursor,
+            on_result=lambda page: self.prepend_chat_history(friend_id, older_cursor, *page),
+            on_error=lambda e: self.on_older_history_failed(e),
+        )
+
+    def on_older_history_failed(self, error):
+        self.loading_older_history = False
+        QMessageBox.warning(self, "Error", f"Failed to load older messages: {str(error)}")
+
+    def prepend_chat_history(self, friend_id, requested_cursor, chat_history, older_cursor):
+        """Inserts an older page above the messages on screen, keeping the scroll position."""
+        self.loading_older_history = False
+        if (not self.selected_friend or self.selected_friend["id"] != friend_id
+                or self.older_history_cursors.get(friend_id) != requested_cursor):
+            return  # The chat was switched or reloaded while the query was running
+
+        self.older_history_cursors[friend_id] = older_cursor
+        self.chat_display.prepend_messages(chat_history)
+
+        if not self.chat_display.can_scroll():
+            self.load_older_history()
+
+    def load_newer_history(self):
+        """Loads the page after the newest message on screen when a search jump left a gap."""
+        if not self.selected_friend or self.loading_newer_history:
+            return
 
-        # Clear the chat display and load the conversation
+        friend_id = self.selected_friend["id"]
+        newer_cursor = self.newer_history_cursors.get(friend_id)
+        if newer_cursor is None:
+            return  # Already showing the newest messages
+
+        self.loading_newer_history = True
+        run_async(
+            db_handler_friends.load_newer_chat_history_db, self.user_id, friend_id, newer_cursor,
+            on_result=lambda page: self.append_newer_history(friend_id, newer_cursor, *page),
+            on_error=lambda e: self.on_newer_history_failed(e),
+        )
+
+    def on_newer_history_failed(self, error):
+        self.loading_newer_history = False
+        QMessageBox.warning(self, "Error", f"Failed to load newer messages: {str(error)}")
+
+    def append_newer_history(self, friend_id, requested_cursor, chat_history, newer_cursor):
+        """Appends the next page below the messages on screen."""
+        self.loading_newer_history = False
+        if (not self.selected_friend or self.selected_friend["id"] != friend_id
+                or self.newer_history_cursors.get(friend_id) != requested_cursor):
+            return  # The chat was switched or reloaded while the query was running
+
+        self.newer_history_cursors[friend_id] = newer_cursor
+        self.chat_display.append_messages(chat_history, follow=False)
+        if chat_history:
+            self.last_seen_message_ids[friend_id] = max(
+                self.last_seen_message_ids.get(friend_id, 0), max(message[0] for message in chat_history))
+
+        if newer_cursor is None:
+            # Caught up with the newest page; pick up anything sent meanwhile
+            self.check_for_new_messages()
+
+    def handle_search_click(self):
+        """Opens the message search panel."""
+        self.search.show_search_dialog(self.open_search_result, self.selected_friend)
+
+    def open_search_result(self, dialog, result):
+        """Opens the conversation containing a search hit."""
+        message_id, _, friend_id, group_id, conversation_name, _, _, _ = result
+        if group_id is not None:
+            # Group chats open in their own dialog (this also closes the search panel)
+            self.group.open_group_chat(dialog, group_id)
+            return
+
+        dialog.accept()
+        self.jump_to_message(friend_id, conversation_name, message_id)
+
+    def jump_to_message(self, friend_id, friend_name, message_id):
+        """Opens the chat with a friend scrolled to one message."""
+        matches = self.friend_list.findItems(friend_name, Qt.MatchExactly)
+        if matches:
+            self.friend_list.setCurrentItem(matches[0])
+
+        self.selected_friend = {"id": friend_id, "name": friend_name}
         self.chat_display.clear()
+        self.chat_display.append_system_line(f"Chatting with {friend_name}...")
+        self.reset_history_state(friend_id)
 
-        for sender_id, content, timestamp, message_type in chat_history:
-             sender = "You" if sender_id == self.user_id else "Friend"
-
-             if message_type in ["image", "doc"]:
-                 try:
-                     # File message: add the file link with the anchor tag
-                     file_path = content
-                     file_name = os.path.basename(file_path)
-                     file_link = f'<a href="{file_path}" style="color: #1abc9c; text-decoration: underline;">{file_name}</a>'
-                     self.chat_display.append(f"{sender} ({timestamp}): [FILE] [Click to open]==> {file_link}")
-                     print(f"Debug: {sender} ({timestamp}): {file_link}")
-                 except Exception as e:
-                     self.chat_display.append(f"[{message_type.upper()}]: (Error loading file)")
-                     print(f"Error displaying file: {str(e)}")
-             else:
-                 # Regular text messages
-                 self.chat_display.append(f"{sender} ({timestamp}): {content}")
-
-        self.chat_display.viewport().installEventFilter(self)
-
-    def eventFilter(self, source, event):
-        if source is self.chat_display.viewport() and event.type() == QEvent.MouseButtonRelease:
-            cursor = self.chat_display.cursorForPosition(event.pos())
-            char_format = cursor.charFormat()
-
-            # Check if the clicked text is a hyperlink
-            if char_format.isAnchor():
-                clicked_text = char_format.anchorHref()  # Extract the full href value
-                if os.path.isfile(clicked_text):  # Check if it's a valid file path
-                    print(f"Opening file: {clicked_text}")
-                    self.open_file(clicked_text)
-                    return True
-                else:
-                    print(f"Clicked text is not a valid file path: {clicked_text}")
-            else:
-                print("No anchor clicked.")
-        return super().eventFilter(source, event)
+        run_async(
+            db_handler_friends.load_chat_history_around, self.user_id, friend_id, message_id,
+            on_result=lambda page: self.show_history_around(friend_id, message_id, *page),
+            on_error=lambda e: QMessageBox.warning(self, "Error", f"Failed to load chat history: {str(e)}"),
+        )
+
+    def show_history_around(self, friend_id, message_id, chat_history, older_cursor, newer_cursor):
+        """Renders the page around a search hit and scrolls to the hit."""
+        if not self.selected_friend or self.selected_friend["id"] != friend_id:
+            return
+
+        self.chat_display.set_messages(chat_history, scroll_to_bottom=False)
+        self.last_seen_message_ids[friend_id] = max((message[0] for message in chat_history), default=0)
+        self.older_history_cursors[friend_id] = older_cursor
+        self.newer_history_cursors[friend_id] = newer_cursor
+        self.loading_older_history = False
+        self.loading_newer_history = False
+        self.chat_display.scroll_to_message(message_id)
+
+    def open_attachment(self, file_path):
+        """Opens an image or document attachment that was clicked in the chat."""
+        if os.path.isfile(file_path):
+            print(f"Opening file: {file_path}")
+            self.open_file(file_path)
+        else:
+            print(f"Clicked text is not a valid file path: {file_path}")
 
     def open_file(self, file_path):
         """Opens the specified file with the default application."""
@@ -689,18 +986,7 @@ class MainWindow(QMainWindow):
             self, "Select Image", "", "Images (*.png *.jpg *.jpeg *.bmp *.gif)"
         )
         if file_path:
-            try:
-                # Save the image path in the database
-                db_handler_friends.save_file_message(
-                    sender_id=self.user_id,
-                    receiver_id=selected_friend["id"],
-                    file_path=file_path,
-                    file_type="image",
-                )
-                # Reload chat history to display the clickable text
-                self.load_chat_history(selected_friend["id"])
-            except Exception as e:
-                QMessageBox.critical(self, "Error", f"Failed to send the image: {str(e)}")
+            self.start_attachment_upload(selected_friend, file_path, "image")
 
     def send_doc(self):
         """Handles sending document files."""
@@ -713,18 +999,48 @@ class MainWindow(QMainWindow):
             self, "Select Document", "", "Documents (*.pdf *.doc *.docx *.txt *.xls *.xlsx)"
         )
         if file_path:
-            try:
-                # Save the document path in the database
-                db_handler_friends.save_file_message(
-                    sender_id=self.user_id,
-                    receiver_id=selected_friend["id"],
-                    file_path=file_path,
-                    file_type="document",
-                )
-                # Reload chat history to display the clickable text
-                self.load_chat_history(selected_friend["id"])
-            except Exception as e:
-                QMessageBox.critical(self, "Error", f"Failed to send the document: {str(e)}")
+            self.start_attachment_upload(selected_friend, file_path, "document")
+
+    def start_attachment_upload(self, friend, file_path, file_type):
+        """Stores and sends a file in the background, showing its progress above the input."""
+        upload = attachment_upload.start_upload(self.user_id, friend["id"], file_path, file_type)
+
+        row = QWidget()
+        row_layout = QHBoxLayout(row)
+        row_layout.setContentsMargins(0, 0, 0, 0)
+        status_label = QLabel(f"Sending {upload.name}...")
+        progress_bar = QProgressBar()
+        progress_bar.setRange(0, 100)
+        progress_bar.setStyleSheet(
+            "QProgressBar { border: 1px solid #1abc9c; border-radius: 5px; text-align: center; }"
+            "QProgressBar::chunk { background-color: #1abc9c; }")
+        cancel_button = QPushButton("Cancel")
+        cancel_button.setCursor(Qt.PointingHandCursor)
+        cancel_button.setStyleSheet(
+            "background-color: #e74c3c; color: white; padding: 5px 10px; border: none; border-radius: 5px;")
+        cancel_button.clicked.connect(upload.cancel)
+        row_layout.addWidget(status_label)
+        row_layout.addWidget(progress_bar, 1)
+        row_layout.addWidget(cancel_button)
+        self.upload_panel.addWidget(row)
+
+        def show_progress(stage, done, total):
+            status_label.setText(f"{'Checking' if stage == 'hashing' else 'Sending'} {upload.name}...")
+            progress_bar.setValue(int(done * 100 / total) if total else 100)
+
+        def on_finished(_):
+            row.deleteLater()
+            if self.selected_friend and self.selected_friend["id"] == friend["id"]:
+                self.check_for_new_messages()
+
+        def on_failed(e):
+            row.deleteLater()
+            QMessageBox.critical(self, "Error", f"Failed to send the {file_type}: {str(e)}")
+
+        upload.progress.connect(show_progress)
+        upload.finished.connect(on_finished)
+        upload.failed.connect(on_failed)
+        upload.cancelled.connect(row.deleteLater)
 
     def handle_view_status_click(self):
         """Handle view status button click."""
@@ -739,14 +1055,21 @@ class MainWindow(QMainWindow):
         user_message = self.message_input.text()
         if not user_message.strip():
             return
+        self.message_input.clear()
 
-        # Analyze sentiment and add emojis
-        emojis = analyze_sentiment(user_message)
+        # Analyze sentiment on the AI pool; without an answer in time the message goes out undecorated
+        run_ai_async(
+            analyze_sentiment, user_message,
+            on_result=lambda emojis: self.show_message_with_emojis(user_message, emojis),
+            on_error=lambda e: self.show_message_with_emojis(user_message, UNKNOWN_SENTIMENT_EMOJI),
+            on_timeout=lambda: self.show_message_with_emojis(user_message, UNKNOWN_SENTIMENT_EMOJI),
+        )
+
+    def show_message_with_emojis(self, user_message, emojis):
+        """Shows the decorated message and saves it in the background."""
         full_message = f"{user_message} {emojis}"
-        self.chat_display.append(f"You: {full_message}")
+        self.chat_display.append_system_line(f"You: {full_message}")
 
         # Save message to the database
-        save_chat_message(self.user_id, full_message, None)  # No suggestions here
-
-        self.message_input.clear()
+        run_async(save_chat_message, self.user_id, full_message, None)  # No suggestions here
 
@@ -0,0 +1,124 @@
+from PySide6.QtCore import Qt, QTimer
+from PySide6.QtWidgets import QDialog, QVBoxLayout, QLineEdit, QCheckBox, QListWidget, QListWidgetItem, QLabel
+
+from backend_controller import db_handler_conversations, db_handler_search
+from backend_controller.db_executor import run_async
+
+# Wait this long after the last keystroke before searching (ms)
+SEARCH_DELAY_MS = 250
+
+
+class SearchDialog:
+    def __init__(self, user_id):
+        self.user_id = user_id
+        # Bumped on every search so late results from an older query are dropped
+        self.search_generation = 0
+
+    def show_search_dialog(self, on_result_chosen, current_friend=None):
+        """
+        Shows the message search panel.
+
+        Args:
+            on_result_chosen (callable): Called with (dialog, result) when a result is
+                double-clicked; result is a search_messages tuple.
+            current_friend (dict, optional): The open chat, offered as a "this chat only" filter.
+        """
+        dialog = QDialog()
+        dialog.setWindowTitle("Search Messages")
+        dialog.setMinimumSize(600, 500)
+        dialog.setStyleSheet("background-color: #2c3e50; color: white;")
+
+        layout = QVBoxLayout(dialog)
+
+        search_input = QLineEdit()
+        search_input.setPlaceholderText("Search messages...")
+        search_input.setStyleSheet(
+            "font-size: 16px; padding: 10px; border: 1px solid #1abc9c; border-radius: 5px;")
+        layout.addWidget(search_input)
+
+        this_chat_only = QCheckBox(
+            f"Only in my chat with {current_friend['name']}" if current_friend else "Only in the open chat")
+        this_chat_only.setEnabled(current_friend is not None)
+        layout.addWidget(this_chat_only)
+
+        status_label = QLabel("Type to search your chats and groups.")
+        status_label.setStyleSheet("color: #bdc3c7;")
+        layout.addWidget(status_label)
+
+        results_list = QListWidget()
+        results_list.setWordWrap(True)
+        results_list.setStyleSheet(
+            """
+            QListWidget {
+                background-color: #34495e;
+                border: none;
+                color: white;
+                font-size: 14px;
+            }
+            QListWidget::item {
+                padding: 8px;
+                border-bottom: 1px solid #2c3e50;
+            }
+            QListWidget::item:hover {
+                background-color: #16a085;
+            }
+            """
+        )
+        results_list.itemDoubleClicked.connect(
+            lambda item: on_result_chosen(dialog, item.data(Qt.UserRole)))
+        layout.addWidget(results_list)
+
+        # Debounce: search once the user pauses typing
+        timer = QTimer(dialog)
+        timer.setSingleShot(True)
+        timer.setInterval(SEARCH_DELAY_MS)
+        timer.timeout.connect(lambda: self.run_search(
+            search_input.text(),
+            current_friend["id"] if current_friend and this_chat_only.isChecked() else None,
+            results_list, status_label,
+        ))
+        search_input.textChanged.connect(lambda _: timer.start())
+        this_chat_only.toggled.connect(lambda _: timer.start())
+
+        dialog.exec()
+
+    def run_search(self, text, friend_id, results_list, status_label):
+        """Runs the search on a worker thread and shows the results when they arrive."""
+        self.search_generation += 1
+        generation = self.search_generation
+
+        if not text.strip():
+            results_list.clear()
+            status_label.setText("Type to search your chats and groups.")
+            return
+
+        user_id = self.user_id
+
+        def search():
+            conversation_id = None
+            if friend_id is not None:
+                conversation_id = db_handler_conversations.get_direct_conversation_id(user_id, friend_id)
+            return db_handler_search.search_messages(user_id, text, conversation_id)
+
+        status_label.setText("Searching...")
+        run_async(
+            search,
+            on_result=lambda results: self.show_results(generation, results, results_list, status_label),
+            on_error=lambda e: status_label.setText(f"Search failed: {str(e)}"),
+        )
+
+    def show_results(self, generation, results, results_list, status_label):
+        """Fills the result list, unless a newer search has started since."""
+        if generation != self.search_generation:
+            return
+
+        results_list.clear()
+        for result in results:
+            _, _, friend_id, group_id, conversation_name, sender_name, timestamp, snippet = result
+            where = f"Group {conversation_name}" if group_id is not None else conversation_name
+            item = QListWidgetItem(f"{where} - {sender_name} ({timestamp})\n{snippet}")
+            item.setData(Qt.UserRole, result)
+            results_list.addItem(item)
+
+        status_label.setText(
+            f"{len(results)} result(s). Double-click one to open it." if results else "No messages found.")
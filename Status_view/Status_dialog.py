@@ -1,7 +1,8 @@
 from PySide6.QtCore import Qt
 from PySide6.QtWidgets import QDialog, QVBoxLayout, QTextEdit, QPushButton, QMessageBox, QLabel, QHBoxLayout
-from backend_controller.db_handler_socials import post_status, get_friend_and_user_statuses, like_status, get_users_who_liked_status, get_users_who_viewed_status, track_status_view, delete_status, delete_expired_statuses
+from backend_controller.db_handler_socials import post_status, get_friend_and_user_statuses, like_status, get_status_activity, track_status_view, delete_status
 import qtawesome as qta
+from backend_controller.db_executor import run_async
 
 
 class StatusDialog(QDialog):
@@ -56,11 +57,11 @@ class StatusDialog(QDialog):
 
           """
 
-        # Delete expired statuses
-        delete_expired_statuses()
-
-        statuses = get_friend_and_user_statuses(self.user_id)
+        # A pure read: expired statuses are filtered out here and purged by the maintenance scheduler
+        run_async(get_friend_and_user_statuses, self.user_id, on_result=self.show_statuses)
 
+    def show_statuses(self, statuses):
+        """Builds the status feed dialog from the fetched statuses."""
         if not statuses:
             QMessageBox.information(None, "No Statuses", "No statuses to display.")
             return
@@ -79,6 +80,7 @@ class StatusDialog(QDialog):
                 status_text = f"{status['user']} ({status['timestamp']})\nExpires at: {status['expiration_time']}"
             else:
                 status_text = f"{status['user']} ({status['timestamp']})"
+            status_text += f"\nLikes: {status['like_count']}  Views: {status['view_count']}"
 
             button = QPushButton(status_text)
             button.setStyleSheet(
@@ -125,30 +127,81 @@ class StatusDialog(QDialog):
             layout.addWidget(content_label)
 
             # Likes section
-            likes_label = QLabel("Likes:")
+            likes_label = QLabel(f"Likes ({status['like_count']}):")
             # like_button.clicked.connect(lambda: self.like_status(status['status_id'], self.user_id))
             layout.addWidget(likes_label)
 
-            users_who_liked = get_users_who_liked_status(status['status_id'])
-            for user in users_who_liked:
-                layout.addWidget(QLabel(f"- {user}"))
+            likes_list = QLabel()
+            layout.addWidget(likes_list)
 
             # Views section
-            views_label = QLabel("Views:")
+            views_label = QLabel(f"Views ({status['view_count']}):")
             layout.addWidget(views_label)
 
-            users_who_viewed = get_users_who_viewed_status(status['status_id'])
-            for user in users_who_viewed:
-                layout.addWidget(QLabel(f"- {user}"))
+            views_list = QLabel()
+            layout.addWidget(views_list)
+
+            # Widgets are gone once the dialog closes; late results must not touch them
+            dialog_open = True
+
+            def on_closed(_):
+                nonlocal dialog_open
+                dialog_open = False
+
+            dialog.finished.connect(on_closed)
 
-            # Track view for the current user
-            track_status_view(status['status_id'], self.user_id)
+            def show_activity(activity):
+                if not dialog_open:
+                    return
+                likers, viewers = activity
+                likes_list.setText("\n".join(f"- {user}" for user in likers))
+                views_list.setText("\n".join(f"- {user}" for user in viewers))
 
-            like_button = QPushButton("Like")
+            def load_activity():
+                run_async(get_status_activity, status['status_id'], on_result=show_activity)
+
+            # Likers and viewers are filled in as soon as the background query returns
+            load_activity()
+
+            # Track view for the current user (only the first view is recorded)
+            if not status['viewed_by_me']:
+                run_async(track_status_view, status['status_id'], self.user_id)
+
+            like_button = QPushButton("Liked" if status['liked_by_me'] else "Like")
+            like_button.setEnabled(not status['liked_by_me'])
             like_button.setStyleSheet(
                 "background-color: #1abc9c; color: white; font-size: 16px; padding: 10px; border: none; border-radius: 5px;")
             like_button.setCursor(Qt.PointingHandCursor)
-            like_button.clicked.connect(lambda: like_status(status['status_id'], self.user_id))
+
+            def on_liked(liked):
+                # Either way the status is liked by this user now
+                status['liked_by_me'] = True
+                if liked:
+                    status['like_count'] += 1
+                if not dialog_open:
+                    return
+                like_button.setText("Liked")
+                if not liked:
+                    QMessageBox.warning(None, "Already Liked", "You have already liked this status.")
+                    return
+                likes_label.setText(f"Likes ({status['like_count']}):")
+                load_activity()
+                QMessageBox.information(None, "Liked", "Status liked!")
+
+            def on_like_failed(error):
+                if dialog_open:
+                    like_button.setEnabled(True)
+                QMessageBox.warning(None, "Error", f"Failed to like status: {str(error)}")
+
+            def like():
+                # No second like while the first is being written
+                like_button.setEnabled(False)
+                run_async(
+                    like_status, status['status_id'], self.user_id,
+                    on_result=on_liked, on_error=on_like_failed,
+                )
+
+            like_button.clicked.connect(like)
             layout.addWidget(like_button)
 
             dialog.setLayout(layout)
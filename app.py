@@ -4,13 +4,37 @@ from PySide6.QtWidgets import QApplication
 from PySide6.QtCore import QTimer
 
 from auth_view.login_window import LoginWindow
+from backend_controller import db_handler, db_migrations, db_writer
+from backend_controller.ai_executor import shutdown_ai_executor
+from backend_controller.attachment_upload import shutdown_uploads
+from backend_controller.sentiment_batcher import shutdown_sentiment_batcher
+from backend_controller.maintenance import start_maintenance, stop_maintenance
+from backend_controller.db_executor import get_executor
 from auth_view.signup_window import AuthWindow
 from welcome_view.loading_window import LoadingWindow
 from welcome_view.splash_window import SplashWindow
+from helpers.thumbnail_cache import shutdown_thumbnail_cache
 
 if __name__ == "__main__":
     app = QApplication(sys.argv)
 
+    # Create or upgrade the database schema before any window touches it
+    db_migrations.migrate()
+
+    # Purge expired statuses and archive old messages in the background, now and periodically
+    start_maintenance()
+
+    # Drop pending AI and image work, cancel uploads, let background queries finish, flush queued
+    # writes, then release pooled connections, all while Qt is still up
+    app.aboutToQuit.connect(stop_maintenance)
+    app.aboutToQuit.connect(shutdown_ai_executor)
+    app.aboutToQuit.connect(shutdown_sentiment_batcher)
+    app.aboutToQuit.connect(shutdown_thumbnail_cache)
+    app.aboutToQuit.connect(shutdown_uploads)
+    app.aboutToQuit.connect(lambda: get_executor().wait_for_done(5000))
+    app.aboutToQuit.connect(db_writer.shutdown)
+    app.aboutToQuit.connect(db_handler.close_pool)
+
     # Create instances of the windows
     loading_window = LoadingWindow()
     splash_window = SplashWindow()
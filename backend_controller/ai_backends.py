@@ -0,0 +1,126 @@
+"""
+Pluggable model backends for the AI features.
+
+The backend is chosen by the ai_backend setting (CHATHUB_AI_BACKEND or the
+[database] section of chathub.ini):
+
+    cohere  - Cohere's generate/classify endpoints (default, needs COHERE_API_KEY)
+    stub    - a small local model with no network access, for development and tests
+
+set_backend() swaps in any object with the same two methods.
+"""
+import os
+import threading
+
+from backend_controller import db_config
+
+# Seconds before a single call to the model provider gives up
+DEFAULT_AI_TIMEOUT = 15
+
+
+class CohereBackend:
+    """Calls Cohere. The client is created on first use, so importing the app needs no network."""
+
+    name = "cohere"
+    # Changing any generation setting must change this, since cached answers are keyed by it
+    cache_params = "generate:command-xlarge-nightly:30:0.7:0:0.75|classify:large:v1"
+
+    def __init__(self, api_key=None, timeout=DEFAULT_AI_TIMEOUT):
+        self.api_key = api_key or os.getenv("COHERE_API_KEY")
+        self.timeout = timeout
+        self._client = None
+        self._lock = threading.Lock()
+
+    def _get_client(self):
+        with self._lock:
+            if self._client is None:
+                import cohere
+                self._client = cohere.Client(self.api_key, timeout=self.timeout)
+            return self._client
+
+    def generate_suggestions(self, message):
+        """Return alternative phrasings of message as a list of strings."""
+        response = self._get_client().generate(
+            model='command-xlarge-nightly',  # Adjust model based on your plan
+            prompt=f"Suggest 3 alternatives for this message: '{message}'",
+            max_tokens=30,
+            temperature=0.7,
+            k=0,
+            p=0.75,
+            stop_sequences=["--"]  # Optional, can use to separate multiple outputs
+        )
+
+        # Extract and split suggestions
+        generated_text = response.generations[0].text
+        suggestions = generated_text.strip().split('\n')  # Split suggestions into a list
+        return [suggestion.strip() for suggestion in suggestions if suggestion.strip()]
+
+    def classify_sentiment(self, messages):
+        """Return "positive", "neutral" or "negative" for each message, in order."""
+        import cohere
+        response = self._get_client().classify(
+            inputs=list(messages),
+            model='large',  # Use Cohere's sentiment model (customizable if needed)
+            examples=[
+                cohere.ClassifyExample("I love this!", "positive"),
+                cohere.ClassifyExample("This is the worst!", "negative"),
+                cohere.ClassifyExample("It's okay, not great.", "neutral")
+            ]
+        )
+        return [classification.prediction for classification in response.classifications]
+
+
+class LocalStubBackend:
+    """Deterministic offline stand-in: keyword sentiment and templated suggestions."""
+
+    name = "stub"
+    cache_params = "v1"
+
+    POSITIVE_WORDS = {"love", "great", "good", "thanks", "thank", "happy", "nice", "awesome", "cool", "yes"}
+    NEGATIVE_WORDS = {"hate", "worst", "bad", "sad", "angry", "sorry", "no", "terrible", "awful"}
+
+    def generate_suggestions(self, message):
+        text = message.strip().rstrip(".!?")
+        return [f"{text}!", f"{text}?", f"Just wanted to say: {text.lower()}"]
+
+    def classify_sentiment(self, messages):
+        labels = []
+        for message in messages:
+            words = {word.strip(".,!?").lower() for word in message.split()}
+            score = len(words & self.POSITIVE_WORDS) - len(words & self.NEGATIVE_WORDS)
+            labels.append("positive" if score > 0 else "negative" if score < 0 else "neutral")
+        return labels
+
+
+BACKENDS = {
+    CohereBackend.name: CohereBackend,
+    LocalStubBackend.name: LocalStubBackend,
+}
+
+_backend = None
+_backend_lock = threading.Lock()
+
+
+def get_ai_timeout():
+    """Return the per-request timeout in seconds for AI calls."""
+    return float(db_config.get_setting("ai_timeout", DEFAULT_AI_TIMEOUT))
+
+
+def get_backend():
+    """Return the configured backend, creating it on first use."""
+    global _backend
+    with _backend_lock:
+        if _backend is None:
+            name = db_config.get_setting("ai_backend", CohereBackend.name)
+            if name not in BACKENDS:
+                print(f"Unknown AI backend {name!r}, using {CohereBackend.name}")
+                name = CohereBackend.name
+            _backend = CohereBackend(timeout=get_ai_timeout()) if name == CohereBackend.name else BACKENDS[name]()
+        return _backend
+
+
+def set_backend(backend):
+    """Use backend for every AI call from now on (e.g. LocalStubBackend() in tests)."""
+    global _backend
+    with _backend_lock:
+        _backend = backend
@@ -0,0 +1,197 @@
+import hashlib
+import json
+import re
+import sqlite3
+import threading
+import time
+import unicodedata
+from collections import OrderedDict
+
+from backend_controller import db_config, db_handler, db_writer
+
+# Answers kept in memory at most (least recently used are dropped first)
+AI_MEMORY_CACHE_SIZE = 1024
+# Seconds an answer stays valid, in memory and on disk
+DEFAULT_AI_CACHE_TTL = 7 * 24 * 60 * 60
+# Rows kept in the ai_cache table at most; prune() drops the oldest beyond this
+DEFAULT_AI_CACHE_MAX_ROWS = 50000
+
+_TRAILING_PUNCTUATION = re.compile(r"[\s.!?,;:]+$")
+
+
+def normalize(text):
+    """
+    Reduce a message to the form answers are cached under, so near-identical
+    inputs ("Ok  see you!", "ok see you") share an entry.
+    """
+    text = unicodedata.normalize("NFKC", text).casefold()
+    text = " ".join(text.split())
+    return _TRAILING_PUNCTUATION.sub("", text)
+
+
+def get_ttl():
+    return int(db_config.get_setting("ai_cache_ttl", DEFAULT_AI_CACHE_TTL))
+
+
+def get_max_rows():
+    return int(db_config.get_setting("ai_cache_max_rows", DEFAULT_AI_CACHE_MAX_ROWS))
+
+
+class AiCache:
+    """
+    Two-tier cache of AI answers: an in-process LRU in front of the ai_cache table.
+
+    Keys hash the kind of answer, the backend and its parameters, and the
+    normalised message, so switching models never returns stale answers.
+    Disk writes go through the group-commit writer without waiting.
+    """
+
+    def __init__(self, max_entries=AI_MEMORY_CACHE_SIZE):
+        self.max_entries = max_entries
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def make_key(kind, backend, text):
+        source = f"{kind}|{backend.name}|{getattr(backend, 'cache_params', '')}|{normalize(text)}"
+        return hashlib.sha256(source.encode("utf-8")).hexdigest()
+
+    def get_or_compute(self, kind, backend, text, compute):
+        """
+        Return the cached answer for text, or compute() it and cache the result.
+
+        compute() raising means nothing is cached, so failures are retried next time.
+        """
+        key = self.make_key(kind, backend, text)
+        value = self._get_memory(key)
+        if value is not None:
+            return value
+
+        value = self._get_disk(key)
+        if value is not None:
+            self._put_memory(key, value, self._expiry())
+            return value
+
+        value = compute()
+        expires_at = self._expiry()
+        self._put_memory(key, value, expires_at)
+        self._put_disk(key, kind, value, expires_at)
+        return value
+
+    def get_cached(self, kind, backend, text):
+        """Return the cached answer for text, or None. Checks memory, then disk."""
+        key = self.make_key(kind, backend, text)
+        value = self._get_memory(key)
+        if value is None:
+            value = self._get_disk(key)
+            if value is not None:
+                self._put_memory(key, value, self._expiry())
+        return value
+
+    def get_cached_in_memory(self, kind, backend, text):
+        """Return the answer if it is in the in-memory tier, else None (never touches SQLite)."""
+        return self._get_memory(self.make_key(kind, backend, text))
+
+    def put(self, kind, backend, text, value):
+        """Cache an answer that was computed elsewhere (e.g. by a batched call)."""
+        key = self.make_key(kind, backend, text)
+        expires_at = self._expiry()
+        self._put_memory(key, value, expires_at)
+        self._put_disk(key, kind, value, expires_at)
+
+    def clear_memory(self):
+        with self._lock:
+            self._entries.clear()
+
+    @staticmethod
+    def _expiry():
+        return int(time.time()) + get_ttl()
+
+    def _get_memory(self, key):
+        with self._lock:
+            cached = self._entries.get(key)
+            if cached is None:
+                return None
+            expires_at, value = cached
+            if expires_at <= time.time():
+                del self._entries[key]
+                return None
+            self._entries.move_to_end(key)
+            return value
+
+    def _put_memory(self, key, value, expires_at):
+        with self._lock:
+            self._entries[key] = (expires_at, value)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    @staticmethod
+    def _get_disk(key):
+        try:
+            with db_handler.get_connection() as connection:
+                cursor = connection.cursor()
+                cursor.execute(
+                    "SELECT value FROM ai_cache WHERE cache_key = ? AND expires_at > ?",
+                    (key, int(time.time())),
+                )
+                row = cursor.fetchone()
+            return json.loads(row[0]) if row else None
+        except sqlite3.Error as e:
+            print(f"AI cache read failed: {e}")
+            return None
+
+    @staticmethod
+    def _put_disk(key, kind, value, expires_at):
+        db_writer.report_errors(
+            db_writer.submit(_insert_entry, key, kind, json.dumps(value), expires_at), "cache AI answer"
+        )
+
+
+def _insert_entry(cursor, key, kind, value, expires_at):
+    """Writer operation for AiCache._put_disk."""
+    cursor.execute(
+        """
+        INSERT OR REPLACE INTO ai_cache (cache_key, kind, value, created_at, expires_at)
+        VALUES (?, ?, ?, ?, ?)
+        """,
+        (key, kind, value, int(time.time()), expires_at),
+    )
+
+
+def prune(max_rows=None):
+    """
+    Delete expired answers, then the oldest ones beyond max_rows (default: the
+    ai_cache_max_rows setting). Run by the maintenance scheduler.
+
+    Returns:
+        int: The number of rows deleted.
+    """
+    max_rows = get_max_rows() if max_rows is None else max_rows
+    try:
+        return db_writer.submit(_prune_entries, int(time.time()), max_rows).result()
+    except sqlite3.Error as e:
+        print(f"AI cache prune failed: {e}")
+        return 0
+
+
+def _prune_entries(cursor, now, max_rows):
+    cursor.execute("DELETE FROM ai_cache WHERE expires_at <= ?", (now,))
+    deleted = cursor.rowcount
+    cursor.execute(
+        """
+        DELETE FROM ai_cache WHERE cache_key IN (
+            SELECT cache_key FROM ai_cache ORDER BY created_at DESC LIMIT -1 OFFSET ?
+        )
+        """,
+        (max_rows,),
+    )
+    return deleted + cursor.rowcount
+
+
+_cache = AiCache()
+
+
+def get_ai_cache():
+    """Return the process-wide AiCache."""
+    return _cache
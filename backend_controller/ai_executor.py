@@ -0,0 +1,84 @@
+from PySide6.QtCore import QTimer
+
+from backend_controller.ai_backends import get_ai_timeout
+from backend_controller.worker_pool import WorkerPool
+
+# Model calls are slow network round trips; a few may be in flight at once
+AI_THREADS = 4
+
+
+class AiExecutor:
+    """
+    Runs AI backend calls on their own thread pool, so they neither freeze the
+    window nor hold up database queries.
+
+    Each request gets a timeout: when it expires the request is cancelled and
+    on_timeout runs instead of on_result. A call that is already on the wire
+    cannot be interrupted, so its late result is simply dropped.
+    """
+
+    def __init__(self, max_threads=AI_THREADS):
+        self._pool = WorkerPool(max_threads, name="AI")
+
+    def submit(self, fn, *args, on_result=None, on_error=None, on_timeout=None, timeout=None, **kwargs):
+        """
+        Queue fn(*args, **kwargs) on an AI worker thread.
+
+        Args:
+            fn (callable): Blocking backend call. It must not touch widgets.
+            on_result, on_error (callable, optional): As for WorkerPool.submit.
+            on_timeout (callable, optional): Called on the GUI thread with no arguments
+                if no result arrived in time.
+            timeout (float, optional): Seconds; defaults to the ai_timeout setting.
+
+        Returns:
+            WorkerTask: Its finished/failed signals carry the outcome; cancel() drops it.
+        """
+        task = self._pool.submit(fn, *args, on_result=on_result, on_error=on_error, **kwargs)
+
+        timer = QTimer(task)
+        timer.setSingleShot(True)
+        timer.timeout.connect(lambda: self._expire(task, on_timeout))
+        # Stop the clock as soon as the request settles
+        task.finished.connect(timer.stop)
+        task.failed.connect(timer.stop)
+        timer.start(int((get_ai_timeout() if timeout is None else timeout) * 1000))
+        return task
+
+    def shutdown(self, msecs=-1):
+        """Drop queued requests and wait up to msecs for the ones on the wire."""
+        return self._pool.shutdown(msecs)
+
+    @staticmethod
+    def _expire(task, on_timeout):
+        if task.cancelled:
+            return
+        task.cancel()
+        if on_timeout:
+            on_timeout()
+        else:
+            print("AI request timed out.")
+
+
+_ai_executor = None
+
+
+def get_ai_executor():
+    """Return the shared AiExecutor, creating it on first use."""
+    global _ai_executor
+    if _ai_executor is None:
+        _ai_executor = AiExecutor()
+    return _ai_executor
+
+
+def shutdown_ai_executor(msecs=2000):
+    """Stop the shared AiExecutor, if it was started. Called when the app quits."""
+    if _ai_executor is not None:
+        _ai_executor.shutdown(msecs)
+
+
+def run_ai_async(fn, *args, on_result=None, on_error=None, on_timeout=None, timeout=None, **kwargs):
+    """Shortcut for get_ai_executor().submit(...)."""
+    return get_ai_executor().submit(
+        fn, *args, on_result=on_result, on_error=on_error, on_timeout=on_timeout, timeout=timeout, **kwargs
+    )
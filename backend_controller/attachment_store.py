@@ -0,0 +1,277 @@
+"""
+Content-addressed attachment store.
+
+Sent files are copied once into attachment_dir (default attachments/ in the
+project folder) under their SHA-256, e.g. attachments/3f/3f9a...c1.jpg, and
+messages refer to them by hash instead of by the sender's local path. Sending
+the same content again finds the existing blob and copies nothing.
+
+A message's content holds a reference "<sha256><ext>/<original name>", so the
+original file name can still be shown; resolve() turns it into a local path.
+"""
+import hashlib
+import os
+import re
+import threading
+import time
+
+from backend_controller import db_config
+
+DEFAULT_ATTACHMENT_DIR = os.path.join(db_config.PROJECT_ROOT, "attachments")
+# Bytes read per chunk while hashing and copying
+CHUNK_SIZE = 1024 * 1024
+# Locks that serialise copies of the same content; a hash always maps to the same one
+CONTENT_LOCK_STRIPES = 64
+# Hours a cancelled copy's .part file is kept for resuming before maintenance deletes it
+DEFAULT_PARTIAL_COPY_MAX_AGE_HOURS = 48
+
+_REFERENCE_PATTERN = re.compile(r"^([0-9a-f]{64})(\.[A-Za-z0-9]{1,10})?/(.+)$")
+
+# (absolute path, mtime_ns, size) -> sha256, so re-sending an unchanged file is not hashed again
+_hash_memo = {}
+_hash_memo_lock = threading.Lock()
+# Held while content is copied into the store, picked by hash (see _content_lock)
+_content_locks = [threading.Lock() for _ in range(CONTENT_LOCK_STRIPES)]
+
+
+def get_attachment_dir():
+    """Return the root directory of the attachment store."""
+    path = os.path.expanduser(db_config.get_setting("attachment_dir", DEFAULT_ATTACHMENT_DIR))
+    return path if os.path.isabs(path) else os.path.join(db_config.PROJECT_ROOT, path)
+
+
+def _extension(file_path):
+    extension = os.path.splitext(file_path)[1].lower()
+    return extension if re.fullmatch(r"\.[a-z0-9]{1,10}", extension) else ""
+
+
+def blob_path(sha256, extension=""):
+    """Return where the content with this hash is (or would be) stored."""
+    return os.path.join(get_attachment_dir(), sha256[:2], f"{sha256}{extension}")
+
+
+def hash_file(file_path, progress=None, is_cancelled=None):
+    """
+    Return the SHA-256 of a file, reading it in CHUNK_SIZE chunks.
+
+    Results are memoised by path, mtime and size.
+
+    Args:
+        file_path (str): The file to hash.
+        progress (callable, optional): Called with the number of bytes read so far.
+        is_cancelled (callable, optional): Checked between chunks; hashing stops
+            and None is returned once it returns True.
+    """
+    stat = os.stat(file_path)
+    memo_key = (os.path.abspath(file_path), stat.st_mtime_ns, stat.st_size)
+    with _hash_memo_lock:
+        sha256 = _hash_memo.get(memo_key)
+    if sha256 is not None:
+        if progress:
+            progress(stat.st_size)
+        return sha256
+
+    digest = hashlib.sha256()
+    done = 0
+    for chunk in _read_chunks(file_path, 0):
+        if is_cancelled and is_cancelled():
+            return None
+        digest.update(chunk)
+        done += len(chunk)
+        if progress:
+            progress(done)
+    sha256 = digest.hexdigest()
+
+    with _hash_memo_lock:
+        _hash_memo[memo_key] = sha256
+    return sha256
+
+
+def _read_chunks(file_path, offset):
+    """Yield memoryviews over one reused buffer; each is only valid until the next is yielded."""
+    buffer = bytearray(CHUNK_SIZE)
+    view = memoryview(buffer)
+    with open(file_path, "rb") as source:
+        source.seek(offset)
+        while True:
+            read = source.readinto(buffer)
+            if not read:
+                break
+            yield view[:read]
+
+
+def _copy_into_store(file_path, target, size, sha256, progress=None, is_cancelled=None):
+    """
+    Copy file_path to target through a .part file, resuming a copy of the same
+    content that was cancelled or interrupted earlier. Returns False if cancelled.
+
+    The bytes are hashed as they are written (including a resumed prefix), and
+    nothing is moved into the store unless they match sha256.
+    """
+    os.makedirs(os.path.dirname(target), exist_ok=True)
+    temporary_file = f"{target}.part"
+    resumed = os.path.getsize(temporary_file) if os.path.isfile(temporary_file) else 0
+    if resumed > size:
+        resumed = 0  # Not a prefix of this file; start over
+
+    copied = _copy_to_part(file_path, temporary_file, resumed, progress, is_cancelled)
+    if copied is not None and copied != sha256 and resumed:
+        # The leftover .part was not a prefix of this content after all
+        copied = _copy_to_part(file_path, temporary_file, 0, progress, is_cancelled)
+    if copied is None:
+        return False
+
+    if copied != sha256:
+        os.remove(temporary_file)
+        raise OSError(f"{file_path} changed while it was being stored")
+    # Another sender may have stored the same content meanwhile; either copy is identical
+    os.replace(temporary_file, target)
+    return True
+
+
+def _copy_to_part(file_path, temporary_file, offset, progress, is_cancelled):
+    """
+    Keep the first offset bytes of temporary_file and append file_path from there on.
+
+    Returns:
+        str: The SHA-256 of the whole .part file, or None if cancelled.
+    """
+    digest = hashlib.sha256()
+    if offset:
+        for chunk in _read_chunks(temporary_file, 0):
+            digest.update(chunk)
+
+    done = offset
+    with open(temporary_file, "r+b" if offset else "wb") as destination:
+        destination.seek(offset)
+        destination.truncate()
+        for chunk in _read_chunks(file_path, offset):
+            if is_cancelled and is_cancelled():
+                return None
+            destination.write(chunk)
+            digest.update(chunk)
+            done += len(chunk)
+            if progress:
+                progress(done)
+    return digest.hexdigest()
+
+
+def _content_lock(sha256):
+    return _content_locks[int(sha256[:8], 16) % CONTENT_LOCK_STRIPES]
+
+
+def store_file(file_path, progress=None, is_cancelled=None):
+    """
+    Put a file into the store unless its content is already there.
+
+    Args:
+        file_path (str): The file to store.
+        progress (callable, optional): Called as progress(stage, done, total) with
+            stage "hashing" or "copying" and byte counts.
+        is_cancelled (callable, optional): Polled between chunks. A cancelled copy
+            leaves its .part file behind, so sending the file again resumes it.
+
+    Returns:
+        tuple: (sha256, extension, size, reference), where reference is what the
+        message content should hold, or None if cancelled.
+    """
+    size = os.path.getsize(file_path)
+    sha256 = hash_file(
+        file_path,
+        progress=(lambda done: progress("hashing", done, size)) if progress else None,
+        is_cancelled=is_cancelled,
+    )
+    if sha256 is None:
+        return None
+    extension = _extension(file_path)
+    target = blob_path(sha256, extension)
+
+    if not (os.path.isfile(target) and os.path.getsize(target) == size):
+        # Only one copy of the same content at a time, since they share the .part file
+        with _content_lock(sha256):
+            if not (os.path.isfile(target) and os.path.getsize(target) == size):
+                copied = _copy_into_store(
+                    file_path, target, size, sha256,
+                    progress=(lambda done: progress("copying", done, size)) if progress else None,
+                    is_cancelled=is_cancelled,
+                )
+                if not copied:
+                    return None
+
+    return sha256, extension, size, make_reference(sha256, extension, os.path.basename(file_path))
+
+
+def get_partial_copy_max_age_hours():
+    return float(db_config.get_setting("partial_copy_max_age_hours", DEFAULT_PARTIAL_COPY_MAX_AGE_HOURS))
+
+
+def sweep_partial_copies(max_age_hours=None):
+    """
+    Delete .part files left by cancelled copies that were not resumed within
+    max_age_hours (default: the partial_copy_max_age_hours setting). Copies in
+    progress are skipped. Run by the maintenance scheduler.
+
+    Returns:
+        int: The number of files deleted.
+    """
+    max_age_hours = get_partial_copy_max_age_hours() if max_age_hours is None else max_age_hours
+    cutoff = time.time() - max_age_hours * 3600
+    deleted = 0
+    for directory, _, file_names in os.walk(get_attachment_dir()):
+        for file_name in file_names:
+            if not file_name.endswith(".part") or not re.match(r"[0-9a-f]{8}", file_name):
+                continue
+            path = os.path.join(directory, file_name)
+            lock = _content_lock(file_name[:64])
+            if not lock.acquire(blocking=False):
+                continue  # Possibly being copied or resumed right now
+            try:
+                if os.path.getmtime(path) < cutoff:
+                    os.remove(path)
+                    deleted += 1
+            except OSError as e:
+                print(f"Could not delete partial attachment copy {path}: {e}")
+            finally:
+                lock.release()
+    return deleted
+
+
+def make_reference(sha256, extension, name):
+    """Return the message content that refers to a stored blob."""
+    return f"{sha256}{extension}/{name}"
+
+
+def register(cursor, sha256, extension, size):
+    """Writer operation helper: record a stored blob (no-op if it is already known)."""
+    cursor.execute(
+        "INSERT OR IGNORE INTO attachments (sha256, size, extension) VALUES (?, ?, ?)",
+        (sha256, size, extension),
+    )
+
+
+def parse_reference(content):
+    """Return (sha256, extension, name) for a store reference, or None for anything else."""
+    match = _REFERENCE_PATTERN.match(content or "")
+    if match is None:
+        return None
+    return match.group(1), match.group(2) or "", match.group(3)
+
+
+def resolve(content):
+    """
+    Return the local path of an attachment message's content.
+
+    Store references map to their blob; older messages that hold a plain file
+    path are returned unchanged.
+    """
+    reference = parse_reference(content)
+    if reference is None:
+        return content
+    sha256, extension, _ = reference
+    return blob_path(sha256, extension)
+
+
+def display_name(content):
+    """Return the file name to show for an attachment message's content."""
+    reference = parse_reference(content)
+    return reference[2] if reference else os.path.basename(content or "")
@@ -0,0 +1,122 @@
+import os
+import threading
+import time
+
+from PySide6.QtCore import QObject, Signal
+
+from backend_controller import db_handler_friends
+from backend_controller.worker_pool import WorkerPool
+
+# Uploads get their own threads, so a big file never holds up database queries
+UPLOAD_THREADS = 2
+# Minimum seconds between progress signals, so a fast copy does not flood the event loop
+PROGRESS_INTERVAL = 0.1
+
+
+class AttachmentUpload(QObject):
+    """
+    Handle for one attachment being stored and sent on the upload pool.
+
+    Created on the GUI thread; its signals are delivered there.
+    progress carries (stage, done, total) with stage "hashing" or "copying".
+    """
+
+    progress = Signal(str, int, int)
+    finished = Signal(object)
+    failed = Signal(object)
+    cancelled = Signal()
+    _progressed = Signal(str, int, int)
+
+    def __init__(self, sender_id, receiver_id, file_path, file_type):
+        super().__init__()
+        self.sender_id = sender_id
+        self.receiver_id = receiver_id
+        self.file_path = file_path
+        self.file_type = file_type
+        self.name = os.path.basename(file_path)
+        self._cancel_event = threading.Event()
+        self._last_progress = 0.0
+        # Emitted from the worker thread, delivered queued on this object's thread
+        self._progressed.connect(self.progress)
+
+    def cancel(self):
+        """
+        Stop at the next chunk. The partial copy is kept, so sending the same
+        file again resumes where this one stopped.
+        """
+        self._cancel_event.set()
+
+    def is_cancelled(self):
+        return self._cancel_event.is_set()
+
+    def _report(self, stage, done, total):
+        now = time.monotonic()
+        if done < total and now - self._last_progress < PROGRESS_INTERVAL:
+            return
+        self._last_progress = now
+        self._progressed.emit(stage, done, total)
+
+    def _deliver(self, message_id):
+        _uploads.discard(self)
+        if message_id is not None:
+            self.finished.emit(message_id)
+        else:
+            self.cancelled.emit()
+
+    def _fail(self, error):
+        _uploads.discard(self)
+        self.failed.emit(error)
+
+
+def _send(upload):
+    """Runs on the upload pool: store the file and save its message. Returns None if cancelled."""
+    message_id = db_handler_friends.save_file_message(
+        upload.sender_id, upload.receiver_id, upload.file_path, upload.file_type,
+        progress=upload._report, is_cancelled=upload.is_cancelled,
+    )
+    # A cancel that arrives after the message was committed is too late: it was sent
+    if message_id is None and not upload.is_cancelled():
+        raise RuntimeError("The message could not be saved")
+    return message_id
+
+
+_pool = None
+# Uploads that have not reported their outcome yet
+_uploads = set()
+
+
+def get_upload_pool():
+    """Return the upload WorkerPool, creating it on first use."""
+    global _pool
+    if _pool is None:
+        _pool = WorkerPool(UPLOAD_THREADS, name="upload")
+    return _pool
+
+
+def start_upload(sender_id, receiver_id, file_path, file_type):
+    """
+    Store and send a file in the background.
+
+    Returns:
+        AttachmentUpload: Connect to its signals, call cancel() to stop it.
+    """
+    upload = AttachmentUpload(sender_id, receiver_id, file_path, file_type)
+    _uploads.add(upload)
+    get_upload_pool().submit(_send, upload, on_result=upload._deliver, on_error=upload._fail)
+    return upload
+
+
+def cancel_all():
+    """Cancel every running upload (on shutdown)."""
+    for upload in list(_uploads):
+        upload.cancel()
+
+
+def shutdown_uploads(msecs=2000):
+    """
+    Stop uploading on quit: cancel the running copies (their .part files are kept
+    for resuming), drop the queued ones and wait up to msecs for the threads.
+    """
+    cancel_all()
+    if _pool is not None:
+        _pool.shutdown(msecs)
@@ -0,0 +1,41 @@
+import queue
+import time
+
+
+def collect_batch(items, max_batch_size, max_batch_delay):
+    """
+    Take the next micro-batch off a queue, for the background batchers.
+
+    Blocks for the first item, then keeps taking items until the batch holds
+    max_batch_size of them or max_batch_delay seconds have passed since the
+    first one arrived. None on the queue means "stop": it ends the batch being
+    collected and is put back, so the next call returns None.
+
+    Args:
+        items (queue.Queue): The batcher's queue.
+        max_batch_size (int): Most items per batch.
+        max_batch_delay (float): Longest wait (seconds) for a batch to fill.
+
+    Returns:
+        list: The batch, or None once the queue has been told to stop.
+    """
+    first = items.get()
+    if first is None:
+        return None
+
+    batch = [first]
+    deadline = time.monotonic() + max_batch_delay
+    while len(batch) < max_batch_size:
+        remaining = deadline - time.monotonic()
+        if remaining <= 0:
+            break
+        try:
+            item = items.get(timeout=remaining)
+        except queue.Empty:
+            break
+        if item is None:
+            # Shutting down: hand back what we have, then stop
+            items.put(None)
+            break
+        batch.append(item)
+    return batch
@@ -0,0 +1,129 @@
+import itertools
+import json
+import socket
+import threading
+
+from PySide6.QtCore import QThread, Signal
+
+from backend_controller import db_config
+from backend_controller.message_broker import DEFAULT_HOST, DEFAULT_PORT
+
+# Seconds to wait before reconnecting after the broker went away
+RECONNECT_DELAY = 3
+# Seconds a connection attempt may take
+CONNECT_TIMEOUT = 5
+
+
+class BrokerClient(QThread):
+    """
+    Connection to the local message broker, running on its own thread.
+
+    Incoming events are re-emitted as Qt signals, so slots run on the GUI thread.
+    """
+
+    messageReceived = Signal(dict)
+    sendAcknowledged = Signal(dict)
+    sendFailed = Signal(dict)
+    connectionChanged = Signal(bool)
+
+    def __init__(self, user_id, host=None, port=None):
+        super().__init__()
+        self.user_id = user_id
+        self.host = host or db_config.get_setting("broker_host", DEFAULT_HOST)
+        self.port = int(port or db_config.get_setting("broker_port", DEFAULT_PORT))
+        self._socket = None
+        self._send_lock = threading.Lock()
+        self._refs = itertools.count(1)
+        self._stopping = threading.Event()
+        # Refs sent on the current connection that the broker has not answered yet
+        self._outstanding = set()
+
+    @property
+    def connected(self):
+        return self._socket is not None
+
+    def run(self):
+        while not self._stopping.is_set():
+            try:
+                sock = socket.create_connection((self.host, self.port), timeout=CONNECT_TIMEOUT)
+            except OSError:
+                # Returns early when stop() is called
+                self._stopping.wait(RECONNECT_DELAY)
+                continue
+
+            sock.settimeout(None)
+            self._socket = sock
+            if self._stopping.is_set():
+                # stop() ran while we were connecting and saw no socket to shut down
+                self._socket = None
+                sock.close()
+                break
+            try:
+                self._write({"op": "hello", "user_id": self.user_id})
+                self.connectionChanged.emit(True)
+                for line in sock.makefile("rb"):
+                    self._dispatch(json.loads(line))
+            except (OSError, ValueError) as e:
+                print(f"Lost connection to message broker: {e}")
+            finally:
+                with self._send_lock:
+                    self._socket = None
+                    unanswered, self._outstanding = self._outstanding, set()
+                sock.close()
+                self.connectionChanged.emit(False)
+                # The broker may or may not have stored these; never leave a send unreported
+                for ref in sorted(unanswered):
+                    self.sendFailed.emit({"event": "error", "ref": ref, "disconnected": True,
+                                          "message": "Lost connection to the message broker before it confirmed the message."})
+
+    def _dispatch(self, event):
+        kind = event.get("event")
+        if kind in ("ack", "error"):
+            with self._send_lock:
+                self._outstanding.discard(event.get("ref"))
+        if kind == "message":
+            self.messageReceived.emit(event)
+        elif kind == "ack":
+            self.sendAcknowledged.emit(event)
+        elif kind == "error":
+            self.sendFailed.emit(event)
+
+    def _write(self, payload, ref=None):
+        data = json.dumps(payload).encode() + b"\n"
+        with self._send_lock:
+            if self._socket is None:
+                raise ConnectionError("Not connected to the message broker.")
+            try:
+                self._socket.sendall(data)
+            except OSError as e:
+                raise ConnectionError(f"Could not write to the message broker: {e}") from e
+            if ref is not None:
+                self._outstanding.add(ref)
+
+    def send_message(self, receiver_id, content):
+        """
+        Send a direct message through the broker. Safe to call from the GUI thread.
+
+        Returns:
+            int: Reference echoed back in the sendAcknowledged/sendFailed payload. If the
+            connection drops before the broker answers, sendFailed is emitted for it with
+            "disconnected": True.
+
+        Raises:
+            ConnectionError: If the broker is not connected.
+        """
+        ref = next(self._refs)
+        self._write({"op": "send", "ref": ref, "to": receiver_id, "content": content}, ref=ref)
+        return ref
+
+    def stop(self):
+        """Disconnect and stop the thread."""
+        self._stopping.set()
+        sock = self._socket
+        if sock is not None:
+            try:
+                sock.shutdown(socket.SHUT_RDWR)
+            except OSError:
+                pass
+        # A connection attempt in progress cannot be interrupted; let it time out
+        self.wait((CONNECT_TIMEOUT + 1) * 1000)
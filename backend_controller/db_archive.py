@@ -0,0 +1,489 @@
+"""
+Monthly message archives.
+
+Messages older than archive_after_days (default 180) are moved out of message.db
+into one SQLite file per month, archive/messages-YYYY-MM.db, so the hot database
+and its indexes stay small. message_archive_index records which months hold
+messages of each conversation, so history reads only open the archives they need.
+Each archive keeps its own full-text index, so search still finds archived messages.
+
+Run it by hand with:
+
+    python -m backend_controller.db_archive [--days 180]
+"""
+import argparse
+import os
+import pathlib
+import sqlite3
+import threading
+from datetime import datetime, timedelta
+
+from backend_controller import db_config, db_handler, db_migrations
+
+DEFAULT_ARCHIVE_AFTER_DAYS = 180
+DEFAULT_ARCHIVE_DIR = os.path.join(db_config.PROJECT_ROOT, "archive")
+
+# Columns copied verbatim into the archive files
+ARCHIVE_COLUMNS = "id, conversation_id, sender_id, receiver_id, content, timestamp, message_type, attachment_sha256"
+
+# Matches attachment store references ("<sha256><ext>/<name>") in content
+_REFERENCE_GLOB = "[0-9a-f]" * 64 + "*/*"
+
+
+def _add_attachment_column(connection):
+    """Archive schema step: add attachment_sha256 to archives written before it existed."""
+    columns = [row[1] for row in connection.execute("PRAGMA archive.table_info(messages)")]
+    if "attachment_sha256" in columns:
+        return
+    connection.execute("ALTER TABLE archive.messages ADD COLUMN attachment_sha256 TEXT")
+    # File messages archived without it still hold the hash in their content
+    connection.execute(
+        f"""
+        UPDATE archive.messages SET attachment_sha256 = substr(content, 1, 64)
+        WHERE message_type != 'text' AND content GLOB '{_REFERENCE_GLOB}'
+        """
+    )
+
+
+# Statements run against the archive attached as "archive"; like migrations, a
+# step may be a callable taking the connection
+ARCHIVE_SCHEMA = [
+    """
+    CREATE TABLE IF NOT EXISTS archive.messages (
+        id INTEGER PRIMARY KEY,
+        conversation_id INTEGER,
+        sender_id INTEGER NOT NULL,
+        receiver_id INTEGER NOT NULL,
+        content TEXT,
+        timestamp TIMESTAMP,
+        message_type TEXT NOT NULL DEFAULT 'text',
+        attachment_sha256 TEXT
+    )
+    """,
+    _add_attachment_column,
+    "CREATE INDEX IF NOT EXISTS archive.idx_messages_conversation_time ON messages (conversation_id, timestamp, id)",
+    """
+    CREATE INDEX IF NOT EXISTS archive.idx_messages_attachment
+    ON messages (attachment_sha256) WHERE attachment_sha256 IS NOT NULL
+    """,
+    # Same external-content layout and tokenizer as messages_fts in the main database
+    """
+    CREATE VIRTUAL TABLE IF NOT EXISTS archive.messages_fts USING fts5(
+        content,
+        content='messages',
+        content_rowid='id',
+        tokenize='unicode61 remove_diacritics 2'
+    )
+    """,
+    # Archived rows are never updated or deleted, so indexing inserts is enough
+    """
+    CREATE TRIGGER IF NOT EXISTS archive.trg_messages_fts_insert AFTER INSERT ON messages
+    WHEN new.message_type = 'text'
+    BEGIN
+        INSERT INTO messages_fts (rowid, content) VALUES (new.id, new.content);
+    END
+    """,
+    # Index archives written before they had a full-text index
+    """
+    INSERT INTO archive.messages_fts (rowid, content)
+    SELECT id, content FROM archive.messages
+    WHERE message_type = 'text' AND content IS NOT NULL
+      AND NOT EXISTS (SELECT 1 FROM archive.messages_fts_docsize)
+    """,
+]
+
+# Only one archiver runs at a time in this process
+_archive_lock = threading.Lock()
+
+
+def get_archive_dir():
+    """Return the directory holding the monthly archive files."""
+    path = os.path.expanduser(db_config.get_setting("archive_dir", DEFAULT_ARCHIVE_DIR))
+    return path if os.path.isabs(path) else os.path.join(db_config.PROJECT_ROOT, path)
+
+
+def get_archive_after_days():
+    """Return how old (in days) a message must be before it is archived."""
+    return int(db_config.get_setting("archive_after_days", DEFAULT_ARCHIVE_AFTER_DAYS))
+
+
+def archive_path(month):
+    """Return the archive file for a month ("YYYY-MM")."""
+    return os.path.join(get_archive_dir(), f"messages-{month}.db")
+
+
+def _month_bounds(month):
+    year, month_number = (int(part) for part in month.split("-"))
+    next_year, next_month = (year + 1, 1) if month_number == 12 else (year, month_number + 1)
+    return f"{year:04d}-{month_number:02d}-01 00:00:00", f"{next_year:04d}-{next_month:02d}-01 00:00:00"
+
+
+def archive_old_messages(older_than_days=None):
+    """
+    Move messages older than the cutoff into their monthly archive files.
+
+    Each month is copied and then deleted in one transaction. With WAL the two
+    files do not commit atomically as a set, so a crash can leave a month in
+    both places; copies use INSERT OR IGNORE and reads never return a row twice,
+    so running the archiver again simply finishes the job.
+
+    Args:
+        older_than_days (int, optional): Defaults to the archive_after_days setting.
+
+    Returns:
+        int: The number of messages moved.
+    """
+    days = get_archive_after_days() if older_than_days is None else older_than_days
+    # CURRENT_TIMESTAMP is UTC, so the cutoff is too
+    cutoff = (datetime.utcnow() - timedelta(days=days)).strftime("%Y-%m-%d %H:%M:%S")
+
+    with _archive_lock:
+        # A private connection, because ATTACH changes the connection it runs on
+        connection = sqlite3.connect(db_handler.DB_PATH)
+        db_config.apply_profile(connection)
+        try:
+            _upgrade_archives(connection)
+            months = [
+                row[0] for row in connection.execute(
+                    "SELECT DISTINCT strftime('%Y-%m', timestamp) FROM messages WHERE timestamp < ?",
+                    (cutoff,),
+                )
+                if row[0] is not None
+            ]
+            if not months:
+                return 0
+
+            os.makedirs(get_archive_dir(), exist_ok=True)
+            moved = 0
+            for month in sorted(months):
+                moved += _archive_month(connection, month, cutoff)
+        finally:
+            connection.close()
+
+    print(f"Archived {moved} messages older than {days} days.")
+    return moved
+
+
+def _apply_archive_schema(connection):
+    """Create or upgrade the schema of the archive attached as "archive"."""
+    for statement in ARCHIVE_SCHEMA:
+        if callable(statement):
+            statement(connection)
+        else:
+            connection.execute(statement)
+    connection.commit()
+
+
+def _upgrade_archives(connection):
+    """Bring archive files written by older versions up to ARCHIVE_SCHEMA."""
+    months = [row[0] for row in connection.execute("SELECT DISTINCT month FROM message_archive_index")]
+    for month in months:
+        path = archive_path(month)
+        if not os.path.isfile(path):
+            continue
+        connection.execute("ATTACH DATABASE ? AS archive", (path,))
+        try:
+            _apply_archive_schema(connection)
+        finally:
+            connection.execute("DETACH DATABASE archive")
+
+
+def _archive_month(connection, month, cutoff):
+    start, end = _month_bounds(month)
+    end = min(end, cutoff)
+
+    connection.execute("ATTACH DATABASE ? AS archive", (archive_path(month),))
+    try:
+        _apply_archive_schema(connection)
+
+        connection.execute("BEGIN IMMEDIATE")
+        try:
+            connection.execute(
+                f"""
+                INSERT OR IGNORE INTO archive.messages ({ARCHIVE_COLUMNS})
+                SELECT {ARCHIVE_COLUMNS} FROM main.messages WHERE timestamp >= ? AND timestamp < ?
+                """,
+                (start, end),
+            )
+            connection.execute(
+                """
+                INSERT OR IGNORE INTO main.message_archive_index (conversation_id, month)
+                SELECT DISTINCT conversation_id, ? FROM main.messages
+                WHERE timestamp >= ? AND timestamp < ? AND conversation_id IS NOT NULL
+                """,
+                (month, start, end),
+            )
+            deleted = connection.execute(
+                "DELETE FROM main.messages WHERE timestamp >= ? AND timestamp < ?", (start, end)
+            ).rowcount
+            connection.commit()
+        except sqlite3.Error:
+            connection.rollback()
+            raise
+        return deleted
+    finally:
+        connection.execute("DETACH DATABASE archive")
+
+
+def _open_archive(month):
+    """Open a month's archive read-only, or return None if its file is missing."""
+    path = archive_path(month)
+    if not os.path.isfile(path):
+        print(f"Archive file for {month} is missing: {path}")
+        return None
+    return sqlite3.connect(pathlib.Path(path).as_uri() + "?mode=ro", uri=True)
+
+
+def _conversation_months(conversation_id, comparison=None, month=None, descending=True):
+    """Return the archive months holding messages of a conversation, optionally bounded by month."""
+    query = "SELECT month FROM message_archive_index WHERE conversation_id = ?"
+    params = [conversation_id]
+    if comparison is not None:
+        query += f" AND month {comparison} ?"
+        params.append(month)
+    query += " ORDER BY month DESC" if descending else " ORDER BY month ASC"
+    with db_handler.get_connection() as connection:
+        cursor = connection.cursor()
+        cursor.execute(query, params)
+        return [row[0] for row in cursor.fetchall()]
+
+
+def fetch_archived_page(conversation_id, before=None, limit=50):
+    """
+    Read the archived messages of a conversation that come just before a cursor.
+
+    Only archive months listed for the conversation are opened, newest first,
+    until the page is full.
+
+    Args:
+        conversation_id (int): The conversation.
+        before (tuple, optional): (timestamp, id) keyset cursor; omit to start from the newest archived message.
+        limit (int): Maximum number of messages.
+
+    Returns:
+        list: (id, sender_id, content, timestamp, message_type) tuples, oldest first.
+    """
+    if limit <= 0:
+        return []
+
+    if before is None:
+        months = _conversation_months(conversation_id)
+    else:
+        months = _conversation_months(conversation_id, "<=", str(before[0])[:7])
+
+    messages = []
+    for month in months:
+        archive = _open_archive(month)
+        if archive is None:
+            continue
+        try:
+            if before is None:
+                rows = archive.execute(
+                    """
+                    SELECT id, sender_id, content, timestamp, message_type FROM messages
+                    WHERE conversation_id = ?
+                    ORDER BY timestamp DESC, id DESC
+                    LIMIT ?
+                    """,
+                    (conversation_id, limit - len(messages)),
+                ).fetchall()
+            else:
+                rows = archive.execute(
+                    """
+                    SELECT id, sender_id, content, timestamp, message_type FROM messages
+                    WHERE conversation_id = ? AND (timestamp, id) < (?, ?)
+                    ORDER BY timestamp DESC, id DESC
+                    LIMIT ?
+                    """,
+                    (conversation_id, before[0], before[1], limit - len(messages)),
+                ).fetchall()
+        finally:
+            archive.close()
+
+        messages.extend(rows)
+        if len(messages) >= limit:
+            break
+
+    messages.reverse()
+    return messages
+
+
+def fetch_archived_newer_page(conversation_id, after, limit=50, inclusive=False):
+    """
+    Read the archived messages of a conversation that come just after a cursor
+    (scrolling down from an archived search hit).
+
+    Args:
+        conversation_id (int): The conversation.
+        after (tuple): (timestamp, id) keyset cursor.
+        limit (int): Maximum number of messages.
+        inclusive (bool): Also return the message at the cursor itself.
+
+    Returns:
+        list: (id, sender_id, content, timestamp, message_type) tuples, oldest first.
+    """
+    if limit <= 0:
+        return []
+
+    comparison = ">=" if inclusive else ">"
+    messages = []
+    for month in _conversation_months(conversation_id, ">=", str(after[0])[:7], descending=False):
+        archive = _open_archive(month)
+        if archive is None:
+            continue
+        try:
+            rows = archive.execute(
+                f"""
+                SELECT id, sender_id, content, timestamp, message_type FROM messages
+                WHERE conversation_id = ? AND (timestamp, id) {comparison} (?, ?)
+                ORDER BY timestamp ASC, id ASC
+                LIMIT ?
+                """,
+                (conversation_id, after[0], after[1], limit - len(messages)),
+            ).fetchall()
+        finally:
+            archive.close()
+
+        messages.extend(rows)
+        if len(messages) >= limit:
+            break
+
+    return messages
+
+
+def find_archived_message(conversation_id, message_id):
+    """
+    Look up an archived message of a conversation.
+
+    Returns:
+        tuple: Its (timestamp, id) keyset cursor, or None if it is not archived.
+    """
+    for month in _conversation_months(conversation_id):
+        archive = _open_archive(month)
+        if archive is None:
+            continue
+        try:
+            row = archive.execute(
+                "SELECT timestamp, id FROM messages WHERE id = ? AND conversation_id = ?",
+                (message_id, conversation_id),
+            ).fetchone()
+        finally:
+            archive.close()
+        if row is not None:
+            return row
+    return None
+
+
+def fetch_archived_attachment_hashes():
+    """
+    Return the SHA-256 of every stored attachment that archived messages refer to.
+
+    Anything that counts references to blobs in the attachment store, or deletes
+    unreferenced ones, must keep these as well as main.messages.attachment_sha256.
+
+    Returns:
+        set: sha256 hex digests.
+
+    Raises:
+        sqlite3.Error: If an archive cannot be read, so a cleanup never runs on a partial set.
+    """
+    with db_handler.get_connection() as connection:
+        cursor = connection.cursor()
+        cursor.execute("SELECT DISTINCT month FROM message_archive_index")
+        months = [row[0] for row in cursor.fetchall()]
+
+    hashes = set()
+    for month in months:
+        archive = _open_archive(month)
+        if archive is None:
+            continue
+        try:
+            rows = archive.execute(
+                "SELECT DISTINCT attachment_sha256 FROM messages WHERE attachment_sha256 IS NOT NULL"
+            ).fetchall()
+        finally:
+            archive.close()
+        hashes.update(row[0] for row in rows)
+    return hashes
+
+
+def search_archived_messages(user_id, match, conversation_id=None, limit=50, snippet_markers=("[", "]")):
+    """
+    Full-text search over the archived messages of the user's conversations.
+
+    Archives are searched newest month first until limit hits are found; within
+    a month the best matches come first.
+
+    Args:
+        user_id (int): The logged-in user; only conversations they belong to are searched.
+        match (str): An FTS5 MATCH expression (see db_handler_search.build_match_query).
+        conversation_id (int, optional): Restrict the search to one conversation.
+        limit (int): Maximum number of hits.
+        snippet_markers (tuple): Text placed before and after matched terms in snippets.
+
+    Returns:
+        list: (message_id, conversation_id, sender_id, timestamp, snippet) tuples.
+    """
+    if limit <= 0:
+        return []
+
+    query = """
+        SELECT ai.month, ai.conversation_id FROM message_archive_index ai
+        JOIN conversation_members cm ON cm.conversation_id = ai.conversation_id AND cm.user_id = ?
+    """
+    params = [user_id]
+    if conversation_id is not None:
+        query += " WHERE ai.conversation_id = ?"
+        params.append(conversation_id)
+    with db_handler.get_connection() as connection:
+        cursor = connection.cursor()
+        cursor.execute(query, params)
+        conversations_by_month = {}
+        for month, month_conversation_id in cursor.fetchall():
+            conversations_by_month.setdefault(month, []).append(month_conversation_id)
+
+    hits = []
+    for month in sorted(conversations_by_month, reverse=True):
+        archive = _open_archive(month)
+        if archive is None:
+            continue
+        conversation_ids = conversations_by_month[month]
+        placeholders = ", ".join("?" * len(conversation_ids))
+        try:
+            rows = archive.execute(
+                f"""
+                SELECT m.id, m.conversation_id, m.sender_id, m.timestamp,
+                       snippet(messages_fts, 0, ?, ?, '...', 12)
+                FROM messages_fts
+                JOIN messages m ON m.id = messages_fts.rowid
+                WHERE messages_fts MATCH ? AND m.conversation_id IN ({placeholders})
+                ORDER BY bm25(messages_fts)
+                LIMIT ?
+                """,
+                (*snippet_markers, match, *conversation_ids, limit - len(hits)),
+            ).fetchall()
+        except sqlite3.OperationalError as e:
+            # An archive written before archives had a full-text index, not yet upgraded
+            print(f"Could not search archive {month}: {e}")
+            rows = []
+        finally:
+            archive.close()
+
+        hits.extend(rows)
+        if len(hits) >= limit:
+            break
+
+    return hits
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Move old ChatHub messages into monthly archives")
+    parser.add_argument("--days", type=int, default=None, help="Archive messages older than this many days")
+    args = parser.parse_args()
+
+    db_migrations.migrate()
+    archive_old_messages(args.days)
+
+
+if __name__ == "__main__":
+    main()
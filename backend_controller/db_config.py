@@ -0,0 +1,92 @@
+import configparser
+import os
+
+from dotenv import load_dotenv
+
+# Load environment variables (.env in the project root is picked up too)
+load_dotenv()
+
+PROJECT_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# Optional ini file; CHATHUB_CONFIG can point somewhere else
+CONFIG_FILE = os.getenv("CHATHUB_CONFIG", os.path.join(PROJECT_ROOT, "chathub.ini"))
+
+DEFAULT_DB_PATH = os.path.join(PROJECT_ROOT, "message.db")
+DEFAULT_PROFILE = "performance"
+
+# Named PRAGMA sets applied to every new connection, in order
+PROFILES = {
+    # SQLite defaults, apart from waiting on locks instead of failing at once
+    "safe": {
+        "busy_timeout": 5000,
+    },
+    # Many concurrent readers on one growing message.db
+    "performance": {
+        "journal_mode": "WAL",
+        "synchronous": "NORMAL",
+        "mmap_size": 256 * 1024 * 1024,  # 256 MiB
+        "cache_size": -64000,  # negative = KiB, so ~64 MB of page cache
+        "temp_store": "MEMORY",
+        "busy_timeout": 5000,
+    },
+}
+
+
+def _read_config_file():
+    parser = configparser.ConfigParser()
+    if os.path.isfile(CONFIG_FILE):
+        parser.read(CONFIG_FILE)
+    if parser.has_section("database"):
+        return parser["database"]
+    return {}
+
+
+_file_settings = _read_config_file()
+
+
+def get_setting(name, default=None):
+    """
+    Look up a database setting.
+
+    Environment variables (CHATHUB_<NAME>) win over the [database] section of
+    the config file, which wins over the default.
+
+    Args:
+        name (str): Setting name, e.g. "db_path".
+        default: Value used when the setting is not configured anywhere.
+
+    Returns:
+        str: The configured value, or default.
+    """
+    value = os.getenv(f"CHATHUB_{name.upper()}")
+    if value is None:
+        value = _file_settings.get(name)
+    return default if value in (None, "") else value
+
+
+def get_db_path():
+    """Return the configured path to message.db (relative paths are taken from the project root)."""
+    path = os.path.expanduser(get_setting("db_path", DEFAULT_DB_PATH))
+    return path if os.path.isabs(path) else os.path.join(PROJECT_ROOT, path)
+
+
+def get_profile_name():
+    """Return the name of the configured performance profile."""
+    name = get_setting("db_profile", DEFAULT_PROFILE)
+    if name not in PROFILES:
+        print(f"Unknown database profile '{name}', falling back to '{DEFAULT_PROFILE}'.")
+        return DEFAULT_PROFILE
+    return name
+
+
+def apply_profile(connection, profile_name=None):
+    """
+    Apply a named PRAGMA profile to a freshly opened connection.
+
+    Args:
+        connection (sqlite3.Connection): The new connection.
+        profile_name (str, optional): Profile to apply. Defaults to the configured one.
+    """
+    pragmas = PROFILES[profile_name or get_profile_name()]
+    for pragma, value in pragmas.items():
+        connection.execute(f"PRAGMA {pragma} = {value}")
@@ -0,0 +1,25 @@
+from backend_controller import db_handler
+from backend_controller.worker_pool import WorkerPool
+
+
+class DbExecutor(WorkerPool):
+    """Runs backend_controller queries on worker threads instead of the GUI thread."""
+
+    def __init__(self, max_threads=db_handler.POOL_MAX_SIZE):
+        super().__init__(max_threads, name="database")
+
+
+_executor = None
+
+
+def get_executor():
+    """Return the shared DbExecutor, creating it on first use."""
+    global _executor
+    if _executor is None:
+        _executor = DbExecutor()
+    return _executor
+
+
+def run_async(fn, *args, on_result=None, on_error=None, **kwargs):
+    """Shortcut for get_executor().submit(...)."""
+    return get_executor().submit(fn, *args, on_result=on_result, on_error=on_error, **kwargs)
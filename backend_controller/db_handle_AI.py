@@ -1,88 +1,109 @@
-
 from datetime import datetime
-import cohere
-from dotenv import load_dotenv
-import os
 
-# Load environment variables
-load_dotenv()
+from backend_controller import db_writer
+from backend_controller.ai_backends import get_ai_timeout, get_backend
+from backend_controller.ai_cache import get_ai_cache
+from backend_controller.db_handler import get_connection
+from backend_controller.sentiment_batcher import classify_many, get_sentiment_batcher
 
-cohere_api_key = os.getenv("COHERE_API_KEY")
-cohere_client = cohere.Client(cohere_api_key)
+# Chat messages labelled per round of annotate_chat_history
+ANNOTATE_CHUNK_SIZE = 500
 
-from backend_controller.db_handler import create_connection
+# Emoji appended to a message for each sentiment label
+SENTIMENT_EMOJIS = {
+    "positive": "😊",
+    "neutral": "😐",
+    "negative": "😢"
+}
+UNKNOWN_SENTIMENT_EMOJI = "🤔"
 
 def save_chat_message(user_id, message, ai_suggestions):
-    conn = create_connection()
-    cursor = conn.cursor()
+    with get_connection() as conn:
+        cursor = conn.cursor()
 
-    # Insert message into the database
-    cursor.execute("""
-        INSERT INTO chat_messages (user_id, message, ai_suggestions, timestamp)
-        VALUES (?, ?, ?, ?)
-    """, (user_id, message, ai_suggestions, datetime.now()))
-    conn.commit()
-    conn.close()
+        # Insert message into the database
+        cursor.execute("""
+            INSERT INTO chat_messages (user_id, message, ai_suggestions, timestamp)
+            VALUES (?, ?, ?, ?)
+        """, (user_id, message, ai_suggestions, datetime.now()))
+        conn.commit()
 
 def load_chat_history(user_id):
-    conn = create_connection()
-    cursor = conn.cursor()
-
-    cursor.execute("""
-        SELECT message, ai_suggestions, timestamp 
-        FROM chat_messages 
-        WHERE user_id = ? 
-        ORDER BY timestamp ASC
-    """, (user_id,))
-    messages = cursor.fetchall()
-    conn.close()
+    with get_connection() as conn:
+        cursor = conn.cursor()
+
+        cursor.execute("""
+            SELECT message, ai_suggestions, timestamp 
+            FROM chat_messages 
+            WHERE user_id = ? 
+            ORDER BY timestamp ASC
+        """, (user_id,))
+        messages = cursor.fetchall()
 
     return messages
 
 def get_smart_suggestions(user_message):
-    """Get AI-generated smart suggestions using Cohere."""
+    """Get AI-generated smart suggestions, from the AI cache or the configured backend (blocking; see ai_executor)."""
+    backend = get_backend()
     try:
-        # Generate suggestions with Cohere
-        response = cohere_client.generate(
-            model='command-xlarge-nightly',  # Adjust model based on your plan
-            prompt=f"Suggest 3 alternatives for this message: '{user_message}'",
-            max_tokens=30,
-            temperature=0.7,
-            k=0,
-            p=0.75,
-            stop_sequences=["--"]  # Optional, can use to separate multiple outputs
-        )
-
-        # Extract and split suggestions
-        generated_text = response.generations[0].text
-        suggestions = generated_text.strip().split('\n')  # Split suggestions into a list
-        return [suggestion.strip() for suggestion in suggestions if suggestion.strip()]
+        # Repeated phrases are answered from the cache without calling the backend
+        return get_ai_cache().get_or_compute(
+            "suggestions", backend, user_message, lambda: backend.generate_suggestions(user_message))
     except Exception as e:
         print(f"Error generating suggestions: {e}")
         return ["Sorry, I couldn't generate suggestions. Please try again later."]
 
 def analyze_sentiment(message):
-    """Analyze sentiment using Cohere's classify endpoint."""
+    """Analyze sentiment (cached, else via the sentiment batcher) and return a matching emoji (blocking)."""
     try:
-        # Use Cohere's classify API for sentiment analysis
-        response = cohere_client.classify(
-            inputs=[message],
-            model='large',  # Use Cohere's sentiment model (customizable if needed)
-            examples=[
-                cohere.ClassifyExample("I love this!", "positive"),
-                cohere.ClassifyExample("This is the worst!", "negative"),
-                cohere.ClassifyExample("It's okay, not great.", "neutral")
-            ]
-        )
-
-        sentiment = response.classifications[0].prediction
+        # Classified together with whatever else arrives in the same few milliseconds
+        sentiment = get_sentiment_batcher().submit(message).result(timeout=get_ai_timeout())
         # Map sentiment to emojis
-        sentiment_emojis = {
-            "positive": "😊",
-            "neutral": "😐",
-            "negative": "😢"
-        }
-        return sentiment_emojis.get(sentiment, "🤔")
+        return SENTIMENT_EMOJIS.get(sentiment, UNKNOWN_SENTIMENT_EMOJI)
     except Exception as e:
         print(f"Error analyzing sentiment: {e}")
-        return "🤔"
+        return UNKNOWN_SENTIMENT_EMOJI
+
+def annotate_chat_history(user_id=None, chunk_size=ANNOTATE_CHUNK_SIZE):
+    """
+    Back-fill the sentiment label of stored chat messages, in bulk (blocking; run it on a worker).
+
+    Unlabelled messages are read chunk_size at a time, classified with
+    classify_many (cached answers first, then one backend call per batch), and
+    written back with a single executemany per chunk.
+
+    Args:
+        user_id (int, optional): Only this user's messages; omit for everyone's.
+
+    Returns:
+        int: The number of messages labelled.
+    """
+    labelled = 0
+    last_id = 0
+    while True:
+        with get_connection() as conn:
+            cursor = conn.cursor()
+            if user_id is None:
+                cursor.execute("""
+                    SELECT id, message FROM chat_messages
+                    WHERE sentiment IS NULL AND id > ?
+                    ORDER BY id LIMIT ?
+                """, (last_id, chunk_size))
+            else:
+                cursor.execute("""
+                    SELECT id, message FROM chat_messages
+                    WHERE user_id = ? AND sentiment IS NULL AND id > ?
+                    ORDER BY id LIMIT ?
+                """, (user_id, last_id, chunk_size))
+            rows = cursor.fetchall()
+        if not rows:
+            return labelled
+
+        labels = classify_many([message for _, message in rows])
+        db_writer.submit(_update_sentiments, [(label, row_id) for (row_id, _), label in zip(rows, labels)]).result()
+        labelled += len(rows)
+        last_id = rows[-1][0]
+
+def _update_sentiments(cursor, labels):
+    """Writer operation for annotate_chat_history."""
+    cursor.executemany("UPDATE chat_messages SET sentiment = ? WHERE id = ?", labels)
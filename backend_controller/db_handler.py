@@ -1,22 +1,74 @@
 import sqlite3
+import threading
+
+from backend_controller import db_config
+from backend_controller.db_pool import ConnectionPool
 from helpers.log_message import LogMessage
 
-# Path to the SQLite database file
-DB_PATH = "C:/Users/NTECH/OneDrive/Desktop/CREATED DATABASES/message.db"
+# Path to the SQLite database file (set CHATHUB_DB_PATH or chathub.ini to change it)
+DB_PATH = db_config.get_db_path()
+
+# Upper bound on connections open at the same time (one per busy thread)
+POOL_MAX_SIZE = 8
 
 log_message = LogMessage()
 
+_pool = None
+_pool_lock = threading.Lock()
+
+
+def get_pool():
+    """
+    Return the shared connection pool, creating it on first use.
+
+    Returns:
+        ConnectionPool: The process-wide pool for DB_PATH.
+    """
+    global _pool
+    if _pool is None:
+        with _pool_lock:
+            if _pool is None:
+                _pool = ConnectionPool(
+                    DB_PATH, max_size=POOL_MAX_SIZE, on_connect=db_config.apply_profile
+                )
+    return _pool
+
+
+def get_connection():
+    """
+    Check out a pooled connection for use in a with-block.
+
+    Example:
+        with get_connection() as connection:
+            connection.execute(...)
+
+    Returns:
+        PooledConnection: Returned to the pool when the block exits.
+    """
+    return get_pool().checkout()
+
+
+def close_pool():
+    """Close every pooled connection. Called once when the app exits."""
+    global _pool
+    with _pool_lock:
+        if _pool is not None:
+            _pool.close_all()
+            _pool = None
+
 
 def create_connection():
     """
     Create a database connection.
 
+    The connection comes from the shared pool; calling close() on it returns it
+    to the pool instead of closing it. Prefer get_connection() in new code.
+
     Returns:
-        sqlite3.Connection: A connection object for the database.
+        PooledConnection: A connection object for the database.
     """
     try:
-        conn = sqlite3.connect(DB_PATH)
-        return conn
+        return get_connection()
     except sqlite3.Error as e:
         print(f"Error connecting to the database: {e}")
         return None
@@ -24,23 +76,21 @@ def create_connection():
 
 def insert_user(name, phone_number):
     """Insert a new user into the users table."""
-    conn = create_connection()
-    cursor = conn.cursor()
-    cursor.execute("INSERT INTO users (name, phone_number) VALUES (?, ?)", (name, phone_number))
-    conn.commit()
-    conn.close()
+    with get_connection() as conn:
+        cursor = conn.cursor()
+        cursor.execute("INSERT INTO users (name, phone_number) VALUES (?, ?)", (name, phone_number))
+        conn.commit()
 
 
 def check_user_exists(name, phone_number):
     """Check if a user with the given name or phone number exists in the database."""
-    conn = create_connection()
-    cursor = conn.cursor()
-    cursor.execute(
-        "SELECT * FROM users WHERE name = ? OR phone_number = ?",
-        (name, phone_number)
-    )
-    user = cursor.fetchone()
-    conn.close()
+    with get_connection() as conn:
+        cursor = conn.cursor()
+        cursor.execute(
+            "SELECT * FROM users WHERE name = ? OR phone_number = ?",
+            (name, phone_number)
+        )
+        user = cursor.fetchone()
     return user is not None
 
 
@@ -53,17 +103,16 @@ def validate_user_data(name, phone_number):
     return True, ""
 
 def fetch_user_id(name, phone_number):
-    conn = create_connection()
-    cursor = conn.cursor()
-    cursor.execute(
-        "SELECT id FROM users WHERE name = ? OR phone_number = ?", (name, phone_number)
-    )
-    user_id = cursor.fetchone()
+    with get_connection() as conn:
+        cursor = conn.cursor()
+        cursor.execute(
+            "SELECT id FROM users WHERE name = ? OR phone_number = ?", (name, phone_number)
+        )
+        user_id = cursor.fetchone()
     if user_id:
         user_id = user_id[0]
         return user_id
     else:
-        conn.close()
         log_message.show_error_message("Error fetching user ID.")
         return None
 
@@ -76,60 +125,46 @@ def login_user(name, phone):
         :param phone: The phone number of the user.
         :return: True if the user exists, False otherwise.
         """
-        conn = create_connection()
-        if conn:
-            try:
+        try:
+            with get_connection() as conn:
                 cursor = conn.cursor()
                 cursor.execute(
                     "SELECT * FROM users WHERE name = ? AND phone_number = ?", (name, phone)
                 )
                 user = cursor.fetchone()
                 return user is not None
-            except sqlite3.Error as e:
-                print(f"Error during login: {e}")
-                return False
-            finally:
-                conn.close()
+        except sqlite3.Error as e:
+            print(f"Error during login: {e}")
+            return False
 def fetch_user_name_by_id(user_id):
-    """Fetch the name of a user by their ID."""
-    connection = create_connection()
-    cursor = connection.cursor()
+    """Fetch the name of a user by their ID (served from the in-memory user directory)."""
+    from backend_controller.user_directory import get_user_directory
 
     try:
-        query = "SELECT name FROM users WHERE id = ?;"
-        cursor.execute(query, (user_id,))
-        result = cursor.fetchone()
-        if result:
-            return result[0]  # The name is in the first column of the result
-        else:
-            return None  # No user found with the given ID
+        return get_user_directory().get_name(user_id)  # None if no user has this ID
     except Exception as e:
         print(f"Error fetching user name: {e}")
         return None
-    finally:
-        connection.close()
 
 
 def insert_feedback(user_name, feedback_text, tabletype):
     """
     Inserts feedback into the feedback table in the database.
 
+    The insert is handed to the group-commit writer and does not block the caller.
+
     Args:
         user_name (str): Name of the user providing feedback.
         feedback_text (str): Feedback content.
     """
-    try:
-        connection = create_connection()
-        cursor = connection.cursor()
+    # Imported here because db_writer itself depends on this module
+    from backend_controller import db_writer
 
+    def _insert(cursor):
         query = f"INSERT INTO {tabletype} (user_name, feedback_text) VALUES (?, ?)"
         cursor.execute(query, (user_name, feedback_text))
-        connection.commit()
 
+    try:
+        return db_writer.report_errors(db_writer.submit(_insert), "save feedback")
     except sqlite3.Error as e:
         print(f"Database error: {e}")
-    finally:
-        if connection:
-            connection.close()
-
-
@@ -0,0 +1,110 @@
+import threading
+
+from backend_controller import db_handler
+
+# Conversation ids never change once created, so lookups are memoised per process
+_direct_ids = {}
+_group_ids = {}
+_cache_lock = threading.Lock()
+
+
+def get_direct_conversation_id(user_id, friend_id):
+    """
+    Return the id of the one-to-one conversation between two users, creating it if needed.
+
+    Commits on its own connection, so call it before queueing a write that uses the
+    id, not from inside a writer operation.
+
+    Args:
+        user_id (int): One participant.
+        friend_id (int): The other participant.
+
+    Returns:
+        int: The conversation id.
+    """
+    key = (min(user_id, friend_id), max(user_id, friend_id))
+    conversation_id = _direct_ids.get(key)
+    if conversation_id is not None:
+        return conversation_id
+
+    with db_handler.get_connection() as connection:
+        cursor = connection.cursor()
+        cursor.execute(
+            "INSERT OR IGNORE INTO conversations (kind, user_low, user_high) VALUES ('direct', ?, ?)",
+            key,
+        )
+        cursor.execute("SELECT id FROM conversations WHERE user_low = ? AND user_high = ?", key)
+        conversation_id = cursor.fetchone()[0]
+        add_conversation_members(cursor, conversation_id, key)
+        connection.commit()
+
+    with _cache_lock:
+        _direct_ids[key] = conversation_id
+    return conversation_id
+
+
+def get_group_conversation_id(group_id):
+    """
+    Return the id of a group's conversation, creating it if needed.
+
+    Args:
+        group_id (int): The group.
+
+    Returns:
+        int: The conversation id.
+    """
+    conversation_id = _group_ids.get(group_id)
+    if conversation_id is not None:
+        return conversation_id
+
+    with db_handler.get_connection() as connection:
+        cursor = connection.cursor()
+        conversation_id = create_group_conversation(cursor, group_id)
+        connection.commit()
+
+    with _cache_lock:
+        _group_ids[group_id] = conversation_id
+    return conversation_id
+
+
+def create_group_conversation(cursor, group_id):
+    """
+    Create the conversation for a group inside the caller's transaction.
+
+    The group's creator and current members become conversation members.
+
+    Returns:
+        int: The conversation id (the existing one if the group already has it).
+    """
+    cursor.execute("INSERT OR IGNORE INTO conversations (kind, group_id) VALUES ('group', ?)", (group_id,))
+    cursor.execute("SELECT id FROM conversations WHERE group_id = ?", (group_id,))
+    conversation_id = cursor.fetchone()[0]
+    cursor.execute(
+        """
+        INSERT OR IGNORE INTO conversation_members (conversation_id, user_id)
+        SELECT ?, created_by FROM groups WHERE id = ?
+        UNION
+        SELECT ?, member_id FROM group_members WHERE group_id = ?
+        """,
+        (conversation_id, group_id, conversation_id, group_id),
+    )
+    return conversation_id
+
+
+def add_conversation_members(cursor, conversation_id, user_ids):
+    """Add users to a conversation inside the caller's transaction (duplicates are ignored)."""
+    cursor.executemany(
+        "INSERT OR IGNORE INTO conversation_members (conversation_id, user_id) VALUES (?, ?)",
+        [(conversation_id, user_id) for user_id in user_ids],
+    )
+
+
+def fetch_conversation_members(conversation_id):
+    """Return the user ids taking part in a conversation."""
+    with db_handler.get_connection() as connection:
+        cursor = connection.cursor()
+        cursor.execute(
+            "SELECT user_id FROM conversation_members WHERE conversation_id = ?",
+            (conversation_id,),
+        )
+        return [row[0] for row in cursor.fetchall()]
@@ -6,9 +6,11 @@ import subprocess
 import sys
 
 import backend_controller.db_handler as db_handler
+from backend_controller import attachment_store, db_archive, db_handler_conversations, db_writer, friend_graph, user_directory
 from PySide6.QtWidgets import QMessageBox
 
-
+# Messages per chat history page
+HISTORY_PAGE_SIZE = 50
 
 
 def connect_to_database():
@@ -18,114 +20,110 @@ def connect_to_database():
     Returns:
         sqlite3.Connection: Connection object for the database.
     """
-    conn = db_handler.create_connection()
-    return conn
+    return db_handler.get_connection()
 
 def close_database_connection(conn):
     """
-    Close the database connection.
+    Close the database connection (returns it to the pool).
 
     Args:
-        conn (sqlite3.Connection): Connection object for the database.
+        conn (PooledConnection): Connection object for the database.
     """
     conn.close()
 
 def add_friend_request(sender_id, friend_name, self=None):
     """Send a friend request."""
     print(f"Sender id from db_handler_friends.py {sender_id}")
-    connection = connect_to_database()
-    connection.execute("PRAGMA foreign_keys = ON")  # Enable foreign keys
-    cursor = connection.cursor()
+    with connect_to_database() as connection:
+        connection.execute("PRAGMA foreign_keys = ON")  # Enable foreign keys
+        cursor = connection.cursor()
 
-    # Normalize input
-    friend_name = friend_name.strip().title()
+        # Normalize input
+        friend_name = friend_name.strip().title()
 
-    # Check if the entered friend exists in the database
-    query = "SELECT id FROM users WHERE name = ?"
-    cursor.execute(query, (friend_name,))
-    result = cursor.fetchone()
+        # Check if the entered friend exists in the database
+        query = "SELECT id FROM users WHERE name = ?"
+        cursor.execute(query, (friend_name,))
+        result = cursor.fetchone()
 
-    if result:
-        receiver_id = result[0]
+        if result:
+            receiver_id = result[0]
 
-        # Check if the users are already friends
-        cursor.execute(
-            """
-            SELECT id FROM friends
-            WHERE (user_id = ? AND friend_id = ?) OR (user_id = ? AND friend_id = ?)
-            """,
-            (sender_id, receiver_id, receiver_id, sender_id),
-        )
-        existing_friendship = cursor.fetchone()
-
-        if existing_friendship:
-            QMessageBox.information(self, "Info", "You are already friends with this user.")
-            connection.close()
-            return
+            # Check if the users are already friends
+            cursor.execute(
+                """
+                SELECT id FROM friends
+                WHERE (user_id = ? AND friend_id = ?) OR (user_id = ? AND friend_id = ?)
+                """,
+                (sender_id, receiver_id, receiver_id, sender_id),
+            )
+            existing_friendship = cursor.fetchone()
 
-        # Check if a request already exists
-        cursor.execute(
-            """
-            SELECT id FROM friend_requests
-            WHERE sender_id = ? AND receiver_id = ? AND status = 'pending'
-            """,
-            (sender_id, receiver_id),
-        )
-        existing_request = cursor.fetchone()
+            if existing_friendship:
+                QMessageBox.information(self, "Info", "You are already friends with this user.")
+                return
 
-        if existing_request:
-            QMessageBox.information(self, "Info", "You have already sent a request to this user.")
+            # Check if a request already exists
+            cursor.execute(
+                """
+                SELECT id FROM friend_requests
+                WHERE sender_id = ? AND receiver_id = ? AND status = 'pending'
+                """,
+                (sender_id, receiver_id),
+            )
+            existing_request = cursor.fetchone()
+
+            if existing_request:
+                QMessageBox.information(self, "Info", "You have already sent a request to this user.")
+            else:
+                try:
+                    # Insert a new friend request
+                    cursor.execute(
+                        "INSERT INTO friend_requests (sender_id, receiver_id) VALUES (?, ?)",
+                        (sender_id, receiver_id),
+                    )
+                    connection.commit()
+                    return True
+                    # QMessageBox.information(self, "Success", "Friend request sent!")
+                except sqlite3.IntegrityError as e:
+                    QMessageBox.warning(self, "Error", f"Failed to send friend request: {str(e)}")
         else:
-            try:
-                # Insert a new friend request
-                cursor.execute(
-                    "INSERT INTO friend_requests (sender_id, receiver_id) VALUES (?, ?)",
-                    (sender_id, receiver_id),
-                )
-                connection.commit()
-                return True
-                # QMessageBox.information(self, "Success", "Friend request sent!")
-            except sqlite3.IntegrityError as e:
-                QMessageBox.warning(self, "Error", f"Failed to send friend request: {str(e)}")
-    else:
-        QMessageBox.warning(self, "Error", "Sorry, the user is not registered to our system yet.")
-
-    connection.close()
+            QMessageBox.warning(self, "Error", "Sorry, the user is not registered to our system yet.")
 
 def load_friends(user_id):
-    """Load the friends of the logged-in user."""
-    connection = db_handler.create_connection()
-    cursor = connection.cursor()
+    """
+    Load the friends of the logged-in user.
 
-    query = """
-        SELECT u.name, u.id
-        FROM friends f
-        JOIN users u ON u.id = f.friend_id
-        WHERE f.user_id = ?
+    Served from the shared friend graph, which reads the database once per session.
+
+    Returns:
+        list: (friend_name, friend_id) tuples.
     """
-    cursor.execute(query, (user_id,))
-    friends = cursor.fetchall()
+    friends = [(name, friend_id) for friend_id, name in friend_graph.get_friend_graph(user_id).friends()]
     print(f"List of friends from db_handler_friends.py {friends}")
     return friends
 
 def check_friend_requests(user_id, self=None):
     """Check and display pending friend requests for the logged-in user."""
-    connection = db_handler.create_connection()
-    cursor = connection.cursor()
+    prompt_friend_requests(user_id, fetch_pending_friend_requests(user_id), self)
 
+def fetch_pending_friend_requests(user_id):
+    """Return the names of users with a pending friend request to user_id. Safe to run off the GUI thread."""
     query = """
         SELECT u.name
         FROM friend_requests fr
         JOIN users u ON u.id = fr.sender_id
         WHERE fr.receiver_id = ? AND fr.status = 'pending'
     """
-    cursor.execute(query, (user_id,))
-    requests = cursor.fetchall()
-
-    connection.close()
+    with db_handler.get_connection() as connection:
+        cursor = connection.cursor()
+        cursor.execute(query, (user_id,))
+        return [row[0] for row in cursor.fetchall()]
 
-    if requests:
-        message = "You have friend requests from:\n" + "\n".join([req[0] for req in requests])
+def prompt_friend_requests(user_id, sender_names, self=None):
+    """Ask whether to respond to the pending requests from sender_names. GUI thread only."""
+    if sender_names:
+        message = "You have friend requests from:\n" + "\n".join(sender_names)
         reply = QMessageBox.question(
             self, "Friend Requests", message + "\nDo you want to respond now?",
             QMessageBox.Yes | QMessageBox.No
@@ -136,185 +134,309 @@ def check_friend_requests(user_id, self=None):
 
 def respond_to_friend_requests(user_id, self=None):
     """Respond to pending friend requests."""
-    connection = db_handler.create_connection()
-    cursor = connection.cursor()
+    with db_handler.get_connection() as connection:
+        cursor = connection.cursor()
 
-    # Retrieve pending friend requests
-    query = """
-        SELECT fr.id, u.id, u.name
-        FROM friend_requests fr
-        JOIN users u ON u.id = fr.sender_id
-        WHERE fr.receiver_id = ? AND fr.status = 'pending'
-    """
-    cursor.execute(query, (user_id,))
-    requests = cursor.fetchall()
+        # Retrieve pending friend requests
+        query = """
+            SELECT fr.id, u.id, u.name
+            FROM friend_requests fr
+            JOIN users u ON u.id = fr.sender_id
+            WHERE fr.receiver_id = ? AND fr.status = 'pending'
+        """
+        cursor.execute(query, (user_id,))
+        requests = cursor.fetchall()
 
-    print(f"Pending requests: {requests}")
+        print(f"Pending requests: {requests}")
 
-    for request_id, sender_id, sender_name in requests:
-        reply = QMessageBox.question(
-            self, "Friend Request", f"{sender_name} wants to be your friend. Accept?",
-            QMessageBox.Yes | QMessageBox.No
-        )
-        if reply == QMessageBox.Yes:
-            # Update the friend_requests table and add to friends
-            cursor.execute("UPDATE friend_requests SET status = 'accepted' WHERE id = ?", (request_id,))
-            cursor.execute(
-                "INSERT INTO friends (user_id, friend_id) VALUES (?, ?), (?, ?)",
-                (user_id, sender_id, sender_id, user_id)
+        for request_id, sender_id, sender_name in requests:
+            request_sender_name = sender_name
+            reply = QMessageBox.question(
+                self, "Friend Request", f"{sender_name} wants to be your friend. Accept?",
+                QMessageBox.Yes | QMessageBox.No
             )
+            if reply == QMessageBox.Yes:
+                # Update the friend_requests table and add to friends
+                cursor.execute("UPDATE friend_requests SET status = 'accepted' WHERE id = ?", (request_id,))
+                cursor.execute(
+                    "INSERT INTO friends (user_id, friend_id) VALUES (?, ?), (?, ?)",
+                    (user_id, sender_id, sender_id, user_id)
+                )
 
-            # Fetch name by id and add to notifications
-            cursor.execute("SELECT name FROM users WHERE id = ?", (user_id,))
-            sender_name = cursor.fetchone()
-            sender_name = sender_name[0]
+                # Fetch name by id and add to notifications
+                sender_name = db_handler.fetch_user_name_by_id(user_id)
 
 
-            # Add a notification for the sender
-            notification_message = f"{sender_name} accepted your friend request!"
-            cursor.execute(
-                "INSERT INTO notifications (user_id, message) VALUES (?, ?)",
-                (sender_id, notification_message)
-            )
-            connection.commit()
-        else:
-            # Reject the friend request
-            cursor.execute("UPDATE friend_requests SET status = 'rejected' WHERE id = ?", (request_id,))
-            connection.commit()
+                # Add a notification for the sender
+                notification_message = f"{sender_name} accepted your friend request!"
+                cursor.execute(
+                    "INSERT INTO notifications (user_id, message) VALUES (?, ?)",
+                    (sender_id, notification_message)
+                )
+                connection.commit()
 
-    connection.close()
+                # Both friend lists gain an entry; no need to reload them
+                friend_graph.friendship_added(user_id, sender_id, sender_name, request_sender_name)
+            else:
+                # Reject the friend request
+                cursor.execute("UPDATE friend_requests SET status = 'rejected' WHERE id = ?", (request_id,))
+                connection.commit()
 
 def fetch_notifications(user_id, table: str):
     """Fetch unread notifications for a user."""
-    connection = db_handler.create_connection()
-    cursor = connection.cursor()
-
     query = f"""
         SELECT id, message, created_at
         FROM {table}
         WHERE user_id = ? AND is_read = 0
         ORDER BY created_at DESC
     """
-    cursor.execute(query, (user_id,))
-    notifications = cursor.fetchall()
+    with db_handler.get_connection() as connection:
+        cursor = connection.cursor()
+        cursor.execute(query, (user_id,))
+        notifications = cursor.fetchall()
 
-    connection.close()
     return notifications
 
 def mark_notifications_as_read(user_id, table: str):
     """Mark all notifications as read for a user."""
-    connection = db_handler.create_connection()
-    cursor = connection.cursor()
-
     query = f"UPDATE {table} SET is_read = 1 WHERE user_id = ?"
-    cursor.execute(query, (user_id,))
-    connection.commit()
+    with db_handler.get_connection() as connection:
+        cursor = connection.cursor()
+        cursor.execute(query, (user_id,))
+        connection.commit()
+
+def save_message(user_id, selected_friend, message_content):
+    """
+    Handles saving messages.
 
-    connection.close()
+    The message and its notification are written by the group-commit writer;
+    this call blocks until that batch has committed, so run it off the GUI
+    thread. Database errors are raised to the caller.
 
-def save_message(user_id, selected_friend, message_content, self=None):
-    """Handles saving messages."""
+    Returns:
+        int: The id of the new message.
+    """
     # Save the message to the database
-    connection = connect_to_database()
-    cursor = connection.cursor()
+    return queue_message(user_id, selected_friend, message_content).result()
 
-    try:
+def queue_message(user_id, selected_friend, message_content):
+    """
+    Queues a message for the group-commit writer without waiting for it.
+
+    Returns:
+        Future: Resolves to the new message id once the batch has committed.
+    """
+    conversation_id = db_handler_conversations.get_direct_conversation_id(user_id, selected_friend)
+    return db_writer.submit(_insert_message, conversation_id, user_id, selected_friend, message_content)
+
+def _insert_message(cursor, conversation_id, user_id, selected_friend, message_content):
+    """Writer operation for save_message."""
+    cursor.execute(
+        """
+        INSERT INTO messages (conversation_id, sender_id, receiver_id, content)
+        VALUES (?, ?, ?, ?)
+        """,
+        (conversation_id, user_id, selected_friend, message_content),
+    )
+    message_id = cursor.lastrowid
+    # storing notification for the receiver
+    # Fetch sender name by id and add to notifications
+    sender_name = db_handler.fetch_user_name_by_id(user_id)
+
+    # Add a notification for the sender
+    notification_message = f"{sender_name} sent you a message!"
+    cursor.execute(
+        """
+        INSERT INTO message_notifications (user_id, message)
+        VALUES (?, ?)
+        """,
+        (selected_friend, notification_message),
+    )
+    return message_id
+
+def load_chat_history_db(friend_id, user_id, before=None, limit=HISTORY_PAGE_SIZE):
+    """
+    Loads one page of the chat history between the current user and the selected friend.
+
+    Pages are keyset-paginated on (timestamp, id), so every page is a single
+    index range scan no matter how long the conversation is.
+    Safe to run on a worker thread: database errors are raised to the caller.
+
+    Args:
+        friend_id (int): The friend on the other side of the conversation.
+        user_id (int): The logged-in user.
+        before (tuple, optional): Cursor returned by the previous call; omit for the newest page.
+        limit (int): Maximum number of messages in the page.
+
+    Returns:
+        tuple: (messages, older_cursor). messages are (id, sender_id, content, timestamp,
+        message_type) tuples, oldest first. older_cursor is passed back as before= to load
+        the previous page, or None when this page reaches the start of the conversation.
+    """
+    conversation_id = db_handler_conversations.get_direct_conversation_id(user_id, friend_id)
+    with connect_to_database() as connection:
+        return _older_page(connection.cursor(), conversation_id, before, limit)
+
+def load_newer_chat_history_db(friend_id, user_id, after, limit=HISTORY_PAGE_SIZE):
+    """
+    Loads the page of chat history right after a cursor (scrolling down from a search hit).
+
+    Returns:
+        tuple: (messages, newer_cursor). messages are oldest first; newer_cursor is
+        passed back as after= for the next page, or None once the newest message is included.
+    """
+    conversation_id = db_handler_conversations.get_direct_conversation_id(user_id, friend_id)
+    with connect_to_database() as connection:
+        return _newer_page(connection.cursor(), conversation_id, after, limit)
+
+def load_chat_history_around(friend_id, user_id, message_id, limit=HISTORY_PAGE_SIZE):
+    """
+    Loads a page of chat history centred on one message, for jumping to a search hit.
+
+    Returns:
+        tuple: (messages, older_cursor, newer_cursor), with the cursors as returned by
+        load_chat_history_db and load_newer_chat_history_db.
+    """
+    conversation_id = db_handler_conversations.get_direct_conversation_id(user_id, friend_id)
+    with connect_to_database() as connection:
+        cursor = connection.cursor()
         cursor.execute(
-            """
-            INSERT INTO messages (sender_id, receiver_id, content)
-            VALUES (?, ?, ?)
-            """,
-            (user_id, selected_friend, message_content),
+            "SELECT timestamp, id FROM messages WHERE id = ? AND conversation_id = ?",
+            (message_id, conversation_id),
         )
-        # storing notification for the receiver
-        # Fetch sender name by id and add to notifications
-        cursor.execute("SELECT name FROM users WHERE id = ?", (user_id,))
-        sender_name = cursor.fetchone()
-        sender_name = sender_name[0]
-
-        # Add a notification for the sender
-        notification_message = f"{sender_name} sent you a message!"
+        hit = cursor.fetchone() or db_archive.find_archived_message(conversation_id, message_id)
+        if hit is None:
+            messages, older_cursor = _older_page(cursor, conversation_id, None, limit)
+            return messages, older_cursor, None
+
+        older_limit = limit // 2
+        older, older_cursor = _older_page(cursor, conversation_id, tuple(hit), older_limit)
+        # The hit itself is the first row of the newer half
+        newer, newer_cursor = _newer_page(cursor, conversation_id, tuple(hit), limit - older_limit, inclusive=True)
+        return older + newer, older_cursor, newer_cursor
+
+def _older_page(cursor, conversation_id, before, limit):
+    if before is None:
         cursor.execute(
             """
-            INSERT INTO message_notifications (user_id, message)
-            VALUES (?, ?)
+            SELECT id, sender_id, content, timestamp, message_type FROM messages
+            WHERE conversation_id = ?
+            ORDER BY timestamp DESC, id DESC
+            LIMIT ?
             """,
-            (selected_friend, notification_message),
+            (conversation_id, limit),
         )
-        connection.commit()
-
-    except sqlite3.Error as e:
-        QMessageBox.warning(self, "Error", f"Failed to send message: {str(e)}")
-    finally:
-        connection.close()
-
-def load_chat_history_db(friend_id, user_id, self=None):
-    """Loads the chat history between the current user and the selected friend."""
-    connection = connect_to_database()
-    cursor = connection.cursor()
-
-    try:
+    else:
         cursor.execute(
             """
-            SELECT sender_id, content, timestamp, message_type  FROM messages
-            WHERE (sender_id = ? AND receiver_id = ?)
-               OR (sender_id = ? AND receiver_id = ?)
-            ORDER BY timestamp ASC
+            SELECT id, sender_id, content, timestamp, message_type FROM messages
+            WHERE conversation_id = ? AND (timestamp, id) < (?, ?)
+            ORDER BY timestamp DESC, id DESC
+            LIMIT ?
             """,
-            (user_id, friend_id, friend_id, user_id),
+            (conversation_id, before[0], before[1], limit),
         )
-        chat_history = cursor.fetchall()
-        return chat_history
-    except sqlite3.Error as e:
-        QMessageBox.warning(self, "Error", f"Failed to load chat history: {str(e)}")
-        return []
-
-    finally:
-        connection.close()
+    messages = cursor.fetchall()
+    messages.reverse()
+
+    # Past the start of the hot database, keep reading from the monthly archives
+    if len(messages) < limit:
+        archive_before = (messages[0][3], messages[0][0]) if messages else before
+        messages = db_archive.fetch_archived_page(conversation_id, archive_before, limit - len(messages)) + messages
+
+    # A short page means there is nothing older left
+    older_cursor = (messages[0][3], messages[0][0]) if messages and len(messages) == limit else None
+    return messages, older_cursor
+
+def _newer_page(cursor, conversation_id, after, limit, inclusive=False):
+    # A cursor inside the archived stretch reads the rest of the archives first
+    messages = db_archive.fetch_archived_newer_page(conversation_id, after, limit, inclusive)
+    if messages:
+        after, inclusive = (messages[-1][3], messages[-1][0]), False
+
+    comparison = ">=" if inclusive else ">"
+    cursor.execute(
+        f"""
+        SELECT id, sender_id, content, timestamp, message_type FROM messages
+        WHERE conversation_id = ? AND (timestamp, id) {comparison} (?, ?)
+        ORDER BY timestamp ASC, id ASC
+        LIMIT ?
+        """,
+        (conversation_id, after[0], after[1], limit - len(messages)),
+    )
+    messages += cursor.fetchall()
+    newer_cursor = (messages[-1][3], messages[-1][0]) if messages and len(messages) == limit else None
+    return messages, newer_cursor
+
+def fetch_new_messages(user_id, selected_friend, last_seen_id=0):
+    """
+    Fetches every message in a conversation newer than the caller's high-water mark.
 
-def check_for_new_messages(user_id, selected_friend):
-    """Checks for new messages from the database."""
-    connection = connect_to_database()
-    cursor = connection.cursor()
+    Args:
+        user_id (int): The logged-in user.
+        selected_friend (int): The friend on the other side of the conversation.
+        last_seen_id (int): Highest message id the caller has already shown.
 
+    Returns:
+        list: (id, sender_id, content, timestamp, message_type) tuples in id order;
+        empty if nothing arrived or the query failed.
+    """
     try:
-        cursor.execute(
-            """
-            SELECT sender_id, content, timestamp FROM messages
-            WHERE (sender_id = ? AND receiver_id = ?)
-               OR (sender_id = ? AND receiver_id = ?)
-            ORDER BY timestamp DESC LIMIT 1
-            """,
-            (user_id, selected_friend, selected_friend, user_id),
-        )
-        latest_message = cursor.fetchone()
-        return latest_message
+        conversation_id = db_handler_conversations.get_direct_conversation_id(user_id, selected_friend)
+        with connect_to_database() as connection:
+            cursor = connection.cursor()
+            cursor.execute(
+                """
+                SELECT id, sender_id, content, timestamp, message_type FROM messages
+                WHERE conversation_id = ? AND id > ?
+                ORDER BY id ASC
+                """,
+                (conversation_id, last_seen_id),
+            )
+            return cursor.fetchall()
 
     except sqlite3.Error as e:
         print(f"Failed to check for new messages: {str(e)}")
-    finally:
-        connection.close()
+        return []
 
-def save_file_message(sender_id, receiver_id, file_path, file_type):
+def save_file_message(sender_id, receiver_id, file_path, file_type, progress=None, is_cancelled=None):
     """
     Saves a file (image or document) as a message in the database.
 
-    The file's path is stored in the 'content' column as plain text.
+    The file is copied into the attachment store (once per distinct content) and
+    the message refers to it by hash, so it can be opened wherever the store is
+    reachable. Hashing and copying read the whole file, so call this from a worker
+    (see attachment_upload).
+
+    Args:
+        progress, is_cancelled: Passed to attachment_store.store_file.
+
+    Returns:
+        int: The new message id, or None if cancelled or on failure.
     """
     try:
-        conn = connect_to_database()
-        cursor = conn.cursor()
-        query = """
-            INSERT INTO messages (sender_id, receiver_id, content, message_type)
-            VALUES (?, ?, ?, ?)
-        """
-        cursor.execute(query, (sender_id, receiver_id, file_path, file_type))
-        conn.commit()
+        stored = attachment_store.store_file(file_path, progress, is_cancelled)
+        if stored is None:
+            return None
+        sha256, extension, size, reference = stored
+        conversation_id = db_handler_conversations.get_direct_conversation_id(sender_id, receiver_id)
+        return db_writer.submit(
+            _insert_file_message, conversation_id, sender_id, receiver_id, reference, file_type,
+            (sha256, extension, size),
+        ).result()
     except sqlite3.Error as e:
         print("SQLite error:", e)
-    finally:
-        if conn:
-            conn.close()
+
+def _insert_file_message(cursor, conversation_id, sender_id, receiver_id, reference, file_type, blob):
+    """Writer operation for save_file_message."""
+    sha256, extension, size = blob
+    attachment_store.register(cursor, sha256, extension, size)
+    query = """
+        INSERT INTO messages (conversation_id, sender_id, receiver_id, content, message_type, attachment_sha256)
+        VALUES (?, ?, ?, ?, ?, ?)
+    """
+    cursor.execute(query, (conversation_id, sender_id, receiver_id, reference, file_type, sha256))
+    return cursor.lastrowid
 
 
 
@@ -332,28 +454,15 @@ def get_profile_picture_path_from_db(user_id):
     # Define the default placeholder image path
     default_placeholder_path = "assets/logo.jpg"
 
-    # Establish connection to the SQLite database
+    # Look the path up in the user directory (only a cache miss reaches SQLite)
     try:
-        connection = db_handler.create_connection()
-        cursor = connection.cursor()
+        image_path = user_directory.get_user_directory().get_image_path(user_id)
 
-        # Query to fetch the image path
-        query = "SELECT image_path FROM users WHERE id = ?"
-        cursor.execute(query, (user_id,))
-        result = cursor.fetchone()
-
-        # Check if a result is found and return the path, otherwise return the default
-        if result and result[0]:
-            return result[0]
-        else:
-            return default_placeholder_path
+        # Return the path if one is set, otherwise the default
+        return image_path or default_placeholder_path
     except sqlite3.Error as e:
         print(f"Database error: {e}")
         return default_placeholder_path
-    finally:
-        # Ensure the connection is closed
-        if connection:
-            connection.close()
 
 def update_profile_picture_in_db(user_id, image_path, self=None):
     """
@@ -367,16 +476,17 @@ def update_profile_picture_in_db(user_id, image_path, self=None):
         bool: True if the update was successful, False otherwise.
     """
     try:
-        # Establish connection to the SQLite database
-        connection = db_handler.create_connection()
-        cursor = connection.cursor()
+        # Check out a pooled connection to the SQLite database
+        with db_handler.get_connection() as connection:
+            cursor = connection.cursor()
 
-        # Update query
-        query = "UPDATE users SET image_path = ? WHERE id = ?"
-        cursor.execute(query, (image_path, user_id))
+            # Update query
+            query = "UPDATE users SET image_path = ? WHERE id = ?"
+            cursor.execute(query, (image_path, user_id))
 
-        # Commit changes
-        connection.commit()
+            # Commit changes
+            connection.commit()
+        user_directory.invalidate(user_id)
 
         # Check if the update was successful
         if cursor.rowcount > 0:
@@ -391,11 +501,6 @@ def update_profile_picture_in_db(user_id, image_path, self=None):
         print(f"Database error: {e}")
         return False
 
-    finally:
-        # Ensure the connection is closed
-        if connection:
-            connection.close()
-
 def save_profile_changes(dialog, user_id, new_name, new_number, self=None):
     """
     Saves changes to the user's profile (name and number) in the database.
@@ -410,16 +515,17 @@ def save_profile_changes(dialog, user_id, new_name, new_number, self=None):
         None
     """
     try:
-        # Establish connection to the SQLite database
-        connection = db_handler.create_connection()
-        cursor = connection.cursor()
+        # Check out a pooled connection to the SQLite database
+        with db_handler.get_connection() as connection:
+            cursor = connection.cursor()
 
-        # Update query
-        query = "UPDATE users SET name = ?, phone_number = ? WHERE id = ?"
-        cursor.execute(query, (new_name, new_number, user_id))
+            # Update query
+            query = "UPDATE users SET name = ?, phone_number = ? WHERE id = ?"
+            cursor.execute(query, (new_name, new_number, user_id))
 
-        # Commit changes
-        connection.commit()
+            # Commit changes
+            connection.commit()
+        user_directory.invalidate(user_id)
 
         # Check if the update was successful
         if cursor.rowcount > 0:
@@ -437,11 +543,6 @@ def save_profile_changes(dialog, user_id, new_name, new_number, self=None):
         print(f"Database error: {e}")
         dialog.reject()
 
-    finally:
-        # Ensure the connection is closed
-        if connection:
-            connection.close()
-
 
 def update_profile_in_db(user_id, name, number, self=None):
     """
@@ -456,16 +557,17 @@ def update_profile_in_db(user_id, name, number, self=None):
         None
     """
     try:
-        # Connect to the SQLite database
-        connection = db_handler.create_connection()
-        cursor = connection.cursor()
+        # Check out a pooled connection to the SQLite database
+        with db_handler.get_connection() as connection:
+            cursor = connection.cursor()
 
-        # Update query
-        query = "UPDATE users SET name = ?, phone_number = ? WHERE id = ?"
-        cursor.execute(query, (name, number, user_id))
+            # Update query
+            query = "UPDATE users SET name = ?, phone_number = ? WHERE id = ?"
+            cursor.execute(query, (name, number, user_id))
 
-        # Commit changes
-        connection.commit()
+            # Commit changes
+            connection.commit()
+        user_directory.invalidate(user_id)
 
         # Check if the update was successful
         if cursor.rowcount > 0:
@@ -477,11 +579,6 @@ def update_profile_in_db(user_id, name, number, self=None):
     except sqlite3.Error as e:
         print(f"Database error: {e}")
 
-    finally:
-        # Ensure the connection is closed
-        if connection:
-            connection.close()
-
 # def open_file(file_path):
 #     """Opens the specified file with the default application."""
 #     try:
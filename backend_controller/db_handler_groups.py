@@ -1,172 +1,262 @@
+import json
 import sqlite3
 
 from PySide6.QtWidgets import QMessageBox
 
-from backend_controller import db_handler
-def add_group(dialog, user_id, selected_friends, group_name):
-    """Add group to the database"""
-    try:
-        # Insert group into the database
-        connection = db_handler.create_connection()
+from backend_controller import db_archive, db_handler, db_handler_conversations, db_writer, friend_graph, user_directory
+
+# Messages per group chat page
+GROUP_PAGE_SIZE = 50
+
+def add_group(user_id, selected_friends, group_name):
+    """
+    Add a group, its members and its conversation to the database, notifying every member.
+
+    Everything commits in one transaction. Safe to run on a worker thread:
+    database errors are raised to the caller.
+
+    Returns:
+        int: The id of the new group.
+    """
+    with db_handler.get_connection() as connection:
         cursor = connection.cursor()
 
         cursor.execute("INSERT INTO groups (group_name, created_by) VALUES (?, ?)", (group_name, user_id))
         group_id = cursor.lastrowid
 
-        # Add group members
-        for friend_id in selected_friends:
-            cursor.execute("INSERT INTO group_members (group_id, member_id) VALUES (?, ?)", (group_id, friend_id))
-
-
         sender_name = db_handler.fetch_user_name_by_id(user_id)
-
-        notification_message = f"{sender_name} added you in {group_name} group!"
-        cursor.execute( """ INSERT INTO message_notifications (user_id, message)
-                VALUES (?, ?)
-                """,
-                (friend_id, notification_message),
-        )
+        _insert_group_members(cursor, group_id, selected_friends, f"{sender_name} added you in {group_name} group!")
         connection.commit()
+    return group_id
 
-        QMessageBox.information(None, "Success", f"Group '{group_name}' created successfully! Click on message group icon to start charting with group.")
-        dialog.accept()
-    except Exception as e:
-        QMessageBox.critical(None, "Error", f"Failed to create group: {str(e)}")
+def _insert_group_members(cursor, group_id, member_ids, notification_message):
+    """
+    Add members to a group inside the caller's transaction and notify each of them.
+
+    Members already in the group are skipped. Returns the ids that were added.
+    """
+    cursor.execute("SELECT member_id FROM group_members WHERE group_id = ?", (group_id,))
+    existing = {row[0] for row in cursor.fetchall()}
+    new_members = [member_id for member_id in dict.fromkeys(member_ids) if member_id not in existing]
+
+    cursor.executemany(
+        "INSERT INTO group_members (group_id, member_id) VALUES (?, ?)",
+        [(group_id, member_id) for member_id in new_members],
+    )
+    # Syncs the creator and new members into the group's conversation
+    db_handler_conversations.create_group_conversation(cursor, group_id)
+    _notify_members(cursor, new_members, notification_message)
+    return new_members
+
+def _notify_members(cursor, member_ids, notification_message):
+    cursor.executemany(
+        "INSERT INTO message_notifications (user_id, message) VALUES (?, ?)",
+        [(member_id, notification_message) for member_id in member_ids],
+    )
 
 def fetch_group(user_id):
     """Fetch group from the database"""
-    connection = db_handler.create_connection()
-    cursor = connection.cursor()
-
     # Fetch groups created by the user
     try:
-        cursor.execute("SELECT id, group_name FROM groups WHERE created_by = ?", (user_id,))
-        groups = cursor.fetchall()
-        return groups
+        with db_handler.get_connection() as connection:
+            cursor = connection.cursor()
+            cursor.execute("SELECT id, group_name FROM groups WHERE created_by = ?", (user_id,))
+            groups = cursor.fetchall()
+            return groups
 
     except sqlite3.Error as e:
         QMessageBox.critical(None, "Db error", f"Database error {str(e)}")
 
-    finally:
-        if connection:
-            connection.close()
+def fetch_group_message(group_id, before=None, limit=GROUP_PAGE_SIZE):
+    """
+    Fetch one page of group messages, newest page first (raises on database errors, safe off the GUI thread).
+
+    Pages are keyset-paginated on (timestamp, id) and continue into the monthly
+    archives once the hot database runs out.
 
-def fetch_group_message(group_id):
-    """Fetch group message from the database"""
+    Args:
+        group_id (int): The group.
+        before (tuple, optional): Cursor returned by the previous call; omit for the newest page.
+        limit (int): Maximum number of messages.
+
+    Returns:
+        tuple: (messages, older_cursor). messages are (id, sender_name, content, timestamp)
+        tuples, oldest first; older_cursor is None once the start of the chat is reached.
+    """
+    conversation_id = db_handler_conversations.get_group_conversation_id(group_id)
     # Fetch and display messages
-    connection = db_handler.create_connection()
-    cursor = connection.cursor()
+    with db_handler.get_connection() as connection:
+        cursor = connection.cursor()
+        if before is None:
+            cursor.execute("""
+                        SELECT m.id, u.name, m.content, m.timestamp
+                        FROM messages m
+                        JOIN users u ON u.id = m.sender_id
+                        WHERE m.conversation_id = ?
+                        ORDER BY m.timestamp DESC, m.id DESC
+                        LIMIT ?
+                    """, (conversation_id, limit))
+        else:
+            cursor.execute("""
+                        SELECT m.id, u.name, m.content, m.timestamp
+                        FROM messages m
+                        JOIN users u ON u.id = m.sender_id
+                        WHERE m.conversation_id = ? AND (m.timestamp, m.id) < (?, ?)
+                        ORDER BY m.timestamp DESC, m.id DESC
+                        LIMIT ?
+                    """, (conversation_id, before[0], before[1], limit))
+        messages = cursor.fetchall()
+        messages.reverse()
+
+        # Older than the hot database: read on from the archives and look up the senders' names
+        if len(messages) < limit:
+            archive_before = (messages[0][3], messages[0][0]) if messages else before
+            archived = db_archive.fetch_archived_page(conversation_id, archive_before, limit - len(messages))
+            if archived:
+                users = user_directory.get_user_directory().get_many(message[1] for message in archived)
+                messages = [
+                    (message_id, users[sender_id][0] if sender_id in users else "Unknown", content, timestamp)
+                    for message_id, sender_id, content, timestamp, _ in archived
+                ] + messages
+
+    older_cursor = (messages[0][3], messages[0][0]) if messages and len(messages) == limit else None
+    return messages, older_cursor
+
+def fetch_new_group_messages(group_id, last_seen_id=0):
+    """
+    Fetch the group messages newer than the caller's high-water mark (raises on database errors).
 
-    try:
+    Returns:
+        list: (id, sender_name, content, timestamp) tuples in id order.
+    """
+    conversation_id = db_handler_conversations.get_group_conversation_id(group_id)
+    with db_handler.get_connection() as connection:
+        cursor = connection.cursor()
         cursor.execute("""
-                    SELECT u.name, m.content, m.timestamp
+                    SELECT m.id, u.name, m.content, m.timestamp
                     FROM messages m
                     JOIN users u ON u.id = m.sender_id
-                    WHERE m.receiver_id = ?
-                    ORDER BY m.timestamp ASC
-                """, (group_id,))
-        messages = cursor.fetchall()
-        return  messages
-
-    except sqlite3.Error as e:
-        QMessageBox.critical(None, "Db error", f"Database error {str(e)}")
-        return []
-
-
-    finally:
-        if connection:
-            connection.close()
+                    WHERE m.conversation_id = ? AND m.id > ?
+                    ORDER BY m.id ASC
+                """, (conversation_id, last_seen_id))
+        return cursor.fetchall()
 
 def store_group_message(user_id, group_id, content):
-    """Stores group message to the db"""
-    try:
-        connection = db_handler.create_connection()
-        cursor = connection.cursor()
-        cursor.execute("INSERT INTO messages (sender_id, receiver_id, content) VALUES (?, ?, ?)",
-                       (user_id, group_id, content))
+    """
+    Stores group message to the db (through the group-commit writer).
 
+    Blocks until the writer has committed the message, so run it off the GUI
+    thread. Database errors are raised to the caller.
 
-        sender_name = db_handler.fetch_user_name_by_id(user_id)
+    Returns:
+        int: The id of the new message.
+    """
+    conversation_id = db_handler_conversations.get_group_conversation_id(group_id)
+    return db_writer.submit(_insert_group_message, conversation_id, user_id, group_id, content).result()
 
-        notification_message = f"Group message from {sender_name}"
-        cursor.execute( """ INSERT INTO message_notifications (user_id, message)
-                VALUES (?, ?)
-                """,
-                (user_id, notification_message),
-        )
-        connection.commit()
-        return True
+def _insert_group_message(cursor, conversation_id, user_id, group_id, content):
+    """Writer operation for store_group_message (receiver_id keeps the group id for older readers)"""
+    cursor.execute("INSERT INTO messages (conversation_id, sender_id, receiver_id, content) VALUES (?, ?, ?, ?)",
+                   (conversation_id, user_id, group_id, content))
+    message_id = cursor.lastrowid
 
-    except Exception as e:
-        QMessageBox.critical(None, "Error", f"Failed to send message: {str(e)}")
-        return
 
-    finally:
-        if connection:
-            connection.close()
+    sender_name = db_handler.fetch_user_name_by_id(user_id)
 
-def fetch_group_members(group_id):
-    """Fetch the members of a specific group."""
-    connection = db_handler.create_connection()
-    cursor = connection.cursor()
+    notification_message = f"Group message from {sender_name}"
+    cursor.execute( """ INSERT INTO message_notifications (user_id, message)
+            VALUES (?, ?)
+            """,
+            (user_id, notification_message),
+    )
+    return message_id
 
-    try:
-        query = """
-            SELECT gm.member_id, u.name
-            FROM group_members gm
-            JOIN users u ON u.id = gm.member_id   
-            WHERE gm.group_id = ?
-        """
-        #NB Line 106========================================================================
+def fetch_group_members(group_id):
+    """Fetch the members of a specific group (raises on database errors, safe off the GUI thread)."""
+    query = """
+        SELECT gm.member_id, u.name
+        FROM group_members gm
+        JOIN users u ON u.id = gm.member_id
+        WHERE gm.group_id = ?
+    """
+    with db_handler.get_connection() as connection:
+        cursor = connection.cursor()
         cursor.execute(query, (group_id,))
-        members = cursor.fetchall()
-        return members
-
-    except sqlite3.Error as e:
-        QMessageBox.critical(None, "DB error", f"{str(e)}")
-        return []
-
-    finally:
-        connection.close()
+        return cursor.fetchall()
 
 def fetch_groups_for_user(user_id):
     """Fetch all groups the user is a part of or has created."""
-    connection = db_handler.create_connection()
-    cursor = connection.cursor()
-
+    query = """
+           SELECT DISTINCT g.id, g.group_name
+           FROM groups g
+           LEFT JOIN group_members gm ON g.id = gm.group_id
+           WHERE g.created_by = ? OR gm.member_id = ?;
+       """
     try:
-        query = """
-               SELECT DISTINCT g.id, g.group_name
-               FROM groups g
-               LEFT JOIN group_members gm ON g.id = gm.group_id
-               WHERE g.created_by = ? OR gm.member_id = ?;
-           """
-        cursor.execute(query, (user_id, user_id))
-        groups = cursor.fetchall()
+        with db_handler.get_connection() as connection:
+            cursor = connection.cursor()
+            cursor.execute(query, (user_id, user_id))
+            groups = cursor.fetchall()
         print(f"Groups fetched for user {user_id}: {groups}")
         return groups
     except Exception as e:
         print(f"Error fetching groups for user: {e}")
         return []
-    finally:
-        connection.close()
 
 
 
+def fetch_group_overview(user_id):
+    """
+    Fetch the user's groups together with each group's creator and members, in one query.
+
+    Returns:
+        list: (group_id, group_name, creator_id, creator_name, members) tuples, where
+        members is a list of (member_id, name) tuples.
+    """
+    query = """
+        WITH my_groups AS (
+            SELECT id FROM groups WHERE created_by = ?
+            UNION
+            SELECT group_id FROM group_members WHERE member_id = ?
+        )
+        SELECT g.id, g.group_name, g.created_by, creator.name,
+               (SELECT json_group_array(json_array(gm.member_id, u.name))
+                FROM group_members gm
+                JOIN users u ON u.id = gm.member_id
+                WHERE gm.group_id = g.id)
+        FROM my_groups mg
+        JOIN groups g ON g.id = mg.id
+        LEFT JOIN users creator ON creator.id = g.created_by
+        ORDER BY g.id
+    """
+    try:
+        with db_handler.get_connection() as connection:
+            cursor = connection.cursor()
+            cursor.execute(query, (user_id, user_id))
+            rows = cursor.fetchall()
+        return [
+            (group_id, group_name, creator_id, creator_name,
+             [tuple(member) for member in json.loads(members or "[]")])
+            for group_id, group_name, creator_id, creator_name, members in rows
+        ]
+    except sqlite3.Error as e:
+        print(f"Error fetching group overview: {e}")
+        return []
+
+
 def get_group_creator(group_id):
     """Fetch the name of the user who created the group."""
-    connection = db_handler.create_connection()
-    cursor = connection.cursor()
-
+    query = """
+        SELECT g.created_by, u.name AS creator_name
+        FROM groups g
+        JOIN users u ON g.created_by = u.id
+        WHERE g.id = ?;
+    """
     try:
-        query = """
-            SELECT g.created_by, u.name AS creator_name
-            FROM groups g
-            JOIN users u ON g.created_by = u.id
-            WHERE g.id = ?;
-        """
-        cursor.execute(query, (group_id,))
-        result = cursor.fetchone()  # Fetch a single row
+        with db_handler.get_connection() as connection:
+            cursor = connection.cursor()
+            cursor.execute(query, (group_id,))
+            result = cursor.fetchone()  # Fetch a single row
         if result:
             creator_id, creator_name = result
             print(f"Creator ID:  {creator_id}, creator_name: {creator_name}")
@@ -177,61 +267,91 @@ def get_group_creator(group_id):
     except Exception as e:
         print(f"Error fetching group creator: {e}")
         return None
-    finally:
-        connection.close()
 
 
+def _fetch_group_name_and_creator(cursor, group_id):
+    cursor.execute("SELECT g.group_name, u.name AS creator_name FROM groups g JOIN users u ON g.created_by = u.id WHERE g.id = ?", (group_id,))
+    return cursor.fetchone()
+
+def add_group_members(group_id, member_ids):
+    """
+    Add several members to a group in one transaction, notifying each new member.
+
+    Args:
+        group_id (int): The group.
+        member_ids (list): User ids to add; current members are skipped.
+
+    Returns:
+        list: The ids that were added.
+
+    Raises:
+        ValueError: If the group does not exist.
+        sqlite3.Error: On database errors.
+    """
+    with db_handler.get_connection() as connection:
+        cursor = connection.cursor()
+
+        result = _fetch_group_name_and_creator(cursor, group_id)
+        if not result:
+            raise ValueError(f"Group not found with ID: {group_id}.")
+        group_name, creator_name = result
+
+        added = _insert_group_members(cursor, group_id, member_ids, f"{creator_name} added you in {group_name} group!")
+        connection.commit()
+        return added
+
 def add_group_member(group_id, member_id):
     """Add a new member to a group."""
-    connection = db_handler.create_connection()
-    cursor = connection.cursor()
+    return add_group_members(group_id, [member_id])
 
-    try:
-        query = "INSERT INTO group_members (group_id, member_id) VALUES (?, ?);"
-        cursor.execute(query, (group_id, member_id))
+def remove_group_members(group_id, member_ids):
+    """
+    Remove several members from a group (and its conversation) in one transaction,
+    notifying each removed member.
 
-        sender_name = db_handler.fetch_user_name_by_id(member_id)
+    Returns:
+        list: The ids that were removed.
 
-        # Fetch group name and creator name
-        cursor.execute("SELECT g.group_name, u.name AS creator_name FROM groups g JOIN users u ON g.created_by = u.id WHERE g.id = ?", (group_id,))
-        result = cursor.fetchone()
-        if result:
-            group_name, creator_name = result
-            print(f"Group ID from db_handler_groups: {group_id}, Group Name: {group_name}, Creator Name: {creator_name}")
-        else:
-            QMessageBox.critical(None, "Error", f"Group not found with ID: {group_id}.")
-            return
-
-        notification_message = f"{creator_name} added you in {group_name} group!"
-        cursor.execute(""" INSERT INTO message_notifications (user_id, message)
-                        VALUES (?, ?)
-                        """,
-                       (member_id, notification_message),
-                       )
+    Raises:
+        ValueError: If the group does not exist.
+        sqlite3.Error: On database errors.
+    """
+    with db_handler.get_connection() as connection:
+        cursor = connection.cursor()
+
+        result = _fetch_group_name_and_creator(cursor, group_id)
+        if not result:
+            raise ValueError(f"Group not found with ID: {group_id}.")
+        group_name, creator_name = result
+
+        cursor.execute("SELECT member_id FROM group_members WHERE group_id = ?", (group_id,))
+        existing = {row[0] for row in cursor.fetchall()}
+        removed = [member_id for member_id in dict.fromkeys(member_ids) if member_id in existing]
+
+        conversation_id = db_handler_conversations.create_group_conversation(cursor, group_id)
+        cursor.executemany(
+            "DELETE FROM group_members WHERE group_id = ? AND member_id = ?",
+            [(group_id, member_id) for member_id in removed],
+        )
+        # The creator stays in the conversation even if they were also listed as a member
+        cursor.executemany(
+            """
+            DELETE FROM conversation_members
+            WHERE conversation_id = ? AND user_id = ?
+              AND user_id NOT IN (SELECT created_by FROM groups WHERE id = ?)
+            """,
+            [(conversation_id, member_id, group_id) for member_id in removed],
+        )
+        _notify_members(cursor, removed, f"{creator_name} removed you from {group_name} group.")
         connection.commit()
-    finally:
-        connection.close()
+        return removed
 
 def load_friends(user_id):
-    """Load the friends of the logged-in user."""
-    connection = db_handler.create_connection()
-    cursor = connection.cursor()
-
-    query = """
-        SELECT u.id AS friend_id, u.name AS friend_name
-        FROM friends f
-        JOIN users u ON u.id = f.friend_id
-        WHERE f.user_id = ?
-    """
+    """Load the friends of the logged-in user (from the shared friend graph)."""
     try:
-        cursor.execute(query, (user_id,))
-        friends = cursor.fetchall()  # Returns a list of (friend_id, friend_name) tuples
+        friends = friend_graph.get_friend_graph(user_id).friends()  # Returns a list of (friend_id, friend_name) tuples
         print(f"List of friends from db_handler_friends.py: {friends}")
         return friends
     except sqlite3.Error as e:
         print(f"Database error while loading friends: {e}")
         return []
-    finally:
-        connection.close()
-
-
@@ -0,0 +1,123 @@
+import re
+
+from backend_controller import db_archive, db_handler, user_directory
+
+# Results returned per search
+SEARCH_LIMIT = 50
+# Markers placed around matched terms in snippets
+SNIPPET_START = "["
+SNIPPET_END = "]"
+
+
+def build_match_query(text):
+    """
+    Turn what the user typed into a safe FTS5 MATCH expression.
+
+    Every word is quoted (so characters like '-' or '*' are not FTS syntax) and
+    the last word is a prefix match, so results appear while typing.
+
+    Returns:
+        str: The MATCH expression, or "" if text has no searchable words.
+    """
+    words = re.findall(r"\w+", text)
+    if not words:
+        return ""
+    terms = ['"' + word.replace('"', '""') + '"' for word in words]
+    terms[-1] += "*"
+    return " ".join(terms)
+
+
+def search_messages(user_id, text, conversation_id=None, limit=SEARCH_LIMIT):
+    """
+    Full-text search over the text messages the user can see, best matches first.
+
+    Only conversations the user belongs to are searched. Archived messages are
+    searched too, and listed after the matches in the live database, newest
+    archive month first. Safe to run on a worker thread: database errors are
+    raised to the caller.
+
+    Args:
+        user_id (int): The logged-in user.
+        text (str): What the user typed.
+        conversation_id (int, optional): Restrict the search to one conversation.
+        limit (int): Maximum number of results.
+
+    Returns:
+        list: (message_id, conversation_id, friend_id, group_id, conversation_name, sender_name,
+        timestamp, snippet) tuples. friend_id is set for direct chats and group_id for group
+        chats; conversation_name is the friend's or the group's name.
+    """
+    match = build_match_query(text)
+    if not match:
+        return []
+
+    query = """
+        SELECT m.id, m.conversation_id,
+               CASE WHEN c.kind = 'direct'
+                    THEN CASE WHEN c.user_low = :user_id THEN c.user_high ELSE c.user_low END
+               END AS friend_id,
+               c.group_id, COALESCE(g.group_name, f.name), u.name, m.timestamp,
+               snippet(messages_fts, 0, :start, :end, '...', 12)
+        FROM messages_fts
+        JOIN messages m ON m.id = messages_fts.rowid
+        JOIN conversation_members cm ON cm.conversation_id = m.conversation_id AND cm.user_id = :user_id
+        JOIN conversations c ON c.id = m.conversation_id
+        JOIN users u ON u.id = m.sender_id
+        LEFT JOIN groups g ON g.id = c.group_id
+        LEFT JOIN users f ON c.kind = 'direct'
+             AND f.id = CASE WHEN c.user_low = :user_id THEN c.user_high ELSE c.user_low END
+        WHERE messages_fts MATCH :match
+    """
+    params = {"user_id": user_id, "match": match, "start": SNIPPET_START, "end": SNIPPET_END, "limit": limit}
+    if conversation_id is not None:
+        query += " AND m.conversation_id = :conversation_id"
+        params["conversation_id"] = conversation_id
+    query += " ORDER BY bm25(messages_fts) LIMIT :limit"
+
+    with db_handler.get_connection() as connection:
+        cursor = connection.cursor()
+        cursor.execute(query, params)
+        results = cursor.fetchall()
+
+    if len(results) < limit:
+        results += _search_archives(user_id, match, conversation_id, limit - len(results))
+    return results
+
+
+def _search_archives(user_id, match, conversation_id, limit):
+    """Return search_messages rows for hits in the monthly archives."""
+    hits = db_archive.search_archived_messages(
+        user_id, match, conversation_id, limit, snippet_markers=(SNIPPET_START, SNIPPET_END))
+    if not hits:
+        return []
+
+    # Archives only keep the messages; names come from the live database
+    conversation_ids = sorted({hit[1] for hit in hits})
+    placeholders = ", ".join("?" * len(conversation_ids))
+    with db_handler.get_connection() as connection:
+        cursor = connection.cursor()
+        cursor.execute(
+            f"""
+            SELECT c.id,
+                   CASE WHEN c.kind = 'direct'
+                        THEN CASE WHEN c.user_low = ? THEN c.user_high ELSE c.user_low END
+                   END AS friend_id,
+                   c.group_id, COALESCE(g.group_name, f.name)
+            FROM conversations c
+            LEFT JOIN groups g ON g.id = c.group_id
+            LEFT JOIN users f ON c.kind = 'direct'
+                 AND f.id = CASE WHEN c.user_low = ? THEN c.user_high ELSE c.user_low END
+            WHERE c.id IN ({placeholders})
+            """,
+            (user_id, user_id, *conversation_ids),
+        )
+        conversations = {row[0]: row[1:] for row in cursor.fetchall()}
+    senders = user_directory.get_user_directory().get_many(hit[2] for hit in hits)
+
+    results = []
+    for message_id, hit_conversation_id, sender_id, timestamp, snippet in hits:
+        friend_id, group_id, conversation_name = conversations.get(hit_conversation_id, (None, None, None))
+        sender_name = senders[sender_id][0] if sender_id in senders else None
+        results.append((message_id, hit_conversation_id, friend_id, group_id, conversation_name, sender_name,
+                        timestamp, snippet))
+    return results
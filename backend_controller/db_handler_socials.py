@@ -1,8 +1,15 @@
 import sqlite3
+import time
 from datetime import datetime, timedelta
 
 from PySide6.QtWidgets import QMessageBox
-from backend_controller.db_handler import create_connection
+from backend_controller import db_writer
+from backend_controller.db_handler import get_connection
+
+# Statuses expire this many seconds after they are posted
+STATUS_LIFETIME = 24 * 60 * 60
+# Expired statuses deleted per write transaction, so a purge never holds the writer for long
+PURGE_BATCH_SIZE = 500
 
 
 def post_status(user_id, content, self=None):
@@ -16,7 +23,9 @@ def post_status(user_id, content, self=None):
     Returns:
         None
     """
-    expiration_time = datetime.now() + timedelta(hours=24)
+    expiration_time = datetime.now() + timedelta(seconds=STATUS_LIFETIME)
+    # Compared as integers against the expires_at index
+    expires_at = int(time.time()) + STATUS_LIFETIME
     try:
         if not content.strip():
             print("Cannot post an empty status.")
@@ -24,27 +33,22 @@ def post_status(user_id, content, self=None):
             return
 
         # Connect to the SQLite database
-        connection = create_connection()
-        cursor = connection.cursor()
+        with get_connection() as connection:
+            cursor = connection.cursor()
 
-        # Insert status into the database
-        query = "INSERT INTO statuses (user_id, content, timestamp, expiration_time) VALUES (?, ?, ?, ?)"
-        cursor.execute(query, (user_id, content, datetime.now(), expiration_time))
+            # Insert status into the database
+            query = "INSERT INTO statuses (user_id, content, timestamp, expiration_time, expires_at) VALUES (?, ?, ?, ?, ?)"
+            cursor.execute(query, (user_id, content, datetime.now(), expiration_time, expires_at))
 
-        # Commit changes
-        connection.commit()
+            # Commit changes
+            connection.commit()
 
-        print("Status posted successfully!")
-        QMessageBox.information(self, "Success", "Status posted! Click the eye icon to see the status.")
+            print("Status posted successfully!")
+            QMessageBox.information(self, "Success", "Status posted! Click the eye icon to see the status.")
 
     except sqlite3.Error as e:
         print(f"Database error: {e}")
 
-    finally:
-        # Ensure the connection is closed
-        if connection:
-            connection.close()
-
 
 def get_statuses(user_id=None, self=None):
     """
@@ -58,105 +62,97 @@ def get_statuses(user_id=None, self=None):
     """
     try:
         # Connect to the SQLite database
-        connection = create_connection()
-        cursor = connection.cursor()
+        with get_connection() as connection:
+            cursor = connection.cursor()
 
-        if user_id:
-            query = "SELECT s.content, s.timestamp, u.name FROM statuses s JOIN users u ON s.user_id = u.id WHERE s.user_id = ? ORDER BY s.timestamp DESC"
-            cursor.execute(query, (user_id,))
-        else:
-            query = "SELECT s.content, s.timestamp, u.name FROM statuses s JOIN users u ON s.user_id = u.id ORDER BY s.timestamp DESC"
-            cursor.execute(query)
+            if user_id:
+                query = "SELECT s.content, s.timestamp, u.name FROM statuses s JOIN users u ON s.user_id = u.id WHERE s.user_id = ? ORDER BY s.timestamp DESC"
+                cursor.execute(query, (user_id,))
+            else:
+                query = "SELECT s.content, s.timestamp, u.name FROM statuses s JOIN users u ON s.user_id = u.id ORDER BY s.timestamp DESC"
+                cursor.execute(query)
 
-        # Fetch all results
-        statuses = cursor.fetchall()
+            # Fetch all results
+            statuses = cursor.fetchall()
 
-        # Format as a list of dictionaries
-        return [{"content": row[0], "timestamp": row[1], "user": row[2]} for row in statuses]
+            # Format as a list of dictionaries
+            return [{"content": row[0], "timestamp": row[1], "user": row[2]} for row in statuses]
 
     except sqlite3.Error as e:
         print(f"Database error: {e}")
         return []
 
-    finally:
-        # Ensure the connection is closed
-        if 'connection' in locals() and connection:
-            connection.close()
-
 
 def get_friend_and_user_statuses(user_id):
     """
        Fetches statuses posted by the logged-in user and their friends, excluding expired ones.
 
+       Like and view counts come from the counters kept on statuses, and the
+       viewer's own like/view flags from the unique (status_id, user_id) indexes,
+       all in the same query.
+
        Args:
            user_id (int): The ID of the logged-in user.
 
        Returns:
-           list: A list of dictionaries containing the name, content, and timestamp of statuses.
+           list: A list of dictionaries containing the name, content, timestamp,
+           like_count, view_count, liked_by_me and viewed_by_me of statuses.
        """
     try:
-        connection = create_connection()
-        cursor = connection.cursor()
-
-        query = """
-         SELECT s.content, s.timestamp, u.name, s.id, s.user_id, s.expiration_time
-        FROM statuses s
-        JOIN users u ON s.user_id = u.id
-        WHERE (s.user_id = ? OR s.user_id IN (
-            SELECT friend_id FROM friends WHERE user_id = ?
-        ))
-        AND (s.expiration_time > CURRENT_TIMESTAMP) -- Only fetch non-expired statuses
-        ORDER BY s.timestamp DESC
-        """
-        cursor.execute(query, (user_id, user_id))
-
-        statuses = cursor.fetchall()
-        return [{"content": row[0], "timestamp": row[1], "user": row[2], "status_id": row[3], "user_id": row[4], "expiration_time": row[5]} for row in statuses]
+        with get_connection() as connection:
+            cursor = connection.cursor()
+
+            query = """
+            SELECT s.content, s.timestamp, u.name, s.id, s.user_id, s.expiration_time,
+                   s.like_count, s.view_count,
+                   EXISTS (SELECT 1 FROM likes l WHERE l.status_id = s.id AND l.user_id = ?),
+                   EXISTS (SELECT 1 FROM views v WHERE v.status_id = s.id AND v.user_id = ?)
+            FROM statuses s
+            JOIN users u ON s.user_id = u.id
+            WHERE (s.user_id = ? OR s.user_id IN (
+                SELECT friend_id FROM friends WHERE user_id = ?
+            ))
+            AND s.expires_at > ? -- Only fetch non-expired statuses
+            ORDER BY s.timestamp DESC
+            """
+            cursor.execute(query, (user_id, user_id, user_id, user_id, int(time.time())))
+
+            statuses = cursor.fetchall()
+            return [
+                {"content": row[0], "timestamp": row[1], "user": row[2], "status_id": row[3], "user_id": row[4],
+                 "expiration_time": row[5], "like_count": row[6], "view_count": row[7],
+                 "liked_by_me": bool(row[8]), "viewed_by_me": bool(row[9])}
+                for row in statuses
+            ]
 
     except sqlite3.Error as e:
         print(f"Database error: {e}")
         return []
 
-    finally:
-        if connection:
-            connection.close()
-
 
-def like_status(status_id, user_id, self=None):
+def like_status(status_id, user_id):
     """
     Likes a friend's status.
 
+    The like is written by the group-commit writer; this call blocks until that
+    batch has committed, so run it off the GUI thread. Database errors are
+    raised to the caller.
+
     Args:
         status_id (int): The ID of the status to like.
         user_id (int): The ID of the user liking the status.
 
     Returns:
-        None
+        bool: True if the status was liked, False if the user had already liked it.
     """
-    try:
-        connection = create_connection()
-        cursor = connection.cursor()
-
-        # Check if the user has already liked this status
-        check_query = "SELECT 1 FROM likes WHERE status_id = ? AND user_id = ?"
-        cursor.execute(check_query, (status_id, user_id))
-        if cursor.fetchone():
-            QMessageBox.warning(self, "Already Liked", "You have already liked this status.")
-            return
-
-        query = "INSERT INTO likes (status_id, user_id, created_at) VALUES (?, ?, ?)"
-        cursor.execute(query, (status_id, user_id, datetime.now()))
-        connection.commit()
+    return db_writer.submit(_insert_like, status_id, user_id).result()
 
-        print("Status liked successfully!")
-        QMessageBox.information(self, "Liked", "Status liked!")
-
-    except sqlite3.Error as e:
-        print(f"Database error: {e}")
-
-    finally:
-        if connection:
-            connection.close()
+def _insert_like(cursor, status_id, user_id):
+    """Writer operation for like_status. Returns False if the like already exists."""
+    # The unique (status_id, user_id) index turns a repeat like into a no-op
+    query = "INSERT OR IGNORE INTO likes (status_id, user_id, created_at) VALUES (?, ?, ?)"
+    cursor.execute(query, (status_id, user_id, datetime.now()))
+    return cursor.rowcount == 1
 
 def track_status_view(status_id, user_id):
     """
@@ -165,28 +161,21 @@ def track_status_view(status_id, user_id):
     Args:
         status_id (int): The ID of the status being viewed.
         user_id (int): The ID of the user viewing the status.
+
+    Returns:
+        Future: Completes when the view has been committed by the writer.
     """
     try:
-        connection = create_connection()
-        cursor = connection.cursor()
-
-        # Check if the user has already viewed this status
-        check_query = "SELECT 1 FROM views WHERE status_id = ? AND user_id = ?"
-        cursor.execute(check_query, (status_id, user_id))
-        if cursor.fetchone():
-            return  # Already viewed, no need to add again
-
-        # Add the view
-        query = "INSERT INTO views (status_id, user_id) VALUES (?, ?)"
-        cursor.execute(query, (status_id, user_id))
-        connection.commit()
-
+        return db_writer.report_errors(
+            db_writer.submit(_insert_view, status_id, user_id), "track status view"
+        )
     except sqlite3.Error as e:
         print(f"Database error: {e}")
 
-    finally:
-        if connection:
-            connection.close()
+def _insert_view(cursor, status_id, user_id):
+    """Writer operation for track_status_view (a repeat view is ignored)."""
+    query = "INSERT OR IGNORE INTO views (status_id, user_id) VALUES (?, ?)"
+    cursor.execute(query, (status_id, user_id))
 
 def get_users_who_liked_status(status_id):
     """
@@ -199,26 +188,22 @@ def get_users_who_liked_status(status_id):
         list: A list of user names.
     """
     try:
-        connection = create_connection()
-        cursor = connection.cursor()
-
-        query = """
-        SELECT u.name
-        FROM likes l
-        JOIN users u ON l.user_id = u.id
-        WHERE l.status_id = ?
-        """
-        cursor.execute(query, (status_id,))
-        return [row[0] for row in cursor.fetchall()]
+        with get_connection() as connection:
+            cursor = connection.cursor()
+
+            query = """
+            SELECT u.name
+            FROM likes l
+            JOIN users u ON l.user_id = u.id
+            WHERE l.status_id = ?
+            """
+            cursor.execute(query, (status_id,))
+            return [row[0] for row in cursor.fetchall()]
 
     except sqlite3.Error as e:
         print(f"Database error: {e}")
         return []
 
-    finally:
-        if connection:
-            connection.close()
-
 def get_users_who_viewed_status(status_id):
     """
     Fetches a list of users who viewed a specific status.
@@ -230,65 +215,104 @@ def get_users_who_viewed_status(status_id):
         list: A list of user names.
     """
     try:
-        connection = create_connection()
-        cursor = connection.cursor()
-
-        query = """
-        SELECT u.name
-        FROM views v
-        JOIN users u ON v.user_id = u.id
-        WHERE v.status_id = ?
-        """
-        cursor.execute(query, (status_id,))
-        return [row[0] for row in cursor.fetchall()]
+        with get_connection() as connection:
+            cursor = connection.cursor()
+
+            query = """
+            SELECT u.name
+            FROM views v
+            JOIN users u ON v.user_id = u.id
+            WHERE v.status_id = ?
+            """
+            cursor.execute(query, (status_id,))
+            return [row[0] for row in cursor.fetchall()]
 
     except sqlite3.Error as e:
         print(f"Database error: {e}")
         return []
 
-    finally:
-        if connection:
-            connection.close()
 
-
-def delete_status(user_id, status_id):
+def get_status_activity(status_id):
     """
-    Deletes a status from the database.
+    Fetches who liked and who viewed a status, in one query.
+
+    Args:
+        status_id (int): The ID of the status.
+
+    Returns:
+        tuple: (likers, viewers), two lists of user names.
     """
     try:
-        connection = create_connection()
-        cursor = connection.cursor()
-
-        # Delete the status where user_id and status_id match
-        query = "DELETE FROM statuses WHERE user_id = ? AND id = ?"
-        cursor.execute(query, (user_id, status_id))
-        connection.commit()
+        with get_connection() as connection:
+            cursor = connection.cursor()
+
+            query = """
+            SELECT 'like', u.name FROM likes l JOIN users u ON l.user_id = u.id WHERE l.status_id = ?
+            UNION ALL
+            SELECT 'view', u.name FROM views v JOIN users u ON v.user_id = u.id WHERE v.status_id = ?
+            """
+            cursor.execute(query, (status_id, status_id))
+            likers, viewers = [], []
+            for kind, name in cursor.fetchall():
+                (likers if kind == "like" else viewers).append(name)
+            return likers, viewers
 
     except sqlite3.Error as e:
         print(f"Database error: {e}")
-
-    finally:
-        if connection:
-            connection.close()
+        return [], []
 
 
-def delete_expired_statuses():
+def delete_status(user_id, status_id):
     """
-    Deletes statuses that have passed their expiration time.
+    Deletes a status from the database.
     """
     try:
-        connection = create_connection()
-        cursor = connection.cursor()
+        with get_connection() as connection:
+            cursor = connection.cursor()
 
-        query = "DELETE FROM statuses WHERE expiration_time <= CURRENT_TIMESTAMP"
-        cursor.execute(query)
-        connection.commit()
+            # Delete the status where user_id and status_id match
+            query = "DELETE FROM statuses WHERE user_id = ? AND id = ?"
+            cursor.execute(query, (user_id, status_id))
+            connection.commit()
 
-        print("Expired statuses cleaned up.")
     except sqlite3.Error as e:
         print(f"Database error: {e}")
-    finally:
-        if connection:
-            connection.close()
 
 
+def delete_expired_statuses(batch_size=PURGE_BATCH_SIZE):
+    """
+    Deletes statuses that have passed their expiration time, with their likes and views.
+
+    Runs as a series of short writer transactions of at most batch_size statuses,
+    so other writes are never held up for long. Meant for the maintenance
+    scheduler, not the GUI thread; the feed already hides expired statuses.
+
+    Returns:
+        int: The number of statuses deleted.
+    """
+    now = int(time.time())
+    deleted = 0
+    try:
+        while True:
+            purged = db_writer.submit(_purge_expired_batch, now, batch_size).result()
+            deleted += purged
+            if purged < batch_size:
+                break
+
+        if deleted:
+            print(f"Expired statuses cleaned up: {deleted}.")
+    except sqlite3.Error as e:
+        print(f"Database error: {e}")
+    return deleted
+
+def _purge_expired_batch(cursor, now, batch_size):
+    """Writer operation for delete_expired_statuses: one batch. Returns how many statuses went."""
+    cursor.execute("SELECT id FROM statuses WHERE expires_at <= ? LIMIT ?", (now, batch_size))
+    status_ids = [(row[0],) for row in cursor.fetchall()]
+    if not status_ids:
+        return 0
+
+    cursor.executemany("DELETE FROM likes WHERE status_id = ?", status_ids)
+    cursor.executemany("DELETE FROM views WHERE status_id = ?", status_ids)
+    cursor.executemany("DELETE FROM statuses WHERE id = ?", status_ids)
+    return len(status_ids)
@@ -0,0 +1,533 @@
+import sqlite3
+
+from backend_controller import db_handler
+
+
+def _add_column(table, column, definition):
+    """Return a migration step that adds column to table unless it already exists."""
+    def step(connection):
+        columns = [row[1] for row in connection.execute(f"PRAGMA table_info({table})")]
+        if column not in columns:
+            connection.execute(f"ALTER TABLE {table} ADD COLUMN {column} {definition}")
+    return step
+
+
+# Ordered list of (version, description, statements). Never edit a migration that
+# has shipped; append a new one instead. Every statement must be idempotent so a
+# database created by hand in DB Browser can be brought under version control.
+# A statement may also be a callable taking the connection, for steps SQLite
+# cannot express idempotently (ALTER TABLE ... ADD COLUMN).
+MIGRATIONS = [
+    (1, "Base schema", [
+        """
+        CREATE TABLE IF NOT EXISTS users (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            name TEXT NOT NULL,
+            phone_number TEXT NOT NULL,
+            image_path TEXT
+        )
+        """,
+        """
+        CREATE TABLE IF NOT EXISTS friends (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            user_id INTEGER NOT NULL REFERENCES users(id),
+            friend_id INTEGER NOT NULL REFERENCES users(id)
+        )
+        """,
+        """
+        CREATE TABLE IF NOT EXISTS friend_requests (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            sender_id INTEGER NOT NULL REFERENCES users(id),
+            receiver_id INTEGER NOT NULL REFERENCES users(id),
+            status TEXT NOT NULL DEFAULT 'pending',
+            created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+        )
+        """,
+        """
+        CREATE TABLE IF NOT EXISTS notifications (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            user_id INTEGER NOT NULL REFERENCES users(id),
+            message TEXT NOT NULL,
+            is_read INTEGER NOT NULL DEFAULT 0,
+            created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+        )
+        """,
+        """
+        CREATE TABLE IF NOT EXISTS message_notifications (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            user_id INTEGER NOT NULL REFERENCES users(id),
+            message TEXT NOT NULL,
+            is_read INTEGER NOT NULL DEFAULT 0,
+            created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+        )
+        """,
+        """
+        CREATE TABLE IF NOT EXISTS messages (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            sender_id INTEGER NOT NULL REFERENCES users(id),
+            receiver_id INTEGER NOT NULL,
+            content TEXT,
+            timestamp TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+            message_type TEXT NOT NULL DEFAULT 'text'
+        )
+        """,
+        """
+        CREATE TABLE IF NOT EXISTS groups (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            group_name TEXT NOT NULL,
+            created_by INTEGER NOT NULL REFERENCES users(id),
+            created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+        )
+        """,
+        """
+        CREATE TABLE IF NOT EXISTS group_members (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            group_id INTEGER NOT NULL REFERENCES groups(id),
+            member_id INTEGER NOT NULL REFERENCES users(id)
+        )
+        """,
+        """
+        CREATE TABLE IF NOT EXISTS statuses (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            user_id INTEGER NOT NULL REFERENCES users(id),
+            content TEXT NOT NULL,
+            timestamp TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+            expiration_time TIMESTAMP
+        )
+        """,
+        """
+        CREATE TABLE IF NOT EXISTS likes (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            status_id INTEGER NOT NULL REFERENCES statuses(id),
+            user_id INTEGER NOT NULL REFERENCES users(id),
+            created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+        )
+        """,
+        """
+        CREATE TABLE IF NOT EXISTS views (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            status_id INTEGER NOT NULL REFERENCES statuses(id),
+            user_id INTEGER NOT NULL REFERENCES users(id),
+            viewed_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+        )
+        """,
+        """
+        CREATE TABLE IF NOT EXISTS chat_messages (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            user_id INTEGER NOT NULL REFERENCES users(id),
+            message TEXT NOT NULL,
+            ai_suggestions TEXT,
+            timestamp TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+        )
+        """,
+        """
+        CREATE TABLE IF NOT EXISTS feedback (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            user_name TEXT NOT NULL,
+            feedback_text TEXT NOT NULL,
+            created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+        )
+        """,
+        """
+        CREATE TABLE IF NOT EXISTS contact (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            user_name TEXT NOT NULL,
+            feedback_text TEXT NOT NULL,
+            created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+        )
+        """,
+    ]),
+    (2, "Indexes for the hot query paths", [
+        # load_chat_history_db / check_for_new_messages: one range scan per OR branch
+        "CREATE INDEX IF NOT EXISTS idx_messages_pair_time ON messages (sender_id, receiver_id, timestamp)",
+        # fetch_group_message
+        "CREATE INDEX IF NOT EXISTS idx_messages_receiver_time ON messages (receiver_id, timestamp)",
+        # fetch_notifications / mark_notifications_as_read
+        "CREATE INDEX IF NOT EXISTS idx_notifications_user_unread ON notifications (user_id, is_read, created_at)",
+        "CREATE INDEX IF NOT EXISTS idx_message_notifications_user_unread "
+        "ON message_notifications (user_id, is_read, created_at)",
+        # load_friends and the friends sub-select in get_friend_and_user_statuses
+        "CREATE INDEX IF NOT EXISTS idx_friends_user ON friends (user_id, friend_id)",
+        # check_friend_requests / respond_to_friend_requests
+        "CREATE INDEX IF NOT EXISTS idx_friend_requests_receiver ON friend_requests (receiver_id, status)",
+        # get_friend_and_user_statuses / delete_expired_statuses
+        "CREATE INDEX IF NOT EXISTS idx_statuses_expiration ON statuses (expiration_time)",
+        "CREATE INDEX IF NOT EXISTS idx_statuses_user_time ON statuses (user_id, timestamp)",
+        # like/view lookups per status
+        "CREATE INDEX IF NOT EXISTS idx_likes_status_user ON likes (status_id, user_id)",
+        "CREATE INDEX IF NOT EXISTS idx_views_status_user ON views (status_id, user_id)",
+        # group membership in both directions
+        "CREATE INDEX IF NOT EXISTS idx_group_members_group ON group_members (group_id, member_id)",
+        "CREATE INDEX IF NOT EXISTS idx_group_members_member ON group_members (member_id, group_id)",
+        "CREATE INDEX IF NOT EXISTS idx_groups_created_by ON groups (created_by)",
+        # login / sign-up / add friend by name
+        "CREATE INDEX IF NOT EXISTS idx_users_name ON users (name)",
+        "CREATE INDEX IF NOT EXISTS idx_users_phone ON users (phone_number)",
+        # AI chat history
+        "CREATE INDEX IF NOT EXISTS idx_chat_messages_user_time ON chat_messages (user_id, timestamp)",
+    ]),
+    (3, "Index for incremental message fetches", [
+        # fetch_new_messages: id range per conversation direction
+        "CREATE INDEX IF NOT EXISTS idx_messages_pair_id ON messages (sender_id, receiver_id, id)",
+    ]),
+    (4, "Per-table change counters for the change watcher", [
+        """
+        CREATE TABLE IF NOT EXISTS table_versions (
+            table_name TEXT PRIMARY KEY,
+            version INTEGER NOT NULL DEFAULT 0
+        )
+        """,
+        "INSERT OR IGNORE INTO table_versions (table_name) VALUES "
+        "('messages'), ('notifications'), ('message_notifications')",
+        """
+        CREATE TRIGGER IF NOT EXISTS trg_messages_insert_version AFTER INSERT ON messages
+        BEGIN
+            UPDATE table_versions SET version = version + 1 WHERE table_name = 'messages';
+        END
+        """,
+        """
+        CREATE TRIGGER IF NOT EXISTS trg_messages_update_version AFTER UPDATE ON messages
+        BEGIN
+            UPDATE table_versions SET version = version + 1 WHERE table_name = 'messages';
+        END
+        """,
+        """
+        CREATE TRIGGER IF NOT EXISTS trg_messages_delete_version AFTER DELETE ON messages
+        BEGIN
+            UPDATE table_versions SET version = version + 1 WHERE table_name = 'messages';
+        END
+        """,
+        """
+        CREATE TRIGGER IF NOT EXISTS trg_notifications_insert_version AFTER INSERT ON notifications
+        BEGIN
+            UPDATE table_versions SET version = version + 1 WHERE table_name = 'notifications';
+        END
+        """,
+        """
+        CREATE TRIGGER IF NOT EXISTS trg_notifications_update_version AFTER UPDATE ON notifications
+        BEGIN
+            UPDATE table_versions SET version = version + 1 WHERE table_name = 'notifications';
+        END
+        """,
+        """
+        CREATE TRIGGER IF NOT EXISTS trg_notifications_delete_version AFTER DELETE ON notifications
+        BEGIN
+            UPDATE table_versions SET version = version + 1 WHERE table_name = 'notifications';
+        END
+        """,
+        """
+        CREATE TRIGGER IF NOT EXISTS trg_message_notifications_insert_version AFTER INSERT ON message_notifications
+        BEGIN
+            UPDATE table_versions SET version = version + 1 WHERE table_name = 'message_notifications';
+        END
+        """,
+        """
+        CREATE TRIGGER IF NOT EXISTS trg_message_notifications_update_version AFTER UPDATE ON message_notifications
+        BEGIN
+            UPDATE table_versions SET version = version + 1 WHERE table_name = 'message_notifications';
+        END
+        """,
+        """
+        CREATE TRIGGER IF NOT EXISTS trg_message_notifications_delete_version AFTER DELETE ON message_notifications
+        BEGIN
+            UPDATE table_versions SET version = version + 1 WHERE table_name = 'message_notifications';
+        END
+        """,
+    ]),
+    (5, "Conversations, so direct and group messages no longer share receiver_id", [
+        """
+        CREATE TABLE IF NOT EXISTS conversations (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            kind TEXT NOT NULL CHECK (kind IN ('direct', 'group')),
+            group_id INTEGER UNIQUE REFERENCES groups(id),
+            user_low INTEGER REFERENCES users(id),
+            user_high INTEGER REFERENCES users(id),
+            created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+            UNIQUE (user_low, user_high)
+        )
+        """,
+        """
+        CREATE TABLE IF NOT EXISTS conversation_members (
+            conversation_id INTEGER NOT NULL REFERENCES conversations(id),
+            user_id INTEGER NOT NULL REFERENCES users(id),
+            PRIMARY KEY (conversation_id, user_id)
+        ) WITHOUT ROWID
+        """,
+        "CREATE INDEX IF NOT EXISTS idx_conversation_members_user ON conversation_members (user_id, conversation_id)",
+        _add_column("messages", "conversation_id", "INTEGER REFERENCES conversations(id)"),
+        # One conversation per group, members = creator + group_members
+        "INSERT OR IGNORE INTO conversations (kind, group_id) SELECT 'group', id FROM groups",
+        """
+        INSERT OR IGNORE INTO conversation_members (conversation_id, user_id)
+        SELECT c.id, g.created_by FROM conversations c JOIN groups g ON g.id = c.group_id
+        UNION
+        SELECT c.id, gm.member_id FROM conversations c JOIN group_members gm ON gm.group_id = c.group_id
+        """,
+        # Old group messages used receiver_id = group id. A row is a group message when the
+        # sender belongs to that group and is not friends with a user of the same id.
+        """
+        UPDATE messages
+        SET conversation_id = (SELECT c.id FROM conversations c WHERE c.group_id = messages.receiver_id)
+        WHERE conversation_id IS NULL
+          AND NOT EXISTS (
+              SELECT 1 FROM friends f
+              WHERE f.user_id = messages.sender_id AND f.friend_id = messages.receiver_id
+          )
+          AND EXISTS (
+              SELECT 1 FROM conversation_members cm
+              JOIN conversations c ON c.id = cm.conversation_id
+              WHERE c.group_id = messages.receiver_id AND cm.user_id = messages.sender_id
+          )
+        """,
+        # Everything else is a direct message between two users
+        """
+        INSERT OR IGNORE INTO conversations (kind, user_low, user_high)
+        SELECT DISTINCT 'direct', MIN(sender_id, receiver_id), MAX(sender_id, receiver_id)
+        FROM messages WHERE conversation_id IS NULL
+        """,
+        """
+        UPDATE messages
+        SET conversation_id = (
+            SELECT c.id FROM conversations c
+            WHERE c.user_low = MIN(messages.sender_id, messages.receiver_id)
+              AND c.user_high = MAX(messages.sender_id, messages.receiver_id)
+        )
+        WHERE conversation_id IS NULL
+        """,
+        """
+        INSERT OR IGNORE INTO conversation_members (conversation_id, user_id)
+        SELECT id, user_low FROM conversations WHERE kind = 'direct'
+        UNION
+        SELECT id, user_high FROM conversations WHERE kind = 'direct'
+        """,
+        # History reads (time order) and incremental fetches (id order) per conversation
+        "CREATE INDEX IF NOT EXISTS idx_messages_conversation_time ON messages (conversation_id, timestamp, id)",
+        "CREATE INDEX IF NOT EXISTS idx_messages_conversation_id ON messages (conversation_id, id)",
+    ]),
+    (6, "Full-text search over text messages", [
+        # External-content table: the text lives in messages, FTS5 only keeps the index
+        """
+        CREATE VIRTUAL TABLE IF NOT EXISTS messages_fts USING fts5(
+            content,
+            content='messages',
+            content_rowid='id',
+            tokenize='unicode61 remove_diacritics 2'
+        )
+        """,
+        # File messages store a path in content; only text messages are indexed
+        """
+        CREATE TRIGGER IF NOT EXISTS trg_messages_fts_insert AFTER INSERT ON messages
+        WHEN new.message_type = 'text'
+        BEGIN
+            INSERT INTO messages_fts (rowid, content) VALUES (new.id, new.content);
+        END
+        """,
+        """
+        CREATE TRIGGER IF NOT EXISTS trg_messages_fts_delete AFTER DELETE ON messages
+        WHEN old.message_type = 'text'
+        BEGIN
+            INSERT INTO messages_fts (messages_fts, rowid, content) VALUES ('delete', old.id, old.content);
+        END
+        """,
+        # One trigger so the old entry is always removed before the new one is added
+        """
+        CREATE TRIGGER IF NOT EXISTS trg_messages_fts_update AFTER UPDATE OF content, message_type ON messages
+        BEGIN
+            INSERT INTO messages_fts (messages_fts, rowid, content)
+            SELECT 'delete', old.id, old.content WHERE old.message_type = 'text';
+            INSERT INTO messages_fts (rowid, content)
+            SELECT new.id, new.content WHERE new.message_type = 'text';
+        END
+        """,
+        # Index existing messages, unless the index was already filled
+        """
+        INSERT INTO messages_fts (rowid, content)
+        SELECT id, content FROM messages
+        WHERE message_type = 'text' AND content IS NOT NULL
+          AND NOT EXISTS (SELECT 1 FROM messages_fts_docsize)
+        """,
+    ]),
+    (7, "Catalogue of archived message months", [
+        # Which monthly archive files hold messages of a conversation (see db_archive)
+        """
+        CREATE TABLE IF NOT EXISTS message_archive_index (
+            conversation_id INTEGER NOT NULL,
+            month TEXT NOT NULL,
+            PRIMARY KEY (conversation_id, month)
+        ) WITHOUT ROWID
+        """,
+        # Lets the archiver find messages past the cutoff without a full scan
+        "CREATE INDEX IF NOT EXISTS idx_messages_timestamp ON messages (timestamp)",
+    ]),
+    (8, "Content-addressed attachment store", [
+        # One row per distinct file content kept in the attachment store (see attachment_store)
+        """
+        CREATE TABLE IF NOT EXISTS attachments (
+            sha256 TEXT PRIMARY KEY,
+            size INTEGER NOT NULL,
+            extension TEXT NOT NULL DEFAULT '',
+            created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+        ) WITHOUT ROWID
+        """,
+        _add_column("messages", "attachment_sha256", "TEXT REFERENCES attachments(sha256)"),
+        """
+        CREATE INDEX IF NOT EXISTS idx_messages_attachment
+        ON messages (attachment_sha256) WHERE attachment_sha256 IS NOT NULL
+        """,
+    ]),
+    (9, "Unique likes/views and counters on statuses", [
+        # Keep the first like/view of each user per status, then enforce that
+        "DELETE FROM likes WHERE id NOT IN (SELECT MIN(id) FROM likes GROUP BY status_id, user_id)",
+        "DELETE FROM views WHERE id NOT IN (SELECT MIN(id) FROM views GROUP BY status_id, user_id)",
+        "DROP INDEX IF EXISTS idx_likes_status_user",
+        "DROP INDEX IF EXISTS idx_views_status_user",
+        "CREATE UNIQUE INDEX IF NOT EXISTS idx_likes_status_user ON likes (status_id, user_id)",
+        "CREATE UNIQUE INDEX IF NOT EXISTS idx_views_status_user ON views (status_id, user_id)",
+        _add_column("statuses", "like_count", "INTEGER NOT NULL DEFAULT 0"),
+        _add_column("statuses", "view_count", "INTEGER NOT NULL DEFAULT 0"),
+        """
+        UPDATE statuses SET
+            like_count = (SELECT COUNT(*) FROM likes WHERE likes.status_id = statuses.id),
+            view_count = (SELECT COUNT(*) FROM views WHERE views.status_id = statuses.id)
+        """,
+        """
+        CREATE TRIGGER IF NOT EXISTS trg_likes_insert_count AFTER INSERT ON likes
+        BEGIN
+            UPDATE statuses SET like_count = like_count + 1 WHERE id = NEW.status_id;
+        END
+        """,
+        """
+        CREATE TRIGGER IF NOT EXISTS trg_likes_delete_count AFTER DELETE ON likes
+        BEGIN
+            UPDATE statuses SET like_count = like_count - 1 WHERE id = OLD.status_id;
+        END
+        """,
+        """
+        CREATE TRIGGER IF NOT EXISTS trg_views_insert_count AFTER INSERT ON views
+        BEGIN
+            UPDATE statuses SET view_count = view_count + 1 WHERE id = NEW.status_id;
+        END
+        """,
+        """
+        CREATE TRIGGER IF NOT EXISTS trg_views_delete_count AFTER DELETE ON views
+        BEGIN
+            UPDATE statuses SET view_count = view_count - 1 WHERE id = OLD.status_id;
+        END
+        """,
+    ]),
+    (10, "Status expiry as integer epoch seconds", [
+        _add_column("statuses", "expires_at", "INTEGER"),
+        # expiration_time was written with datetime.now(), i.e. local time
+        """
+        UPDATE statuses SET expires_at = COALESCE(
+            CAST(strftime('%s', expiration_time, 'utc') AS INTEGER),
+            CAST(strftime('%s', timestamp, '+1 day') AS INTEGER)
+        )
+        WHERE expires_at IS NULL
+        """,
+        "DROP INDEX IF EXISTS idx_statuses_expiration",
+        # The feed's "not expired" filter and the maintenance purge
+        "CREATE INDEX IF NOT EXISTS idx_statuses_expires_at ON statuses (expires_at)",
+    ]),
+    (11, "Cache of AI answers", [
+        # key = hash of (kind, backend, parameters, normalised text); see ai_cache
+        """
+        CREATE TABLE IF NOT EXISTS ai_cache (
+            cache_key TEXT PRIMARY KEY,
+            kind TEXT NOT NULL,
+            value TEXT NOT NULL,
+            created_at INTEGER NOT NULL,
+            expires_at INTEGER NOT NULL
+        ) WITHOUT ROWID
+        """,
+        # Expiry and oldest-first eviction
+        "CREATE INDEX IF NOT EXISTS idx_ai_cache_expires_at ON ai_cache (expires_at)",
+        "CREATE INDEX IF NOT EXISTS idx_ai_cache_created_at ON ai_cache (created_at)",
+    ]),
+    (12, "Sentiment labels on AI chat messages", [
+        _add_column("chat_messages", "sentiment", "TEXT"),
+        # annotate_chat_history: the rows still waiting for a label
+        """
+        CREATE INDEX IF NOT EXISTS idx_chat_messages_unlabelled
+        ON chat_messages (user_id, id) WHERE sentiment IS NULL
+        """,
+    ]),
+]
+
+
+def _ensure_version_table(connection):
+    connection.execute(
+        """
+        CREATE TABLE IF NOT EXISTS schema_migrations (
+            version INTEGER PRIMARY KEY,
+            description TEXT NOT NULL,
+            applied_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+        )
+        """
+    )
+    connection.commit()
+
+
+def current_version(connection):
+    """
+    Return the highest migration version applied to the database.
+
+    Args:
+        connection (sqlite3.Connection): An open connection.
+
+    Returns:
+        int: 0 for a database that has never been migrated.
+    """
+    _ensure_version_table(connection)
+    row = connection.execute("SELECT MAX(version) FROM schema_migrations").fetchone()
+    return row[0] or 0
+
+
+def migrate(target_version=None):
+    """
+    Bring the database schema up to date. Safe to call on every startup.
+
+    Each migration runs in its own IMMEDIATE transaction, so two app instances
+    starting at the same time cannot apply the same migration twice.
+
+    Args:
+        target_version (int, optional): Stop after this version. Defaults to the latest.
+
+    Returns:
+        int: The schema version after migrating.
+    """
+    with db_handler.get_connection() as connection:
+        version = current_version(connection)
+
+        for migration_version, description, statements in MIGRATIONS:
+            if migration_version <= version:
+                continue
+            if target_version is not None and migration_version > target_version:
+                break
+
+            try:
+                connection.execute("BEGIN IMMEDIATE")
+                # Another process may have applied it while we waited for the lock
+                applied = connection.execute(
+                    "SELECT 1 FROM schema_migrations WHERE version = ?", (migration_version,)
+                ).fetchone()
+                if not applied:
+                    for statement in statements:
+                        if callable(statement):
+                            statement(connection)
+                        else:
+                            connection.execute(statement)
+                    connection.execute(
+                        "INSERT INTO schema_migrations (version, description) VALUES (?, ?)",
+                        (migration_version, description),
+                    )
+                connection.commit()
+                print(f"Applied schema migration {migration_version}: {description}")
+            except sqlite3.Error as e:
+                connection.rollback()
+                print(f"Schema migration {migration_version} failed: {e}")
+                raise
+
+            version = migration_version
+
+        return version
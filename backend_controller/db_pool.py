@@ -0,0 +1,183 @@
+import sqlite3
+import threading
+from contextlib import contextmanager
+
+
+class PooledConnection:
+    """
+    Thin wrapper around a pooled sqlite3 connection.
+
+    Behaves like a normal sqlite3.Connection, except that close() hands the
+    connection back to the pool instead of closing it.
+    """
+
+    def __init__(self, pool, connection):
+        self._pool = pool
+        self._connection = connection
+
+    def __getattr__(self, name):
+        return getattr(self._connection, name)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
+        return False
+
+    @property
+    def raw(self):
+        """The underlying sqlite3.Connection."""
+        return self._connection
+
+    def close(self):
+        """Return the connection to the pool."""
+        if self._connection is not None:
+            self._pool.release(self._connection)
+            self._connection = None
+
+
+class ConnectionPool:
+    """
+    A bounded pool of persistent SQLite connections.
+
+    Each thread reuses the connection it last checked out, so nested checkouts
+    from the same thread share one connection. Idle connections are health
+    checked before being handed out again and replaced if they went bad.
+    """
+
+    def __init__(self, database, max_size=8, timeout=30.0, on_connect=None):
+        """
+        Args:
+            database (str): Path to the SQLite database file.
+            max_size (int): Maximum number of connections open at once.
+            timeout (float): Seconds to wait for a free connection.
+            on_connect (callable, optional): Called with every new connection.
+        """
+        self.database = database
+        self.max_size = max_size
+        self.timeout = timeout
+        self.on_connect = on_connect
+        self._slots = threading.BoundedSemaphore(max_size)
+        self._lock = threading.Lock()
+        self._idle = []
+        self._local = threading.local()
+        self._closed = False
+
+    def _connect(self):
+        connection = sqlite3.connect(self.database, check_same_thread=False)
+        if self.on_connect:
+            self.on_connect(connection)
+        return connection
+
+    @staticmethod
+    def _is_healthy(connection):
+        try:
+            connection.execute("SELECT 1").fetchone()
+            return True
+        except sqlite3.Error:
+            return False
+
+    def acquire(self):
+        """
+        Check out a connection for the current thread.
+
+        Returns:
+            sqlite3.Connection: A healthy connection.
+
+        Raises:
+            sqlite3.OperationalError: If no connection frees up within the timeout.
+        """
+        if self._closed:
+            raise sqlite3.ProgrammingError("Connection pool is closed.")
+
+        # Nested checkout from the same thread: share the connection.
+        held = getattr(self._local, "connection", None)
+        if held is not None:
+            self._local.depth += 1
+            return held
+
+        if not self._slots.acquire(timeout=self.timeout):
+            raise sqlite3.OperationalError("Timed out waiting for a database connection.")
+
+        try:
+            connection = None
+            preferred = getattr(self._local, "last", None)
+            with self._lock:
+                if preferred is not None and preferred in self._idle:
+                    self._idle.remove(preferred)
+                    connection = preferred
+                elif self._idle:
+                    connection = self._idle.pop()
+
+            if connection is not None and not self._is_healthy(connection):
+                connection.close()
+                connection = None
+            if connection is None:
+                connection = self._connect()
+        except Exception:
+            self._slots.release()
+            raise
+
+        self._local.connection = connection
+        self._local.last = connection
+        self._local.depth = 1
+        return connection
+
+    def release(self, connection):
+        """Give a connection back to the pool."""
+        if getattr(self._local, "connection", None) is not connection:
+            # Released from a thread that did not check it out; just park it.
+            self._park(connection)
+            self._slots.release()
+            return
+
+        self._local.depth -= 1
+        if self._local.depth > 0:
+            return
+
+        self._local.connection = None
+        self._park(connection)
+        self._slots.release()
+
+    def _park(self, connection):
+        # Never hand a half-finished transaction to the next caller.
+        try:
+            if connection.in_transaction:
+                connection.rollback()
+        except sqlite3.Error:
+            connection.close()
+            return
+
+        with self._lock:
+            if self._closed or len(self._idle) >= self.max_size:
+                connection.close()
+            else:
+                self._idle.append(connection)
+
+    @contextmanager
+    def connection(self):
+        """
+        Context manager that checks out a connection and always returns it.
+
+        Example:
+            with pool.connection() as conn:
+                conn.execute(...)
+        """
+        connection = self.acquire()
+        try:
+            yield connection
+        finally:
+            self.release(connection)
+
+    def checkout(self):
+        """Check out a connection wrapped so that close() returns it to the pool."""
+        return PooledConnection(self, self.acquire())
+
+    def close_all(self):
+        """Close every idle connection and refuse new checkouts."""
+        with self._lock:
+            self._closed = True
+            idle, self._idle = self._idle, []
+        for connection in idle:
+            connection.close()
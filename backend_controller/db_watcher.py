@@ -0,0 +1,93 @@
+import sqlite3
+
+from PySide6.QtCore import QObject, QTimer, Signal
+
+from backend_controller import db_config, db_handler
+
+# How often the watcher asks SQLite whether anything was committed (ms)
+CHECK_INTERVAL_MS = 250
+
+
+class DbChangeWatcher(QObject):
+    """
+    Wakes subscribers when the messages or notification tables change.
+
+    Every tick costs one PRAGMA data_version on a private connection, which only
+    reads SQLite's in-memory change counter. When another connection (another
+    thread, the writer, or another app instance) has committed, the small
+    table_versions table maintained by triggers tells us which tables moved.
+    """
+
+    tableChanged = Signal(str)
+
+    def __init__(self, interval_ms=CHECK_INTERVAL_MS):
+        super().__init__()
+        # Same PRAGMAs as the pool, so the busy timeout covers the writer's commits
+        self._connection = sqlite3.connect(db_handler.DB_PATH)
+        db_config.apply_profile(self._connection)
+        self._data_version = None
+        self._table_versions = {}
+        self._subscribers = {}
+        self.tableChanged.connect(self._notify)
+
+        self._timer = QTimer(self)
+        self._timer.timeout.connect(self.check_now)
+        self._timer.start(interval_ms)
+        self.check_now()
+
+    def subscribe(self, table, callback):
+        """
+        Call callback() on the GUI thread whenever table changes.
+
+        Args:
+            table (str): "messages", "notifications" or "message_notifications".
+            callback (callable): Takes no arguments.
+        """
+        self._subscribers.setdefault(table, []).append(callback)
+
+    def unsubscribe(self, table, callback):
+        """Stop calling callback for table."""
+        callbacks = self._subscribers.get(table, [])
+        if callback in callbacks:
+            callbacks.remove(callback)
+
+    def check_now(self):
+        """Compare change counters and emit tableChanged for every table that moved."""
+        try:
+            data_version = self._connection.execute("PRAGMA data_version").fetchone()[0]
+            if data_version == self._data_version:
+                return  # Nothing committed since the last check
+
+            versions = dict(self._connection.execute("SELECT table_name, version FROM table_versions"))
+        except sqlite3.Error as e:
+            # The commit is not marked as seen, so the next tick tries again
+            print(f"Change watcher could not read the database: {e}")
+            return
+        self._data_version = data_version
+
+        first_check = not self._table_versions
+        for table, version in versions.items():
+            if self._table_versions.get(table) != version:
+                self._table_versions[table] = version
+                if not first_check:
+                    self.tableChanged.emit(table)
+
+    def _notify(self, table):
+        for callback in list(self._subscribers.get(table, [])):
+            callback()
+
+    def stop(self):
+        """Stop watching and close the private connection."""
+        self._timer.stop()
+        self._connection.close()
+
+
+_watcher = None
+
+
+def get_watcher():
+    """Return the shared DbChangeWatcher, starting it on first use (GUI thread only)."""
+    global _watcher
+    if _watcher is None:
+        _watcher = DbChangeWatcher()
+    return _watcher
@@ -0,0 +1,158 @@
+import atexit
+import queue
+import sqlite3
+import threading
+from concurrent.futures import Future
+
+from backend_controller import db_handler
+from backend_controller.batching import collect_batch
+
+# A batch is committed once it holds this many writes...
+MAX_BATCH_SIZE = 256
+# ...or once its oldest write has waited this long (seconds)
+MAX_BATCH_DELAY = 0.005
+# Writers block (backpressure) once this many writes are waiting
+MAX_PENDING_WRITES = 2000
+# How long submit() blocks on a full queue before giving up (seconds)
+SUBMIT_TIMEOUT = 5.0
+
+
+class WriteQueue:
+    """
+    Background writer that group-commits small writes.
+
+    Each write is a function taking a cursor. Writes submitted within a few
+    milliseconds of each other share one transaction (and one fsync); each runs
+    inside its own SAVEPOINT so a failing write does not take the batch down.
+    """
+
+    def __init__(self, max_batch_size=MAX_BATCH_SIZE, max_batch_delay=MAX_BATCH_DELAY,
+                 max_pending=MAX_PENDING_WRITES, submit_timeout=SUBMIT_TIMEOUT):
+        self.max_batch_size = max_batch_size
+        self.max_batch_delay = max_batch_delay
+        self.submit_timeout = submit_timeout
+        self._queue = queue.Queue(maxsize=max_pending)
+        self._closed = False
+        self._thread = threading.Thread(target=self._run, name="db-writer", daemon=True)
+        self._thread.start()
+
+    def submit(self, operation, *args):
+        """
+        Queue a write.
+
+        Args:
+            operation (callable): Called as operation(cursor, *args) on the writer thread.
+            *args: Arguments passed through to operation.
+
+        Returns:
+            concurrent.futures.Future: Resolves to the operation's return value once
+            its batch has committed, or to the exception it raised.
+
+        Raises:
+            sqlite3.OperationalError: If the queue stays full for submit_timeout seconds.
+        """
+        if self._closed:
+            raise sqlite3.ProgrammingError("Write queue is closed.")
+
+        future = Future()
+        try:
+            self._queue.put((operation, args, future), timeout=self.submit_timeout)
+        except queue.Full:
+            raise sqlite3.OperationalError("Database write queue is full, try again later.")
+        return future
+
+    def flush(self, timeout=None):
+        """Block until everything submitted so far has been committed."""
+        if self._closed and not self._thread.is_alive():
+            return
+        self.submit(_noop).result(timeout)
+
+    def close(self, timeout=10.0):
+        """Flush pending writes and stop the writer thread."""
+        if self._closed:
+            return
+        self._closed = True
+        self._queue.put(None)
+        self._thread.join(timeout)
+
+    def _run(self):
+        while True:
+            batch = collect_batch(self._queue, self.max_batch_size, self.max_batch_delay)
+            if batch is None:
+                return
+            self._commit_batch(batch)
+
+    @staticmethod
+    def _commit_batch(batch):
+        results = []
+        try:
+            with db_handler.get_connection() as connection:
+                cursor = connection.cursor()
+                cursor.execute("BEGIN IMMEDIATE")
+                for operation, args, future in batch:
+                    cursor.execute("SAVEPOINT write_op")
+                    try:
+                        results.append((future, True, operation(cursor, *args)))
+                        cursor.execute("RELEASE write_op")
+                    except Exception as e:
+                        cursor.execute("ROLLBACK TO write_op")
+                        cursor.execute("RELEASE write_op")
+                        results.append((future, False, e))
+                connection.commit()
+        except Exception as e:
+            print(f"Database error while committing {len(batch)} queued writes: {e}")
+            for _, _, future in batch:
+                if not future.done():
+                    future.set_exception(e)
+            return
+
+        # Only report success once the whole batch is durable
+        for future, ok, value in results:
+            if ok:
+                future.set_result(value)
+            else:
+                future.set_exception(value)
+
+
+def _noop(cursor):
+    return None
+
+
+_writer = None
+_writer_lock = threading.Lock()
+
+
+def get_writer():
+    """Return the shared WriteQueue, starting it on first use."""
+    global _writer
+    if _writer is None:
+        with _writer_lock:
+            if _writer is None:
+                _writer = WriteQueue()
+    return _writer
+
+
+def submit(operation, *args):
+    """Shortcut for get_writer().submit(...)."""
+    return get_writer().submit(operation, *args)
+
+
+def report_errors(future, action):
+    """Print the error of a fire-and-forget write if it fails."""
+    def _check(done):
+        if done.exception() is not None:
+            print(f"Failed to {action}: {done.exception()}")
+    future.add_done_callback(_check)
+    return future
+
+
+def shutdown():
+    """Flush and stop the writer. Registered with atexit and called when the app quits."""
+    global _writer
+    with _writer_lock:
+        if _writer is not None:
+            _writer.close()
+            _writer = None
+
+
+atexit.register(shutdown)
@@ -0,0 +1,113 @@
+import threading
+
+from backend_controller import db_handler
+
+
+class FriendGraph:
+    """
+    One user's friends, loaded from the database once per session and indexed by id and by name.
+
+    respond_to_friend_requests keeps it current through add_friend, so views
+    read it instead of re-querying the friends table.
+    """
+
+    def __init__(self, user_id):
+        self.user_id = user_id
+        self._names_by_id = {}
+        self._ids_by_name = {}
+        self._loaded = False
+        self._lock = threading.Lock()
+        self._listeners = []
+
+    def load(self, force=False):
+        """Read the adjacency list from the database, unless it is already loaded."""
+        if self._loaded and not force:
+            return
+        query = """
+            SELECT u.id, u.name
+            FROM friends f
+            JOIN users u ON u.id = f.friend_id
+            WHERE f.user_id = ?
+        """
+        with db_handler.get_connection() as connection:
+            cursor = connection.cursor()
+            cursor.execute(query, (self.user_id,))
+            rows = cursor.fetchall()
+
+        with self._lock:
+            self._names_by_id = {}
+            self._ids_by_name = {}
+            for friend_id, name in rows:
+                self._index(friend_id, name)
+            self._loaded = True
+
+    def _index(self, friend_id, name):
+        self._names_by_id[friend_id] = name
+        # Keep the first friend seen under a name, as the old linear scan did
+        self._ids_by_name.setdefault(name, friend_id)
+
+    def friends(self):
+        """
+        Return every friend.
+
+        Returns:
+            list: (friend_id, name) tuples in the order they became friends.
+        """
+        self.load()
+        with self._lock:
+            return list(self._names_by_id.items())
+
+    def get_id(self, name):
+        """Return the id of the friend called name, or None."""
+        self.load()
+        return self._ids_by_name.get(name)
+
+    def get_name(self, friend_id):
+        """Return a friend's name, or None if friend_id is not a friend."""
+        self.load()
+        return self._names_by_id.get(friend_id)
+
+    def is_friend(self, friend_id):
+        self.load()
+        return friend_id in self._names_by_id
+
+    def add_friend(self, friend_id, name):
+        """Record a new friendship that was just committed."""
+        if not self._loaded:
+            return  # The first load will read it from the database
+        with self._lock:
+            if friend_id in self._names_by_id:
+                return
+            self._index(friend_id, name)
+        for listener in list(self._listeners):
+            listener()
+
+    def add_listener(self, callback):
+        """Call callback() whenever a friend is added."""
+        self._listeners.append(callback)
+
+    def remove_listener(self, callback):
+        if callback in self._listeners:
+            self._listeners.remove(callback)
+
+
+_graphs = {}
+_graphs_lock = threading.Lock()
+
+
+def get_friend_graph(user_id):
+    """Return the FriendGraph for user_id, creating it (unloaded) on first use."""
+    with _graphs_lock:
+        graph = _graphs.get(user_id)
+        if graph is None:
+            graph = _graphs[user_id] = FriendGraph(user_id)
+        return graph
+
+
+def friendship_added(user_id, friend_id, user_name, friend_name):
+    """Update both users' graphs after a friend request was accepted and committed."""
+    with _graphs_lock:
+        graphs = [(_graphs.get(user_id), friend_id, friend_name), (_graphs.get(friend_id), user_id, user_name)]
+    for graph, other_id, other_name in graphs:
+        if graph is not None:
+            graph.add_friend(other_id, other_name)
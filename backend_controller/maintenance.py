@@ -0,0 +1,87 @@
+from PySide6.QtCore import QObject, QTimer
+
+from backend_controller import ai_cache, attachment_store, db_archive, db_handler_socials
+from backend_controller.db_executor import get_executor
+from helpers import thumbnail_cache
+
+# Minutes between runs of each housekeeping job
+PURGE_STATUSES_EVERY_MIN = 10
+ARCHIVE_MESSAGES_EVERY_MIN = 24 * 60
+PRUNE_AI_CACHE_EVERY_MIN = 60
+SWEEP_PARTIAL_COPIES_EVERY_MIN = 6 * 60
+PRUNE_THUMBNAILS_EVERY_MIN = 60
+
+
+class MaintenanceScheduler(QObject):
+    """
+    Runs periodic housekeeping jobs on the database executor.
+
+    Timers fire on the GUI thread but only queue the jobs, so nothing here ever
+    blocks the window. A job is skipped while its previous run is still going.
+    """
+
+    def __init__(self, parent=None):
+        super().__init__(parent)
+        self._timers = []
+        self._running = set()
+
+    def add_job(self, name, fn, every_minutes, run_now=True):
+        """
+        Schedule fn() to run on a worker thread every every_minutes minutes.
+
+        Args:
+            name (str): Used in log messages and to avoid overlapping runs.
+            fn (callable): The job; it must not touch widgets.
+            every_minutes (int): Interval between runs.
+            run_now (bool): Also run it once straight away.
+        """
+        timer = QTimer(self)
+        timer.timeout.connect(lambda: self.run_job(name, fn))
+        timer.start(every_minutes * 60 * 1000)
+        self._timers.append(timer)
+        if run_now:
+            self.run_job(name, fn)
+
+    def run_job(self, name, fn):
+        if name in self._running:
+            return
+        self._running.add(name)
+        get_executor().submit(
+            fn,
+            on_result=lambda _: self._running.discard(name),
+            on_error=lambda e: self._job_failed(name, e),
+        )
+
+    def _job_failed(self, name, error):
+        self._running.discard(name)
+        print(f"Maintenance job {name} failed: {error}")
+
+    def stop(self):
+        for timer in self._timers:
+            timer.stop()
+
+
+_scheduler = None
+
+
+def start_maintenance():
+    """
+    Start the app's housekeeping jobs: status expiry, message archiving, AI cache
+    and thumbnail pruning, and deleting abandoned partial attachment copies.
+    """
+    global _scheduler
+    if _scheduler is None:
+        _scheduler = MaintenanceScheduler()
+        _scheduler.add_job("purge expired statuses", db_handler_socials.delete_expired_statuses,
+                           PURGE_STATUSES_EVERY_MIN)
+        _scheduler.add_job("archive old messages", db_archive.archive_old_messages, ARCHIVE_MESSAGES_EVERY_MIN)
+        _scheduler.add_job("prune AI cache", ai_cache.prune, PRUNE_AI_CACHE_EVERY_MIN)
+        _scheduler.add_job("sweep partial attachment copies", attachment_store.sweep_partial_copies,
+                           SWEEP_PARTIAL_COPIES_EVERY_MIN)
+        _scheduler.add_job("prune thumbnail cache", thumbnail_cache.prune_disk_cache, PRUNE_THUMBNAILS_EVERY_MIN)
+    return _scheduler
+
+
+def stop_maintenance():
+    if _scheduler is not None:
+        _scheduler.stop()
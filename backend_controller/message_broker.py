@@ -0,0 +1,140 @@
+"""
+Local real-time message broker.
+
+Run it next to the app:
+
+    python -m backend_controller.message_broker [--host 127.0.0.1] [--port 8765]
+
+Clients speak newline-delimited JSON over TCP:
+
+    -> {"op": "hello", "user_id": 1}
+    -> {"op": "send", "ref": 7, "to": 2, "content": "Hi"}
+    <- {"event": "ack", "ref": 7, "id": 42}
+    <- {"event": "message", "id": 42, "sender_id": 1, "receiver_id": 2, "content": "Hi"}
+
+Sends are persisted through db_handler_friends.queue_message (and so the
+group-commit writer) before they are pushed to every connection of the sender
+and the receiver.
+"""
+import argparse
+import asyncio
+import json
+import sqlite3
+
+from backend_controller import db_config, db_handler_friends, db_migrations, db_writer
+
+DEFAULT_HOST = "127.0.0.1"
+DEFAULT_PORT = 8765
+# Longest line a client may send (bytes)
+MAX_LINE = 64 * 1024
+
+
+class MessageBroker:
+    """Accepts client connections, persists sends and pushes them to recipients."""
+
+    def __init__(self):
+        # user_id -> set of StreamWriter, one per connected window
+        self._clients = {}
+        # In-flight sends; asyncio only keeps weak references to tasks
+        self._tasks = set()
+
+    async def handle_client(self, reader, writer):
+        user_id = None
+        try:
+            while True:
+                line = await reader.readline()
+                if not line:
+                    break
+                try:
+                    request = json.loads(line)
+                except json.JSONDecodeError:
+                    await self._send(writer, {"event": "error", "message": "Invalid JSON."})
+                    continue
+
+                op = request.get("op")
+                if op == "hello":
+                    user_id = request["user_id"]
+                    self._clients.setdefault(user_id, set()).add(writer)
+                elif user_id is None:
+                    await self._send(writer, {"event": "error", "message": "Say hello first."})
+                elif op == "send":
+                    # Queue now (keeps per-client order), wait for the commit concurrently so
+                    # a burst from one client lands in a single group commit. Queueing may
+                    # look up the conversation or wait on writer backpressure, so it runs on
+                    # a worker thread to keep the event loop serving the other clients.
+                    try:
+                        future = await asyncio.get_running_loop().run_in_executor(
+                            None, db_handler_friends.queue_message, user_id, request["to"], request["content"])
+                    except sqlite3.Error as e:
+                        await self._send(writer, {"event": "error", "ref": request.get("ref"), "message": str(e)})
+                        continue
+                    task = asyncio.create_task(self._complete_send(writer, user_id, request, future))
+                    self._tasks.add(task)
+                    task.add_done_callback(self._tasks.discard)
+                else:
+                    await self._send(writer, {"event": "error", "message": f"Unknown op '{op}'."})
+        except (ConnectionError, asyncio.IncompleteReadError, ValueError, KeyError) as e:
+            print(f"Broker client {user_id} disconnected: {e}")
+        finally:
+            if user_id is not None:
+                self._clients.get(user_id, set()).discard(writer)
+            writer.close()
+
+    async def _complete_send(self, writer, user_id, request, future):
+        ref = request.get("ref")
+        receiver_id = request["to"]
+        content = request["content"]
+
+        try:
+            message_id = await asyncio.wrap_future(future)
+        except Exception as e:
+            await self._send(writer, {"event": "error", "ref": ref, "message": str(e)})
+            return
+
+        await self._send(writer, {"event": "ack", "ref": ref, "id": message_id})
+        event = {
+            "event": "message",
+            "id": message_id,
+            "sender_id": user_id,
+            "receiver_id": receiver_id,
+            "content": content,
+        }
+        for recipient in {user_id, receiver_id}:
+            for client in list(self._clients.get(recipient, ())):
+                await self._send(client, event)
+
+    @staticmethod
+    async def _send(writer, payload):
+        try:
+            writer.write(json.dumps(payload).encode() + b"\n")
+            await writer.drain()
+        except ConnectionError:
+            pass
+
+
+async def serve(host=DEFAULT_HOST, port=DEFAULT_PORT):
+    """Start the broker and serve until cancelled."""
+    broker = MessageBroker()
+    server = await asyncio.start_server(broker.handle_client, host, port, limit=MAX_LINE)
+    print(f"Message broker listening on {host}:{port}")
+    async with server:
+        await server.serve_forever()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="ChatHub local message broker")
+    parser.add_argument("--host", default=db_config.get_setting("broker_host", DEFAULT_HOST))
+    parser.add_argument("--port", type=int, default=int(db_config.get_setting("broker_port", DEFAULT_PORT)))
+    args = parser.parse_args()
+
+    db_migrations.migrate()
+    try:
+        asyncio.run(serve(args.host, args.port))
+    except KeyboardInterrupt:
+        pass
+    finally:
+        db_writer.shutdown()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,138 @@
+import atexit
+import queue
+import threading
+from concurrent.futures import Future
+
+from backend_controller.ai_backends import get_backend
+from backend_controller.ai_cache import get_ai_cache
+from backend_controller.batching import collect_batch
+
+# A batch is sent once it holds this many messages...
+MAX_BATCH_SIZE = 32
+# ...or once its oldest message has waited this long (seconds)
+MAX_BATCH_DELAY = 0.05
+
+SENTIMENT = "sentiment"
+
+
+class SentimentBatcher:
+    """
+    Background classifier that micro-batches sentiment requests.
+
+    Messages submitted within MAX_BATCH_DELAY of each other are classified in a
+    single backend call (the classify endpoint takes a list of inputs), and each
+    caller gets its own Future. Answers already in the AI cache never reach the
+    backend, and new answers are added to it.
+    """
+
+    def __init__(self, max_batch_size=MAX_BATCH_SIZE, max_batch_delay=MAX_BATCH_DELAY):
+        self.max_batch_size = max_batch_size
+        self.max_batch_delay = max_batch_delay
+        self._queue = queue.Queue()
+        self._closed = False
+        self._thread = threading.Thread(target=self._run, name="sentiment-batcher", daemon=True)
+        self._thread.start()
+
+    def submit(self, message):
+        """
+        Queue a message for classification.
+
+        Returns:
+            concurrent.futures.Future: Resolves to "positive", "neutral" or "negative",
+            or to the exception the backend raised.
+        """
+        future = Future()
+        backend = get_backend()
+        # A memory hit needs no round trip through the batch thread
+        label = get_ai_cache().get_cached_in_memory(SENTIMENT, backend, message)
+        if label is not None:
+            future.set_result(label)
+            return future
+
+        if self._closed:
+            future.set_exception(RuntimeError("Sentiment batcher is closed."))
+            return future
+        self._queue.put((message, future))
+        return future
+
+    def close(self, timeout=5.0):
+        """Classify what is queued and stop the batch thread."""
+        if self._closed:
+            return
+        self._closed = True
+        self._queue.put(None)
+        self._thread.join(timeout)
+
+    def _run(self):
+        while True:
+            batch = collect_batch(self._queue, self.max_batch_size, self.max_batch_delay)
+            if batch is None:
+                return
+            try:
+                labels = classify_many([message for message, _ in batch])
+            except Exception as e:
+                for _, future in batch:
+                    future.set_exception(e)
+                continue
+            for (_, future), label in zip(batch, labels):
+                future.set_result(label)
+
+
+def classify_many(messages, batch_size=MAX_BATCH_SIZE):
+    """
+    Classify many messages, using the AI cache and one backend call per batch_size misses.
+
+    Blocking; use it from worker threads (e.g. to back-annotate a whole history).
+
+    Returns:
+        list: One label per message, in order.
+
+    Raises:
+        ValueError: If the backend returns a different number of labels than it was sent.
+    """
+    backend = get_backend()
+    cache = get_ai_cache()
+    labels = {}
+    missing = []
+    for message in dict.fromkeys(messages):
+        label = cache.get_cached(SENTIMENT, backend, message)
+        if label is not None:
+            labels[message] = label
+        else:
+            missing.append(message)
+
+    for start in range(0, len(missing), batch_size):
+        chunk = missing[start:start + batch_size]
+        chunk_labels = list(backend.classify_sentiment(chunk))
+        if len(chunk_labels) != len(chunk):
+            raise ValueError(
+                f"{backend.name} backend returned {len(chunk_labels)} sentiment labels for {len(chunk)} messages"
+            )
+        for message, label in zip(chunk, chunk_labels):
+            labels[message] = label
+            cache.put(SENTIMENT, backend, message, label)
+
+    return [labels[message] for message in messages]
+
+
+_batcher = None
+_batcher_lock = threading.Lock()
+
+
+def get_sentiment_batcher():
+    """Return the shared SentimentBatcher, starting it on first use."""
+    global _batcher
+    with _batcher_lock:
+        if _batcher is None:
+            _batcher = SentimentBatcher()
+            # Fallback for scripts; the app closes it from aboutToQuit, before Qt and the writer stop
+            atexit.register(_batcher.close)
+        return _batcher
+
+
+def shutdown_sentiment_batcher(timeout=5.0):
+    """Classify what is queued and stop the shared batcher, if it was started."""
+    with _batcher_lock:
+        batcher = _batcher
+    if batcher is not None:
+        batcher.close(timeout)
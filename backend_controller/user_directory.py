@@ -0,0 +1,122 @@
+import threading
+import time
+from collections import OrderedDict
+
+from backend_controller import db_handler
+
+# Users kept in memory at most (least recently used are dropped first)
+USER_CACHE_SIZE = 2048
+# Seconds before a cached entry is re-read, so changes made by another app instance show up
+USER_CACHE_TTL = 300
+
+
+class UserDirectory:
+    """
+    In-process LRU cache of user id -> (name, image_path).
+
+    Hits are a dict lookup under a lock and never touch SQLite. Entries expire
+    after ttl seconds and are dropped explicitly when this process changes a
+    profile (see invalidate).
+    """
+
+    def __init__(self, max_entries=USER_CACHE_SIZE, ttl=USER_CACHE_TTL):
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+        # Bumped by invalidate(), so a load that raced an invalidation is not cached
+        self._generation = 0
+
+    def get(self, user_id):
+        """
+        Look up a user.
+
+        Returns:
+            tuple: (name, image_path), or None if there is no such user.
+        """
+        entry = self._get_cached(user_id)
+        if entry is not None:
+            return entry
+        return self.get_many([user_id]).get(user_id)
+
+    def get_name(self, user_id):
+        """Return the user's name, or None if there is no such user."""
+        entry = self.get(user_id)
+        return entry[0] if entry else None
+
+    def get_image_path(self, user_id):
+        """Return the user's profile picture path (may be None), or None if there is no such user."""
+        entry = self.get(user_id)
+        return entry[1] if entry else None
+
+    def get_many(self, user_ids):
+        """
+        Look up several users, loading every miss with a single query.
+
+        Returns:
+            dict: user_id -> (name, image_path) for the users that exist.
+        """
+        found = {}
+        missing = []
+        for user_id in set(user_ids):
+            entry = self._get_cached(user_id)
+            if entry is not None:
+                found[user_id] = entry
+            else:
+                missing.append(user_id)
+
+        if missing:
+            generation = self._generation
+            placeholders = ", ".join("?" * len(missing))
+            with db_handler.get_connection() as connection:
+                cursor = connection.cursor()
+                cursor.execute(f"SELECT id, name, image_path FROM users WHERE id IN ({placeholders})", missing)
+                rows = cursor.fetchall()
+            for user_id, name, image_path in rows:
+                found[user_id] = (name, image_path)
+                self._store(user_id, (name, image_path), generation)
+
+        return found
+
+    def invalidate(self, user_id=None):
+        """Forget one user (after a profile change), or everyone when user_id is None."""
+        with self._lock:
+            self._generation += 1
+            if user_id is None:
+                self._entries.clear()
+            else:
+                self._entries.pop(user_id, None)
+
+    def _get_cached(self, user_id):
+        with self._lock:
+            cached = self._entries.get(user_id)
+            if cached is None:
+                return None
+            expires_at, entry = cached
+            if expires_at < time.monotonic():
+                del self._entries[user_id]
+                return None
+            self._entries.move_to_end(user_id)
+            return entry
+
+    def _store(self, user_id, entry, generation):
+        with self._lock:
+            if generation != self._generation:
+                return
+            self._entries[user_id] = (time.monotonic() + self.ttl, entry)
+            self._entries.move_to_end(user_id)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+
+_directory = UserDirectory()
+
+
+def get_user_directory():
+    """Return the process-wide UserDirectory."""
+    return _directory
+
+
+def invalidate(user_id=None):
+    """Shortcut for get_user_directory().invalidate(...)."""
+    _directory.invalidate(user_id)
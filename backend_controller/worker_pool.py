@@ -0,0 +1,114 @@
+from PySide6.QtCore import QObject, QRunnable, QThreadPool, Signal, Slot
+
+
+class WorkerTask(QObject):
+    """
+    Handle for one call running on a WorkerPool.
+
+    Created on the GUI thread, so finished/failed are always delivered there and
+    connected slots may touch widgets.
+    """
+
+    finished = Signal(object)
+    failed = Signal(object)
+    _completed = Signal(bool, object)
+
+    def __init__(self, fn, args, kwargs, pool):
+        super().__init__()
+        self.pool = pool
+        self.fn = fn
+        self.args = args
+        self.kwargs = kwargs
+        self.cancelled = False
+        # Emitted from the worker thread, delivered queued on this object's thread
+        self._completed.connect(self._deliver)
+
+    def cancel(self):
+        """Drop the result when it arrives (the call itself still runs)."""
+        self.cancelled = True
+
+    @Slot(bool, object)
+    def _deliver(self, ok, payload):
+        self.pool.forget(self)
+        if self.cancelled:
+            return
+        if ok:
+            self.finished.emit(payload)
+        else:
+            self.failed.emit(payload)
+
+
+class _WorkerRunnable(QRunnable):
+    def __init__(self, task):
+        super().__init__()
+        self.task = task
+
+    def run(self):
+        task = self.task
+        try:
+            result = task.fn(*task.args, **task.kwargs)
+        except Exception as e:
+            task._completed.emit(False, e)
+            return
+        task._completed.emit(True, result)
+
+
+class WorkerPool:
+    """
+    Runs blocking calls on its own QThreadPool and delivers the outcome on the GUI thread.
+
+    The database executor, the AI executor, the thumbnail decoder and the
+    attachment uploads each own one, so a slow kind of work never queues behind
+    another.
+    """
+
+    def __init__(self, max_threads, name="background"):
+        self.name = name
+        self._thread_pool = QThreadPool()
+        self._thread_pool.setMaxThreadCount(max_threads)
+        # Keep tasks alive until their result has been delivered
+        self._pending = set()
+
+    def submit(self, fn, *args, on_result=None, on_error=None, **kwargs):
+        """
+        Queue fn(*args, **kwargs) on a worker thread.
+
+        Args:
+            fn (callable): Blocking function to run. It must not touch widgets.
+            on_result (callable, optional): Called on the GUI thread with the return value.
+            on_error (callable, optional): Called on the GUI thread with the exception.
+                Defaults to printing it.
+
+        Returns:
+            WorkerTask: Handle exposing finished/failed signals and cancel().
+        """
+        task = WorkerTask(fn, args, kwargs, self)
+        if on_result:
+            task.finished.connect(on_result)
+        task.failed.connect(on_error or self._print_error)
+        self._pending.add(task)
+        self._thread_pool.start(_WorkerRunnable(task))
+        return task
+
+    def forget(self, task):
+        self._pending.discard(task)
+
+    def wait_for_done(self, msecs=-1):
+        """Block until every queued call has run."""
+        return self._thread_pool.waitForDone(msecs)
+
+    def shutdown(self, msecs=-1):
+        """
+        Drop the calls that have not started and wait up to msecs for the running ones.
+        Used on quit for work that is not worth finishing.
+
+        Returns:
+            bool: True if every worker thread is idle.
+        """
+        self._thread_pool.clear()
+        for task in list(self._pending):
+            task.cancel()
+        return self._thread_pool.waitForDone(msecs)
+
+    def _print_error(self, error):
+        print(f"Background {self.name} task failed: {error}")
@@ -0,0 +1,201 @@
+import hashlib
+import os
+
+from PySide6.QtCore import QSize, Qt
+from PySide6.QtGui import QImage, QImageReader, QPixmap, QPixmapCache
+
+from backend_controller import db_config
+from backend_controller.worker_pool import WorkerPool
+
+# Decoded thumbnails are kept on disk here, keyed by source path, mtime, size and thumbnail size
+DEFAULT_THUMBNAIL_DIR = os.path.join(db_config.PROJECT_ROOT, ".cache", "thumbnails")
+# Images decode on their own small pool so they never queue behind database queries
+IMAGE_THREADS = 2
+# Memory tier (QPixmapCache) budget in KiB
+MEMORY_CACHE_KB = 32 * 1024
+# Disk tier budget in MiB; the least recently used thumbnails are deleted beyond it
+DEFAULT_THUMBNAIL_CACHE_MAX_MB = 256
+
+
+def get_thumbnail_dir():
+    """Return the directory of the on-disk thumbnail cache."""
+    path = os.path.expanduser(db_config.get_setting("thumbnail_dir", DEFAULT_THUMBNAIL_DIR))
+    return path if os.path.isabs(path) else os.path.join(db_config.PROJECT_ROOT, path)
+
+
+def get_max_bytes():
+    return int(float(db_config.get_setting("thumbnail_cache_max_mb", DEFAULT_THUMBNAIL_CACHE_MAX_MB)) * 1024 * 1024)
+
+
+def _cache_key(path, width, height):
+    stat = os.stat(path)
+    source = f"{os.path.abspath(path)}|{stat.st_mtime_ns}|{stat.st_size}|{width}x{height}"
+    return hashlib.sha1(source.encode("utf-8")).hexdigest()
+
+
+def _make_thumbnail(path, width, height):
+    """
+    Worker thread: return (key, QImage) for the thumbnail, from disk if cached, otherwise
+    decoded and scaled from the source image (QPixmap cannot be used off the GUI thread).
+    """
+    key = _cache_key(path, width, height)
+    cached_file = os.path.join(get_thumbnail_dir(), f"{key}.png")
+    image = QImage()
+    if os.path.isfile(cached_file) and image.load(cached_file):
+        try:
+            os.utime(cached_file)  # Recently used thumbnails survive prune_disk_cache()
+        except OSError:
+            pass
+        return key, image
+
+    reader = QImageReader(path)
+    reader.setAutoTransform(True)
+    original_size = reader.size()
+    target = QSize(width, height)
+    if original_size.isValid() and (original_size.width() > width or original_size.height() > height):
+        # Formats like JPEG can decode straight at the smaller size, which is much cheaper
+        reader.setScaledSize(original_size.scaled(target, Qt.KeepAspectRatio))
+    image = reader.read()
+    if image.isNull():
+        raise OSError(f"Could not decode {path}: {reader.errorString()}")
+
+    if image.width() > width or image.height() > height:
+        image = image.scaled(target, Qt.KeepAspectRatio, Qt.SmoothTransformation)
+
+    os.makedirs(get_thumbnail_dir(), exist_ok=True)
+    temporary_file = f"{cached_file}.{os.getpid()}.tmp"
+    if image.save(temporary_file, "PNG"):
+        os.replace(temporary_file, cached_file)
+    return key, image
+
+
+def prune_disk_cache(max_bytes=None):
+    """
+    Delete the least recently used thumbnails until the disk tier fits in max_bytes
+    (default: the thumbnail_cache_max_mb setting). Run by the maintenance scheduler.
+
+    Returns:
+        int: The number of files deleted.
+    """
+    max_bytes = get_max_bytes() if max_bytes is None else max_bytes
+    try:
+        entries = [entry for entry in os.scandir(get_thumbnail_dir()) if entry.name.endswith(".png")]
+    except FileNotFoundError:
+        return 0
+
+    files = []
+    for entry in entries:
+        try:
+            stat = entry.stat()
+        except OSError:
+            continue  # Deleted meanwhile
+        files.append((stat.st_mtime, stat.st_size, entry.path))
+    total = sum(size for _, size, _ in files)
+
+    deleted = 0
+    for _, size, path in sorted(files):
+        if total <= max_bytes:
+            break
+        try:
+            os.remove(path)
+        except OSError:
+            continue
+        total -= size
+        deleted += 1
+    return deleted
+
+
+class ThumbnailCache:
+    """
+    Two-tier thumbnail cache for avatars and image attachments.
+
+    Memory tier: QPixmapCache, checked synchronously on the GUI thread.
+    Disk tier: PNG files under the thumbnail directory. Misses are decoded and
+    scaled on a background pool and delivered back on the GUI thread.
+    """
+
+    def __init__(self):
+        QPixmapCache.setCacheLimit(MEMORY_CACHE_KB)
+        self._pool = WorkerPool(IMAGE_THREADS, name="thumbnail")
+        # (path, width, height) -> cache key worked out by the last decode, so lookups never stat()
+        self._keys = {}
+        # (path, width, height) -> callbacks waiting for a decode already in flight
+        self._waiting = {}
+        # (path, width, height) that could not be decoded; not retried until request(retry=True)
+        self._failed = set()
+
+    def cached(self, path, width, height):
+        """Return the thumbnail if it is in memory, else None. Never touches the disk."""
+        key = self._keys.get((path, width, height))
+        if key is None:
+            return None
+        pixmap = QPixmapCache.find(key)
+        return pixmap if pixmap is not None and not pixmap.isNull() else None
+
+    def has_failed(self, path, width, height):
+        return (path, width, height) in self._failed
+
+    def request(self, path, width, height, callback, retry=False):
+        """
+        Deliver a thumbnail of path, at most width x height, to callback(pixmap).
+
+        callback runs immediately on a memory hit, otherwise on the GUI thread once
+        the background decode is done. It receives None if the image cannot be read.
+        The source file is only stat()ed on the worker; retry=True also picks up a
+        source that changed since it was last decoded.
+        """
+        request_id = (path, width, height)
+        if request_id in self._failed and not retry:
+            return
+        self._failed.discard(request_id)
+        if retry:
+            self._keys.pop(request_id, None)
+
+        pixmap = self.cached(path, width, height)
+        if pixmap is not None:
+            callback(pixmap)
+            return
+
+        if request_id in self._waiting:
+            self._waiting[request_id].append(callback)
+            return
+        self._waiting[request_id] = [callback]
+        self._pool.submit(
+            _make_thumbnail, path, width, height,
+            on_result=lambda result: self._deliver(request_id, *result),
+            on_error=lambda e: self._deliver(request_id, None, None, e),
+        )
+
+    def shutdown(self, msecs=-1):
+        self._waiting.clear()
+        return self._pool.shutdown(msecs)
+
+    def _deliver(self, request_id, key, image, error=None):
+        pixmap = None
+        if image is not None:
+            pixmap = QPixmap.fromImage(image)
+            QPixmapCache.insert(key, pixmap)
+            self._keys[request_id] = key
+        else:
+            print(f"Thumbnail failed: {error}")
+            self._failed.add(request_id)
+
+        for callback in self._waiting.pop(request_id, []):
+            callback(pixmap)
+
+
+_thumbnail_cache = None
+
+
+def get_thumbnail_cache():
+    """Return the shared ThumbnailCache (GUI thread only)."""
+    global _thumbnail_cache
+    if _thumbnail_cache is None:
+        _thumbnail_cache = ThumbnailCache()
+    return _thumbnail_cache
+
+
+def shutdown_thumbnail_cache(msecs=2000):
+    """Drop queued decodes and wait for the running ones. Called when the app quits."""
+    if _thumbnail_cache is not None:
+        _thumbnail_cache.shutdown(msecs)
@@ -0,0 +1,60 @@
+"""
+Shared test setup.
+
+Every test session gets its own database, archive and attachment folders in a
+temporary directory, and the AI features use the offline stub backend. The
+settings are environment variables, so they are set here, before anything in
+backend_controller is imported.
+"""
+import os
+import shutil
+import tempfile
+import pytest
+
+_TEST_DIR = tempfile.mkdtemp(prefix="chathub-tests-")
+os.environ["CHATHUB_CONFIG"] = os.path.join(_TEST_DIR, "chathub.ini")  # never read the developer's ini
+os.environ["CHATHUB_DB_PATH"] = os.path.join(_TEST_DIR, "message.db")
+os.environ["CHATHUB_ARCHIVE_DIR"] = os.path.join(_TEST_DIR, "archive")
+os.environ["CHATHUB_ATTACHMENT_DIR"] = os.path.join(_TEST_DIR, "attachments")
+os.environ["CHATHUB_THUMBNAIL_DIR"] = os.path.join(_TEST_DIR, "thumbnails")
+os.environ["CHATHUB_AI_BACKEND"] = "stub"
+os.environ.setdefault("QT_QPA_PLATFORM", "offscreen")
+
+from PySide6.QtCore import QCoreApplication  # noqa: E402
+
+from backend_controller import db_handler, db_migrations, db_writer  # noqa: E402
+
+
+@pytest.fixture(scope="session", autouse=True)
+def database():
+    """Migrate the session database once; flush, close and delete it at the end."""
+    db_migrations.migrate()
+    yield db_handler.DB_PATH
+    db_writer.shutdown()
+    db_handler.close_pool()
+    shutil.rmtree(_TEST_DIR, ignore_errors=True)
+
+
+@pytest.fixture(scope="session")
+def qapp():
+    """A Qt application, so queued signals and timers are delivered."""
+    return QCoreApplication.instance() or QCoreApplication([])
+
+
+_next_user_id = [1000]
+
+
+@pytest.fixture
+def make_user():
+    """Create users with fresh ids, so tests sharing the session database never collide."""
+    def make(name=None):
+        _next_user_id[0] += 1
+        user_id = _next_user_id[0]
+        with db_handler.get_connection() as connection:
+            connection.execute(
+                "INSERT INTO users (id, name, phone_number) VALUES (?, ?, ?)",
+                (user_id, name or f"User {user_id}", f"555{user_id:07d}"),
+            )
+            connection.commit()
+        return user_id
+    return make
@@ -0,0 +1,17 @@
+import time
+
+from PySide6.QtCore import QCoreApplication
+
+
+def wait_for(condition, timeout=5.0):
+    """Process Qt events until condition() is true or timeout seconds pass. Returns condition()."""
+    deadline = time.monotonic() + timeout
+    while not condition() and time.monotonic() < deadline:
+        QCoreApplication.processEvents()
+        time.sleep(0.005)
+    return condition()
+
+
+def process_events_for(seconds):
+    """Keep delivering Qt events for a while, to check that something does not happen."""
+    wait_for(lambda: False, seconds)
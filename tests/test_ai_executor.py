@@ -0,0 +1,127 @@
+import threading
+
+import pytest
+
+from backend_controller import ai_backends, db_handle_AI
+from backend_controller.ai_cache import get_ai_cache
+from backend_controller.ai_executor import AiExecutor, run_ai_async
+from tests.qt_utils import process_events_for, wait_for
+
+
+class SlowStubBackend(ai_backends.LocalStubBackend):
+    """The stub model, but every call blocks until the test releases it."""
+
+    name = "slow-stub"
+
+    def __init__(self):
+        self.release = threading.Event()
+        self.calls = 0
+
+    def generate_suggestions(self, message):
+        self.calls += 1
+        self.release.wait(5)
+        return super().generate_suggestions(message)
+
+
+@pytest.fixture(autouse=True)
+def stub_backend(qapp):
+    backend = ai_backends.LocalStubBackend()
+    ai_backends.set_backend(backend)
+    get_ai_cache().clear_memory()
+    yield backend
+    ai_backends.set_backend(None)
+
+
+@pytest.fixture
+def slow_backend():
+    backend = SlowStubBackend()
+    yield backend
+    backend.release.set()
+
+
+@pytest.fixture
+def executor():
+    executor = AiExecutor(max_threads=2)
+    yield executor
+    executor.shutdown(2000)
+
+
+def test_result_is_delivered_on_the_gui_thread(stub_backend):
+    results, threads, timeouts = [], [], []
+
+    def on_result(suggestions):
+        threads.append(threading.current_thread())
+        results.append(suggestions)
+
+    run_ai_async(db_handle_AI.get_smart_suggestions, "see you at eight",
+                 on_result=on_result, on_timeout=lambda: timeouts.append(True), timeout=5)
+
+    assert wait_for(lambda: results)
+    assert results == [stub_backend.generate_suggestions("see you at eight")]
+    assert threads == [threading.main_thread()]
+    assert timeouts == []
+
+
+def test_sentiment_uses_the_stub_backend():
+    results = []
+    run_ai_async(db_handle_AI.analyze_sentiment, "I love this, thanks!", on_result=results.append, timeout=5)
+
+    assert wait_for(lambda: results)
+    assert results == [db_handle_AI.SENTIMENT_EMOJIS["positive"]]
+
+
+def test_slow_request_times_out_and_its_late_result_is_dropped(executor, slow_backend):
+    results, timeouts = [], []
+    task = executor.submit(slow_backend.generate_suggestions, "are you there",
+                           on_result=results.append, on_timeout=lambda: timeouts.append(True), timeout=0.05)
+
+    assert wait_for(lambda: timeouts, timeout=2)
+    assert task.cancelled
+
+    # The call on the wire finishes later; nobody hears about it
+    slow_backend.release.set()
+    process_events_for(0.2)
+    assert results == []
+    assert timeouts == [True]
+
+
+def test_cancelled_request_reports_nothing(executor, slow_backend):
+    results, timeouts, errors = [], [], []
+    task = executor.submit(slow_backend.generate_suggestions, "never mind",
+                           on_result=results.append, on_error=errors.append,
+                           on_timeout=lambda: timeouts.append(True), timeout=0.1)
+    task.cancel()
+    slow_backend.release.set()
+
+    process_events_for(0.3)
+    assert (results, errors, timeouts) == ([], [], [])
+
+
+def test_errors_are_reported_instead_of_a_timeout(executor):
+    errors, timeouts = [], []
+
+    def fail():
+        raise RuntimeError("model unavailable")
+
+    executor.submit(fail, on_error=errors.append, on_timeout=lambda: timeouts.append(True), timeout=0.1)
+
+    assert wait_for(lambda: errors)
+    process_events_for(0.2)
+    assert [str(error) for error in errors] == ["model unavailable"]
+    assert timeouts == []
+
+
+def test_shutdown_drops_requests_that_have_not_started(slow_backend):
+    executor = AiExecutor(max_threads=1)
+    results = []
+    executor.submit(slow_backend.generate_suggestions, "first", on_result=results.append, timeout=5)
+    assert wait_for(lambda: slow_backend.calls == 1)
+    executor.submit(slow_backend.generate_suggestions, "second", on_result=results.append, timeout=5)
+
+    # The running call cannot finish yet, so the wait gives up; the queued one is dropped
+    assert not executor.shutdown(50)
+    slow_backend.release.set()
+    assert executor.shutdown(2000)
+    process_events_for(0.1)
+    assert slow_backend.calls == 1
+    assert results == []
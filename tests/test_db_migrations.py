@@ -0,0 +1,91 @@
+import pytest
+
+from backend_controller import db_handler, db_handler_search, db_migrations
+
+
+def _latest_version():
+    return db_migrations.MIGRATIONS[-1][0]
+
+
+@pytest.fixture
+def fresh_db(tmp_path, monkeypatch):
+    """Point the connection pool at an empty database file for one test."""
+    db_handler.close_pool()
+    monkeypatch.setattr(db_handler, "DB_PATH", str(tmp_path / "message.db"))
+    yield db_handler.DB_PATH
+    db_handler.close_pool()
+
+
+def test_versions_are_unique_and_ascending():
+    versions = [version for version, _, _ in db_migrations.MIGRATIONS]
+    assert versions == sorted(set(versions))
+
+
+def test_empty_database_is_migrated_to_the_latest_version(fresh_db):
+    assert db_migrations.migrate() == _latest_version()
+
+    with db_handler.get_connection() as connection:
+        applied = [row[0] for row in connection.execute("SELECT version FROM schema_migrations ORDER BY version")]
+    assert applied == [version for version, _, _ in db_migrations.MIGRATIONS]
+
+
+def test_migrate_is_a_no_op_when_up_to_date(fresh_db):
+    db_migrations.migrate()
+    with db_handler.get_connection() as connection:
+        before = connection.execute("SELECT version, applied_at FROM schema_migrations").fetchall()
+
+    assert db_migrations.migrate() == _latest_version()
+
+    with db_handler.get_connection() as connection:
+        assert connection.execute("SELECT version, applied_at FROM schema_migrations").fetchall() == before
+
+
+def test_migrate_stops_at_target_version_and_resumes(fresh_db):
+    assert db_migrations.migrate(target_version=4) == 4
+    with db_handler.get_connection() as connection:
+        assert db_migrations.current_version(connection) == 4
+        columns = [row[1] for row in connection.execute("PRAGMA table_info(messages)")]
+    assert "conversation_id" not in columns
+
+    assert db_migrations.migrate() == _latest_version()
+
+
+def test_existing_data_is_carried_through_every_migration(fresh_db):
+    # A database as the app wrote it before conversations, full-text search and status counters
+    db_migrations.migrate(target_version=4)
+    with db_handler.get_connection() as connection:
+        connection.executemany(
+            "INSERT INTO users (id, name, phone_number) VALUES (?, ?, ?)",
+            [(1, "Ada", "5550000001"), (2, "Ben", "5550000002"), (3, "Cy", "5550000003")],
+        )
+        connection.executemany(
+            "INSERT INTO friends (user_id, friend_id) VALUES (?, ?)", [(1, 2), (2, 1)]
+        )
+        connection.execute("INSERT INTO groups (id, group_name, created_by) VALUES (7, 'Team', 3)")
+        connection.execute("INSERT INTO group_members (group_id, member_id) VALUES (7, 1)")
+        # Direct message 1 -> 2, and a group message from 1 that used receiver_id = group id
+        connection.execute("INSERT INTO messages (id, sender_id, receiver_id, content) VALUES (1, 1, 2, 'hello ben')")
+        connection.execute("INSERT INTO messages (id, sender_id, receiver_id, content) VALUES (2, 1, 7, 'hello team')")
+        connection.execute(
+            "INSERT INTO statuses (id, user_id, content, expiration_time) VALUES (1, 2, 'hi', '2999-01-01 00:00:00')"
+        )
+        # The old code could record the same like twice
+        connection.executemany("INSERT INTO likes (status_id, user_id) VALUES (?, ?)", [(1, 1), (1, 1), (1, 3)])
+        connection.commit()
+
+    assert db_migrations.migrate() == _latest_version()
+
+    with db_handler.get_connection() as connection:
+        direct, group = connection.execute(
+            """
+            SELECT c.kind FROM messages m JOIN conversations c ON c.id = m.conversation_id ORDER BY m.id
+            """
+        ).fetchall()
+        assert direct == ("direct",) and group == ("group",)
+
+        assert connection.execute("SELECT COUNT(*) FROM likes").fetchone()[0] == 2
+        assert connection.execute("SELECT like_count, expires_at IS NOT NULL FROM statuses").fetchone() == (2, 1)
+
+    # Existing messages were indexed for search and the group message is visible to its member
+    hits = db_handler_search.search_messages(1, "hello")
+    assert sorted(hit[0] for hit in hits) == [1, 2]
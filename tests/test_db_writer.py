@@ -0,0 +1,142 @@
+import sqlite3
+import threading
+
+import pytest
+
+from backend_controller import db_handler, db_writer
+
+
+class RecordingWriteQueue(db_writer.WriteQueue):
+    """WriteQueue that records the size of every batch it commits."""
+
+    def __init__(self, **kwargs):
+        self.batch_sizes = []
+        super().__init__(**kwargs)
+
+    def _commit_batch(self, batch):
+        self.batch_sizes.append(len(batch))
+        super()._commit_batch(batch)
+
+
+@pytest.fixture(scope="module", autouse=True)
+def writer_table():
+    with db_handler.get_connection() as connection:
+        connection.execute("CREATE TABLE IF NOT EXISTS writer_test (id INTEGER PRIMARY KEY, tag TEXT, value INTEGER)")
+        connection.commit()
+
+
+@pytest.fixture
+def write_queue():
+    queues = []
+
+    def make(**kwargs):
+        queue = RecordingWriteQueue(**kwargs)
+        queues.append(queue)
+        return queue
+
+    yield make
+    for queue in queues:
+        queue.close()
+
+
+def _insert(cursor, tag, value):
+    cursor.execute("INSERT INTO writer_test (tag, value) VALUES (?, ?)", (tag, value))
+    return cursor.lastrowid
+
+
+def _insert_then_fail(cursor, tag, value):
+    _insert(cursor, tag, value)
+    raise ValueError("write rejected")
+
+
+def _values(tag):
+    with db_handler.get_connection() as connection:
+        return [row[0] for row in connection.execute(
+            "SELECT value FROM writer_test WHERE tag = ? ORDER BY id", (tag,))]
+
+
+def test_concurrent_writes_share_commits(write_queue):
+    queue = write_queue(max_batch_delay=0.05)
+    futures = []
+    lock = threading.Lock()
+
+    def submit_many(start):
+        for value in range(start, start + 25):
+            future = queue.submit(_insert, "group", value)
+            with lock:
+                futures.append(future)
+
+    threads = [threading.Thread(target=submit_many, args=(start,)) for start in range(0, 100, 25)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    ids = [future.result(timeout=5) for future in futures]
+    assert len(set(ids)) == 100
+    assert sorted(_values("group")) == list(range(100))
+    assert sum(queue.batch_sizes) == 100
+    # 100 writes submitted within the batching window land in far fewer transactions
+    assert len(queue.batch_sizes) < 10
+
+
+def test_batches_respect_the_size_limit(write_queue):
+    queue = write_queue(max_batch_size=10, max_batch_delay=0.05)
+    futures = [queue.submit(_insert, "sized", value) for value in range(35)]
+    for future in futures:
+        future.result(timeout=5)
+
+    assert max(queue.batch_sizes) <= 10
+    assert sum(queue.batch_sizes) == 35
+    # One submitter keeps its order
+    assert _values("sized") == list(range(35))
+
+
+def test_a_failing_write_does_not_roll_back_its_batch(write_queue):
+    queue = write_queue(max_batch_delay=0.05)
+    ok_before = queue.submit(_insert, "isolated", 1)
+    failing = queue.submit(_insert_then_fail, "isolated", 2)
+    ok_after = queue.submit(_insert, "isolated", 3)
+
+    assert ok_before.result(timeout=5)
+    assert ok_after.result(timeout=5)
+    with pytest.raises(ValueError):
+        failing.result(timeout=5)
+    assert queue.batch_sizes == [3]
+    # The failed write's own insert was rolled back to its savepoint
+    assert _values("isolated") == [1, 3]
+
+
+def test_flush_waits_for_queued_writes(write_queue):
+    queue = write_queue(max_batch_delay=0.2)
+    queue.submit(_insert, "flushed", 1)
+    queue.flush(timeout=5)
+    assert _values("flushed") == [1]
+
+
+def test_close_commits_what_is_queued_and_rejects_new_writes(write_queue):
+    queue = write_queue(max_batch_delay=0.2)
+    future = queue.submit(_insert, "closed", 1)
+    queue.close()
+
+    assert future.result(timeout=0)
+    assert _values("closed") == [1]
+    with pytest.raises(sqlite3.ProgrammingError):
+        queue.submit(_insert, "closed", 2)
+
+
+def test_submit_applies_backpressure_when_the_queue_is_full(write_queue):
+    blocker = threading.Event()
+
+    def wait_for_release(cursor):
+        blocker.wait(5)
+
+    queue = write_queue(max_batch_size=1, max_batch_delay=0, max_pending=1, submit_timeout=0.05)
+    queue.submit(wait_for_release)  # Taken by the writer thread, which now blocks
+    try:
+        # At most one more write fits in the queue; a later one gives up after submit_timeout
+        with pytest.raises(sqlite3.OperationalError):
+            for _ in range(3):
+                queue.submit(_insert, "backpressure", 1)
+    finally:
+        blocker.set()
@@ -0,0 +1,98 @@
+from backend_controller import db_handler, db_handler_conversations, db_handler_friends
+
+
+def _insert_conversation(user_id, friend_id, count, timestamps):
+    """Insert count messages cycling through timestamps (so many share a timestamp); return their ids."""
+    conversation_id = db_handler_conversations.get_direct_conversation_id(user_id, friend_id)
+    with db_handler.get_connection() as connection:
+        cursor = connection.cursor()
+        for i in range(count):
+            cursor.execute(
+                """
+                INSERT INTO messages (conversation_id, sender_id, receiver_id, content, timestamp)
+                VALUES (?, ?, ?, ?, ?)
+                """,
+                (conversation_id, user_id if i % 2 else friend_id, friend_id if i % 2 else user_id,
+                 f"message {i}", timestamps[i % len(timestamps)]),
+            )
+        connection.commit()
+        cursor.execute(
+            "SELECT id FROM messages WHERE conversation_id = ? ORDER BY timestamp, id", (conversation_id,)
+        )
+        return [row[0] for row in cursor.fetchall()]
+
+
+def _ids(messages):
+    return [message[0] for message in messages]
+
+
+def test_pages_cover_the_whole_history_once_in_order(make_user):
+    user_id, friend_id = make_user(), make_user()
+    # Three timestamps for 125 messages: pages must split inside runs of equal timestamps
+    expected = _insert_conversation(
+        user_id, friend_id, 125, ["2026-01-01 10:00:00", "2026-01-01 09:00:00", "2026-01-02 08:00:00"])
+
+    messages, cursor = db_handler_friends.load_chat_history_db(friend_id, user_id, limit=20)
+    assert _ids(messages) == expected[-20:]
+    seen = _ids(messages)
+    pages = 1
+    while cursor is not None:
+        page, cursor = db_handler_friends.load_chat_history_db(friend_id, user_id, cursor, limit=20)
+        assert len(page) <= 20
+        seen = _ids(page) + seen
+        pages += 1
+
+    assert seen == expected
+    assert pages == 7  # 6 full pages and a short last one
+
+
+def test_exactly_one_page_ends_with_an_empty_page(make_user):
+    user_id, friend_id = make_user(), make_user()
+    expected = _insert_conversation(user_id, friend_id, 20, ["2026-02-01 10:00:00"])
+
+    messages, cursor = db_handler_friends.load_chat_history_db(friend_id, user_id, limit=20)
+    assert _ids(messages) == expected
+    # A full page cannot know it was the last one; the next page is empty and ends paging
+    assert cursor is not None
+    assert db_handler_friends.load_chat_history_db(friend_id, user_id, cursor, limit=20) == ([], None)
+
+
+def test_history_is_per_conversation(make_user):
+    user_id, friend_id, other_id = make_user(), make_user(), make_user()
+    expected = _insert_conversation(user_id, friend_id, 5, ["2026-03-01 10:00:00"])
+    _insert_conversation(user_id, other_id, 5, ["2026-03-01 10:00:00"])
+
+    messages, cursor = db_handler_friends.load_chat_history_db(friend_id, user_id)
+    assert _ids(messages) == expected
+    assert cursor is None
+
+
+def test_jumping_to_a_message_pages_both_ways(make_user):
+    user_id, friend_id = make_user(), make_user()
+    expected = _insert_conversation(user_id, friend_id, 90, ["2026-04-01 10:00:00", "2026-04-01 11:00:00"])
+    target = expected[37]
+
+    messages, older_cursor, newer_cursor = db_handler_friends.load_chat_history_around(
+        friend_id, user_id, target, limit=20)
+    assert target in _ids(messages)
+
+    seen = _ids(messages)
+    while older_cursor is not None:
+        page, older_cursor = db_handler_friends.load_chat_history_db(friend_id, user_id, older_cursor, limit=20)
+        seen = _ids(page) + seen
+    while newer_cursor is not None:
+        page, newer_cursor = db_handler_friends.load_newer_chat_history_db(friend_id, user_id, newer_cursor, limit=20)
+        seen = seen + _ids(page)
+
+    assert seen == expected
+
+
+def test_new_messages_are_fetched_past_the_high_water_mark(make_user):
+    user_id, friend_id = make_user(), make_user()
+    expected = _insert_conversation(user_id, friend_id, 10, ["2026-05-01 10:00:00"])
+
+    message_id = db_handler_friends.save_message(user_id, friend_id, "latest")
+
+    new_messages = db_handler_friends.fetch_new_messages(user_id, friend_id, expected[-1])
+    assert _ids(new_messages) == [message_id]
+    assert new_messages[0][2] == "latest"